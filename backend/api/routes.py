@@ -1,26 +1,52 @@
-from fastapi import APIRouter, Query, Depends, HTTPException, Header, Body, Response
+from fastapi import APIRouter, Query, Depends, HTTPException, Header, Body, Response, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from services.delta_reader import (
-    get_data_sync_status,
-    get_user_vitals_status,
+    get_sync_status_matrix,
+    get_user_vitals_matrix,
+    query_matrix,
     get_summary,
     get_weekly_summary,
-    get_monthly_summary
+    get_monthly_summary,
+    get_dashboard,
+    DASHBOARD_SECTIONS,
+    get_view_dates,
+    get_range_dates,
+    get_table_identities,
+    get_raw_manifest_digest,
+    build_sync_matrix,
+    build_vitals_matrix,
+    get_missing_users,
+    get_approximate_summary,
+    get_range_summary
 )
 from services.excel_export import create_summary_excel
+from services.columnar_export import EXPORT_FORMATS, iter_table_bytes
+from services import export_cache, export_jobs, dirty_dates, ingest_status, quality_stats, baselines, user_timeline
+from services.live_updates import live_hub
+from config.settings import (LIVE_HEARTBEAT_SECONDS, ADMIN_USERNAMES, STALE_MAX_AGE_SECONDS, REQUEST_DEADLINE_SECONDS,
+                             BASELINE_Z_THRESHOLD, BASELINE_MIN_DAYS)
+from services.result_cache import ComputeTimeout
+from services.analytics_executor import run_analytics
+from utils.metrics import span
+from utils.profiling import ProfiledRoute, load_profile
+import asyncio
+import json
 from datetime import datetime
 from .auth_routes import auth_router
-from typing import Dict, Any, Optional
-import mysql.connector
-from config.database import get_db_connection
-from jose import jwt, JWTError
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel
 from config.database import SECRET_KEY, ALGORITHM
-from services.auth_service import get_user_by_username
+from services.auth_service import get_user_by_username, hash_password
+from services.user_repository import get_repository
 from utils.password_validation import validate_password
+from utils.lazy import lazy_import
 
-router = APIRouter()
+jwt = lazy_import("jose.jwt")
+
+router = APIRouter(route_class=ProfiledRoute)
 router.include_router(auth_router, prefix="/auth")
 
-def get_current_user(authorization: Optional[str] = Header(None)):
+async def get_current_user(authorization: Optional[str] = Header(None)):
     """Get current user from token"""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization header")
@@ -31,97 +57,54 @@ def get_current_user(authorization: Optional[str] = Header(None)):
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user = get_user_by_username(username)
+        with span("user_lookup"):
+            user = await get_user_by_username(username)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         return user
-    except JWTError:
+    except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    """Current user, provided they are listed in ADMIN_USERNAMES"""
+    if current_user["username"] not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
 
-@router.get("/sync-status")
-def sync_status(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
-                page: int = Query(default=1, ge=1),
-                page_size: int = Query(default=10, ge=1)):
-    response_data = get_data_sync_status(date)
-    all_data = response_data['data']
-    columns = response_data['columns']
-    total_users = len(all_data)
-    total_pages = (total_users + page_size - 1) // page_size
-    start = (page - 1) * page_size
-    end = start + page_size
-    paginated_data = all_data[start:end]
-    return {
-        "date": date,
-        "columns": columns,
-        "data": paginated_data,
-        "total_users": total_users,
-        "total_pages": total_pages,
-        "page": page,
-        "page_size": page_size
-    }
-
+async def get_stream_user(authorization: Optional[str] = Header(None), token: Optional[str] = Query(default=None)):
+    """Like get_current_user, but also accepts ?token= since browser EventSource cannot set headers"""
+    if not authorization and token:
+        authorization = f"Bearer {token}"
+    return await get_current_user(authorization)
 
-@router.get("/user-vitals")
-def user_vitals(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
-                page: int = Query(default=1, ge=1),
-                page_size: int = Query(default=10, ge=1)):
-    response_data = get_user_vitals_status(date)
-    all_data = response_data['data']
-    columns = response_data['columns']
-    total_users = len(all_data)
-    total_pages = (total_users + page_size - 1) // page_size
-    start = (page - 1) * page_size
-    end = start + page_size
-    paginated_data = all_data[start:end]
-    return {
-        "date": date,
-        "columns": columns,
-        "data": paginated_data,
-        "total_users": total_users,
-        "total_pages": total_pages,
-        "page": page,
-        "page_size": page_size
-    }
-
-
-@router.get("/summary")
-def summary(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
-            page: int = Query(default=1, ge=1),
-            page_size: int = Query(default=10, ge=1),
-            current_user: dict = Depends(get_current_user)):
-    summary_data = get_summary(date)
-    
-    # Get user settings for custom user count
+async def get_custom_user_count(current_user: dict) -> Optional[int]:
+    """Custom total user count from the user's settings, or None when the default count applies"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT setting_key, setting_value 
-            FROM user_settings 
-            WHERE user_id = %s AND setting_key IN ('user_count_logic', 'custom_user_count')
-        """, (current_user['id'],))
-        
-        settings = {}
-        for row in cursor.fetchall():
-            settings[row['setting_key']] = row['setting_value']
+        with span("settings_lookup"):
+            settings = await get_repository().get_settings(
+                current_user['id'], ('user_count_logic', 'custom_user_count'))
         
-        cursor.close()
-        conn.close()
-        
-        # Apply custom user count if settings indicate custom input
         if (settings.get('user_count_logic') == 'custom_input' and 
             settings.get('custom_user_count') and 
             settings['custom_user_count'].isdigit()):
             custom_count = int(settings['custom_user_count'])
             if custom_count > 0:
-                summary_data['total_users'] = custom_count
-                print(f"Applied custom user count: {custom_count} for user {current_user['username']}")
+                return custom_count
         
     except Exception as e:
-        print(f"Error applying user settings in summary: {e}")
+        print(f"Error reading user count settings: {e}")
         # Continue with default behavior if settings can't be applied
+    return None
+
+
+def _paginate_summary(date: str, summary_data: dict, page: int, page_size: int, current_user: dict,
+                      custom_count: Optional[int]):
+    # Summaries can be shared between concurrent requests; work on a copy
+    summary_data = dict(summary_data)
+    # Apply custom user count if settings indicate custom input
+    if custom_count is not None:
+        summary_data['total_users'] = custom_count
+        print(f"Applied custom user count: {custom_count} for user {current_user['username']}")
     
     # If summary_data contains a list of users, paginate it. Otherwise, return as is with pagination info.
     if isinstance(summary_data, dict) and 'users' in summary_data and isinstance(summary_data['users'], list):
@@ -138,122 +121,355 @@ def summary(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
         summary_data['page_size'] = page_size
     return {"date": date, **summary_data}
 
-@router.get("/summary/weekly")
-def weekly_summary(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
-                   page: int = Query(default=1, ge=1),
-                   page_size: int = Query(default=10, ge=1),
-                   current_user: dict = Depends(get_current_user)):
-    summary_data = get_weekly_summary(date)
-    
-    # Get user settings for custom user count
+
+def _query_matrix_page(date: str, columns: list, matrix, page: int, page_size: int,
+                       status: Optional[List[str]], search: Optional[str], sort: Optional[str]):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT setting_key, setting_value 
-            FROM user_settings 
-            WHERE user_id = %s AND setting_key IN ('user_count_logic', 'custom_user_count')
-        """, (current_user['id'],))
-        
-        settings = {}
-        for row in cursor.fetchall():
-            settings[row['setting_key']] = row['setting_value']
-        
-        cursor.close()
-        conn.close()
-        
-        # Apply custom user count if settings indicate custom input
-        if (settings.get('user_count_logic') == 'custom_input' and 
-            settings.get('custom_user_count') and 
-            settings['custom_user_count'].isdigit()):
-            custom_count = int(settings['custom_user_count'])
-            if custom_count > 0:
-                summary_data['total_users'] = custom_count
-                print(f"Applied custom user count: {custom_count} for user {current_user['username']}")
-        
-    except Exception as e:
-        print(f"Error applying user settings in weekly summary: {e}")
-        # Continue with default behavior if settings can't be applied
-    
-    # If summary_data contains a list of users, paginate it. Otherwise, return as is with pagination info.
-    if isinstance(summary_data, dict) and 'users' in summary_data and isinstance(summary_data['users'], list):
-        all_users = summary_data['users']
-        total_users = summary_data.get('total_users', len(all_users))
-        total_pages = (total_users + page_size - 1) // page_size
-        start = (page - 1) * page_size
-        end = start + page_size
-        paginated_users = all_users[start:end]
-        summary_data['users'] = paginated_users
-        summary_data['total_users'] = total_users
-        summary_data['total_pages'] = total_pages
-        summary_data['page'] = page
-        summary_data['page_size'] = page_size
-    return {"date": date, **summary_data}
+        matrix = query_matrix(matrix, status, search, sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total_users = matrix.num_rows
+    total_pages = (total_users + page_size - 1) // page_size
+    start = (page - 1) * page_size
+    return {
+        "date": date,
+        "columns": columns,
+        "data": matrix.slice(start, page_size).to_pylist(),
+        "total_users": total_users,
+        "total_pages": total_pages,
+        "page": page,
+        "page_size": page_size
+    }
+
+
+def _serve(view, date: str, max_stale: float, deadline: float, response: Response):
+    """Serve a cached view with stale-while-revalidate; freshness is reported in the Age and X-Result-Stale headers"""
+    try:
+        served = view.serve(date, max_stale, deadline)
+    except ComputeTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    response.headers["Age"] = str(int(served.age_seconds))
+    if served.stale:
+        response.headers["X-Result-Stale"] = "true"
+    return served.value
+
+
+def _matrix_page(view, date: str, page: int, page_size: int, status: Optional[List[str]], search: Optional[str],
+                 sort: Optional[str], max_stale: float, deadline: float, response: Response):
+    columns, matrix = _serve(view, date, max_stale, deadline, response)
+    return _query_matrix_page(date, columns, matrix, page, page_size, status, search, sort)
+
+
+def _summary_page(view, date: str, page: int, page_size: int, max_stale: float, deadline: float,
+                  response: Response, current_user: dict, custom_count: Optional[int]):
+    return _paginate_summary(date, _serve(view, date, max_stale, deadline, response), page, page_size,
+                             current_user, custom_count)
+
+
+def _approximate_summary_page(date: str, view_type: str, current_user: dict, custom_count: Optional[int]):
+    period_type = {"weekly": "week", "monthly": "month"}.get(view_type)
+    summary_data = get_approximate_summary(get_view_dates(date, view_type), period_type)
+    return _paginate_summary(date, summary_data, 1, 1, current_user, custom_count)
+
+
+MAX_STALE_QUERY = Query(default=STALE_MAX_AGE_SECONDS, ge=0,
+                        description="Serve a previous result up to this many seconds old while recomputing; 0 waits for fresh data")
+DEADLINE_QUERY = Query(default=REQUEST_DEADLINE_SECONDS, gt=0,
+                       description="Seconds to wait for a computation before falling back to a stale result or 503")
+APPROXIMATE_QUERY = Query(default=False,
+                          description="Estimate distinct users from daily HyperLogLog sketches; the response reports the error bound")
+
+
+@router.get("/sync-status")
+async def sync_status(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                      page: int = Query(default=1, ge=1),
+                      page_size: int = Query(default=10, ge=1),
+                      status: Optional[List[str]] = Query(default=None, description="Filters like silver_vitalsswt:Missing"),
+                      search: Optional[str] = Query(default=None, description="User ID prefix"),
+                      sort: Optional[str] = Query(default=None, description="Column to sort by, '-' prefix for descending"),
+                      max_stale: float = MAX_STALE_QUERY,
+                      deadline: float = DEADLINE_QUERY,
+                      response: Response = None):
+    return await run_analytics(_matrix_page, get_sync_status_matrix, date, page, page_size, status, search, sort,
+                               max_stale, deadline, response)
+
+
+@router.get("/user-vitals")
+async def user_vitals(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                      page: int = Query(default=1, ge=1),
+                      page_size: int = Query(default=10, ge=1),
+                      status: Optional[List[str]] = Query(default=None, description="Filters like HEART_RATE:Missing"),
+                      search: Optional[str] = Query(default=None, description="User ID prefix"),
+                      sort: Optional[str] = Query(default=None, description="Column to sort by, '-' prefix for descending"),
+                      max_stale: float = MAX_STALE_QUERY,
+                      deadline: float = DEADLINE_QUERY,
+                      response: Response = None):
+    return await run_analytics(_matrix_page, get_user_vitals_matrix, date, page, page_size, status, search, sort,
+                               max_stale, deadline, response)
+
+
+@router.get("/sync-status/missing")
+async def sync_status_missing(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                              view_type: str = Query(default="daily", pattern="^(daily|weekly|monthly)$"),
+                              table: str = Query(..., description="Table to check, e.g. silver_vitalsswt"),
+                              reference: str = Query(default="bronze", description="Table the users must be present in")):
+    """Users present in the reference table but missing from another table on the same date, over a period"""
+    date_list = get_view_dates(date, view_type)
+    try:
+        users = await run_analytics(get_missing_users, date_list, table, reference)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "date": date,
+        "view_type": view_type,
+        "table": table,
+        "reference": reference,
+        "total_users": len(users),
+        "users": users
+    }
+
+
+@router.get("/recomputed-dates")
+async def recomputed_dates(limit: int = Query(default=50, ge=1, le=500)):
+    """Dates recently marked dirty by new or changed raw files, with the cached views recomputed for them"""
+    return {"dates": await run_analytics(dirty_dates.recent, limit)}
+
+
+@router.get("/ingestion/status")
+def ingestion_status():
+    """Counters of the ingestion watcher: batches, files and records written, throughput and lag"""
+    return ingest_status.current_stats()
+
+
+@router.get("/summary")
+async def summary(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                  page: int = Query(default=1, ge=1),
+                  page_size: int = Query(default=10, ge=1),
+                  max_stale: float = MAX_STALE_QUERY,
+                  deadline: float = DEADLINE_QUERY,
+                  approximate: bool = APPROXIMATE_QUERY,
+                  response: Response = None,
+                  current_user: dict = Depends(get_current_user)):
+    custom_count = await get_custom_user_count(current_user)
+    if approximate:
+        return await run_analytics(_approximate_summary_page, date, "daily", current_user, custom_count)
+    return await run_analytics(_summary_page, get_summary, date, page, page_size, max_stale, deadline, response,
+                               current_user, custom_count)
+
+@router.get("/summary/weekly")
+async def weekly_summary(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                         page: int = Query(default=1, ge=1),
+                         page_size: int = Query(default=10, ge=1),
+                         max_stale: float = MAX_STALE_QUERY,
+                         deadline: float = DEADLINE_QUERY,
+                         approximate: bool = APPROXIMATE_QUERY,
+                         response: Response = None,
+                         current_user: dict = Depends(get_current_user)):
+    custom_count = await get_custom_user_count(current_user)
+    if approximate:
+        return await run_analytics(_approximate_summary_page, date, "weekly", current_user, custom_count)
+    return await run_analytics(_summary_page, get_weekly_summary, date, page, page_size, max_stale, deadline, response,
+                               current_user, custom_count)
 
 @router.get("/summary/monthly")
-def monthly_summary(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+async def monthly_summary(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                          page: int = Query(default=1, ge=1),
+                          page_size: int = Query(default=10, ge=1),
+                          max_stale: float = MAX_STALE_QUERY,
+                          deadline: float = DEADLINE_QUERY,
+                          approximate: bool = APPROXIMATE_QUERY,
+                          response: Response = None,
+                          current_user: dict = Depends(get_current_user)):
+    custom_count = await get_custom_user_count(current_user)
+    if approximate:
+        return await run_analytics(_approximate_summary_page, date, "monthly", current_user, custom_count)
+    return await run_analytics(_summary_page, get_monthly_summary, date, page, page_size, max_stale, deadline, response,
+                               current_user, custom_count)
+
+@router.get("/summary/range")
+async def range_summary(start: str = Query(..., description="First date, YYYY-MM-DD"),
+                        end: str = Query(..., description="Last date, YYYY-MM-DD (at most a year after start)"),
+                        granularity: str = Query(default="day", pattern="^(day|week|month)$"),
+                        current_user: dict = Depends(get_current_user)):
+    """Summary counts and statuses per day, ISO week or calendar month of a date range, from one scan"""
+    custom_count = await get_custom_user_count(current_user)
+    try:
+        data = await run_analytics(get_range_summary, start, end, granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if custom_count is not None:
+        # Results can be shared between concurrent requests; build new bucket dicts
+        data = {**data, "buckets": [{**bucket, "total_users": custom_count} for bucket in data["buckets"]]}
+    return data
+
+@router.get("/quality")
+async def quality(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                  user_id: Optional[str] = Query(default=None),
+                  vital: Optional[str] = Query(default=None, description="Vital type, e.g. HEART_RATE"),
+                  current_user: dict = Depends(get_current_user)):
+    """Data-quality statistics recorded at ingestion per user and vital type, without reading bronze"""
+    return await run_analytics(quality_stats.get_quality, date, user_id, vital)
+
+@router.get("/anomalies")
+async def anomalies(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                    threshold: float = Query(default=BASELINE_Z_THRESHOLD, gt=0),
+                    min_days: int = Query(default=BASELINE_MIN_DAYS, ge=0),
+                    current_user: dict = Depends(get_current_user)):
+    """Users whose daily record count per vital type deviates from their rolling baseline on a date"""
+    return await run_analytics(baselines.get_anomalies, date, threshold, min_days)
+
+@router.get("/users/{user_id}/timeline")
+async def user_timeline_view(user_id: str,
+                             start: str = Query(..., description="First date, YYYY-MM-DD"),
+                             end: str = Query(..., description="Last date, YYYY-MM-DD (at most a year after start)"),
+                             current_user: dict = Depends(get_current_user)):
+    """Per-day, per-table and per-vital counts and raw files of one user, reading only files that can hold them"""
+    try:
+        return await run_analytics(user_timeline.get_user_timeline, user_id, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/dashboard")
+async def dashboard(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                    view_type: str = Query(default="daily", pattern="^(daily|weekly|monthly)$"),
+                    sections: str = Query(default=",".join(DASHBOARD_SECTIONS)),
                     page: int = Query(default=1, ge=1),
                     page_size: int = Query(default=10, ge=1),
+                    status: Optional[List[str]] = Query(default=None, description="Filters like HEART_RATE:Missing, applied to the matrix holding the column"),
+                    search: Optional[str] = Query(default=None, description="User ID prefix"),
+                    sort: Optional[str] = Query(default=None, description="Column to sort by, '-' prefix for descending"),
                     current_user: dict = Depends(get_current_user)):
-    summary_data = get_monthly_summary(date)
-    
-    # Get user settings for custom user count
+    """Summary, sync-status and user-vitals for one date in a single request, computed from one scan of each source"""
+    requested = [section.strip() for section in sections.split(",") if section.strip()]
+    unknown = [section for section in requested if section not in DASHBOARD_SECTIONS]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"sections must be a comma-separated subset of {', '.join(DASHBOARD_SECTIONS)}")
+    custom_count = await get_custom_user_count(current_user)
+    return await run_analytics(_dashboard_page, date, view_type, requested, page, page_size, status, search, sort,
+                               current_user, custom_count)
+
+def _dashboard_page(date: str, view_type: str, requested: List[str], page: int, page_size: int,
+                    status: Optional[List[str]], search: Optional[str], sort: Optional[str], current_user: dict,
+                    custom_count: Optional[int]):
+    data = get_dashboard(date, view_type, requested, arrow=True)
+    response = {"date": date, "view_type": view_type}
+    if "summary" in data:
+        response["summary"] = _paginate_summary(date, data["summary"], page, page_size, current_user, custom_count)
+    matrices = {section: data[section] for section in ("sync_status", "user_vitals") if section in data}
+    known = {name for _, matrix in matrices.values() for name in matrix.column_names}
+    for name in [condition.partition(":")[0] for condition in status or []] + ([sort.lstrip("-")] if sort else []):
+        if name not in known:
+            raise HTTPException(status_code=400, detail=f"Unknown column '{name}' in the requested matrices")
+    for section, (columns, matrix) in matrices.items():
+        # Filters and the sort name columns of one matrix; each applies only where its column exists
+        section_status = [condition for condition in status or []
+                          if condition.partition(":")[0] in matrix.column_names]
+        section_sort = sort if sort and sort.lstrip("-") in matrix.column_names else None
+        response[section] = _query_matrix_page(date, columns, matrix, page, page_size, section_status,
+                                               search, section_sort)
+    return response
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _with_user_count(event_data: dict, custom_count: Optional[int]) -> dict:
+    summary_data = event_data.get("summary")
+    if custom_count is None or not summary_data or "total_users" not in summary_data:
+        return event_data
+    return {**event_data, "summary": {**summary_data, "total_users": custom_count}}
+
+@router.get("/stream")
+async def stream_dashboard(request: Request,
+                           date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                           view_type: str = Query(default="daily", pattern="^(daily|weekly|monthly)$"),
+                           page: int = Query(default=1, ge=1),
+                           page_size: int = Query(default=10, ge=1),
+                           current_user: dict = Depends(get_stream_user)):
+    """
+    Server-Sent Events feed of the dashboard for a date: a "snapshot" event with the requested
+    page of each matrix, then "update" events carrying only the aggregates that changed when
+    new data lands
+    """
+    key = (date, view_type)
+    custom_count = await get_custom_user_count(current_user)
+    subscriber = live_hub.subscribe(key, asyncio.get_running_loop(), page, page_size)
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT setting_key, setting_value 
-            FROM user_settings 
-            WHERE user_id = %s AND setting_key IN ('user_count_logic', 'custom_user_count')
-        """, (current_user['id'],))
-        
-        settings = {}
-        for row in cursor.fetchall():
-            settings[row['setting_key']] = row['setting_value']
-        
-        cursor.close()
-        conn.close()
-        
-        # Apply custom user count if settings indicate custom input
-        if (settings.get('user_count_logic') == 'custom_input' and 
-            settings.get('custom_user_count') and 
-            settings['custom_user_count'].isdigit()):
-            custom_count = int(settings['custom_user_count'])
-            if custom_count > 0:
-                summary_data['total_users'] = custom_count
-                print(f"Applied custom user count: {custom_count} for user {current_user['username']}")
-        
-    except Exception as e:
-        print(f"Error applying user settings in monthly summary: {e}")
-        # Continue with default behavior if settings can't be applied
+        # Computed before the response starts so a saturated analytics pool is still a plain 503
+        snapshot = await run_analytics(live_hub.snapshot, key)
+    except BaseException:
+        live_hub.unsubscribe(subscriber)
+        raise
     
-    # If summary_data contains a list of users, paginate it. Otherwise, return as is with pagination info.
-    if isinstance(summary_data, dict) and 'users' in summary_data and isinstance(summary_data['users'], list):
-        all_users = summary_data['users']
-        total_users = summary_data.get('total_users', len(all_users))
-        total_pages = (total_users + page_size - 1) // page_size
-        start = (page - 1) * page_size
-        end = start + page_size
-        paginated_users = all_users[start:end]
-        summary_data['users'] = paginated_users
-        summary_data['total_users'] = total_users
-        summary_data['total_pages'] = total_pages
-        summary_data['page'] = page
-        summary_data['page_size'] = page_size
-    return {"date": date, **summary_data}
+    async def events():
+        try:
+            yield _sse("snapshot", _with_user_count(subscriber.snapshot(snapshot), custom_count))
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event["event"], _with_user_count(event["data"], custom_count))
+        finally:
+            live_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def _not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+def _iter_file(f, chunk_size: int = 64 * 1024):
+    with f:
+        while chunk := f.read(chunk_size):
+            yield chunk
 
 @router.get("/summary/export")
-def export_summary_excel(
+async def export_summary_excel(
     date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
-    view_type: str = Query(default="daily", regex="^(daily|weekly|monthly)$"),
+    view_type: str = Query(default="daily", pattern="^(daily|weekly|monthly)$"),
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Export summary data to Excel file"""
+    custom_count = await get_custom_user_count(current_user)
+    return await run_analytics(_export_summary_excel, date, view_type, if_none_match, current_user, custom_count)
+
+def _export_summary_excel(date: str, view_type: str, if_none_match: Optional[str], current_user: dict,
+                          custom_count: Optional[int]):
     try:
         print(f"Export request - Date: {date}, View Type: {view_type}, User: {current_user['username']}")
         
+        # The workbook only depends on these inputs, so identical downloads share one cached file
+        date_list = get_view_dates(date, view_type)
+        cache_key = export_cache.make_key(
+            view="summary",
+            view_type=view_type,
+            dates=date_list,
+            tables=get_table_identities(),
+            raw=get_raw_manifest_digest(date_list),
+            user_count=custom_count
+        )
+        etag = f'"{cache_key}"'
+        filename = f"etl_summary_{view_type}_{date}.xlsx"
+        headers = {"Content-Disposition": f"attachment; filename={filename}", "ETag": etag}
+        
+        if _not_modified(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        cached = export_cache.open_entry(cache_key, "xlsx")
+        if cached:
+            print(f"Serving cached Excel export {cache_key}")
+            with cached:
+                return Response(content=cached.read(), media_type=XLSX_MEDIA_TYPE, headers=headers)
+        
         # Get summary data based on view type
         if view_type == "weekly":
             summary_data = get_weekly_summary(date)
@@ -264,36 +480,8 @@ def export_summary_excel(
         
         print(f"Summary data retrieved: {summary_data}")
         
-        # Get user settings for custom user count
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute("""
-                SELECT setting_key, setting_value 
-                FROM user_settings 
-                WHERE user_id = %s AND setting_key = 'user_count_logic'
-            """, (current_user['id'],))
-            
-            user_count_logic_result = cursor.fetchone()
-            user_count_logic = user_count_logic_result['setting_value'] if user_count_logic_result else 'default'
-            
-            if user_count_logic == 'custom_input':
-                cursor.execute("""
-                    SELECT setting_key, setting_value 
-                    FROM user_settings 
-                    WHERE user_id = %s AND setting_key = 'custom_user_count'
-                """, (current_user['id'],))
-                
-                custom_count_result = cursor.fetchone()
-                if custom_count_result:
-                    custom_count = int(custom_count_result['setting_value'])
-                    summary_data['total_users'] = custom_count
-            
-            cursor.close()
-            conn.close()
-        except Exception as e:
-            print(f"Error applying user settings: {e}")
+        if custom_count is not None:
+            summary_data = {**summary_data, 'total_users': custom_count}
         
         # Generate date range string
         if view_type == "daily":
@@ -307,16 +495,14 @@ def export_summary_excel(
         
         # Create Excel file
         excel_data = create_summary_excel(summary_data, view_type, date_range)
-        
-        # Generate filename
-        filename = f"etl_summary_{view_type}_{date}.xlsx"
+        export_cache.store(cache_key, "xlsx", excel_data)
         
         print(f"Excel file created successfully, size: {len(excel_data)} bytes")
         
         return Response(
             content=excel_data,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            media_type=XLSX_MEDIA_TYPE,
+            headers=headers
         )
         
     except Exception as e:
@@ -325,50 +511,130 @@ def export_summary_excel(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to export Excel file: {str(e)}")
 
+MAX_EXPORT_DAYS = 366
+
+def _export_dates(date: str, end_date: Optional[str]):
+    """Resolve the date or date range of a matrix export, rejecting bad or oversized ranges."""
+    try:
+        date_list = get_range_dates(date, end_date or date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date range: {e}")
+    if len(date_list) > MAX_EXPORT_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range cannot exceed {MAX_EXPORT_DAYS} days")
+    return date_list
+
+def _stream_matrix(name: str, build_matrix, date_list, format: str, if_none_match: Optional[str]):
+    media_type, extension = EXPORT_FORMATS[format]
+    suffix = date_list[0] if len(date_list) == 1 else f"{date_list[0]}_{date_list[-1]}"
+    filename = f"etl_{name}_{suffix}.{extension}"
+    cache_key = export_cache.make_key(view=name, dates=date_list, tables=get_table_identities(), format=format)
+    etag = f'"{cache_key}"'
+    headers = {"Content-Disposition": f"attachment; filename={filename}", "ETag": etag}
+    
+    if _not_modified(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    cached = export_cache.open_entry(cache_key, extension)
+    if cached:
+        content = _iter_file(cached)
+    else:
+        content = export_cache.store_stream(cache_key, extension, iter_table_bytes(build_matrix(date_list), format))
+    return StreamingResponse(content, media_type=media_type, headers=headers)
+
+@router.get("/sync-status/export")
+async def export_sync_status(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                             end_date: Optional[str] = Query(default=None),
+                             format: str = Query(default="csv", pattern="^(csv|parquet|arrow)$"),
+                             if_none_match: Optional[str] = Header(None),
+                             current_user: dict = Depends(get_current_user)):
+    """Export the full sync-status matrix, one row per (ingestion_date, user_id)"""
+    date_list = _export_dates(date, end_date)
+    return await run_analytics(_stream_matrix, "sync_status", build_sync_matrix, date_list, format, if_none_match)
+
+@router.get("/user-vitals/export")
+async def export_user_vitals(date: str = Query(default=datetime.today().strftime('%Y-%m-%d')),
+                             end_date: Optional[str] = Query(default=None),
+                             format: str = Query(default="csv", pattern="^(csv|parquet|arrow)$"),
+                             if_none_match: Optional[str] = Header(None),
+                             current_user: dict = Depends(get_current_user)):
+    """Export the full user-vitals matrix, one row per (ingestion_date, user_id)"""
+    date_list = _export_dates(date, end_date)
+    return await run_analytics(_stream_matrix, "user_vitals", build_vitals_matrix, date_list, format, if_none_match)
+
+class ExportJobRequest(BaseModel):
+    date: str = datetime.today().strftime('%Y-%m-%d')
+    view_type: str = "daily"
+    sheets: List[str] = list(export_jobs.REPORT_SHEETS)
+
+def _job_response(job: dict):
+    public = {key: value for key, value in job.items() if key not in ("owner_id", "cache_key")}
+    if job["status"] == "completed":
+        public["download_url"] = f"/api/exports/{job['job_id']}/download"
+    return public
+
+def _get_owned_job(job_id: str, current_user: dict):
+    job = export_jobs.get_job(job_id)
+    if job is None or job["owner_id"] != current_user['id']:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+@router.post("/exports", status_code=202)
+async def submit_export_job(request: ExportJobRequest, current_user: dict = Depends(get_current_user)):
+    """Queue a multi-sheet report workbook built in the background"""
+    if request.view_type not in ("daily", "weekly", "monthly"):
+        raise HTTPException(status_code=400, detail="view_type must be daily, weekly or monthly")
+    custom_count = await get_custom_user_count(current_user)
+    try:
+        # Keying the job opens every table and lists the raw files; keep that off the event loop
+        job = await run_analytics(
+            export_jobs.submit_report,
+            current_user['id'],
+            request.view_type,
+            request.date,
+            request.sheets,
+            custom_count=custom_count
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except export_jobs.ExportQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return _job_response(job)
+
+@router.get("/exports/{job_id}")
+def get_export_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Status and progress of a background export"""
+    return _job_response(_get_owned_job(job_id, current_user))
+
+@router.get("/exports/{job_id}/download")
+def download_export_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Download the workbook of a completed background export"""
+    job = _get_owned_job(job_id, current_user)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}")
+    cached = export_cache.open_entry(job["cache_key"], "xlsx")
+    if not cached:
+        raise HTTPException(status_code=410, detail="Export file has expired, please submit the export again")
+    return StreamingResponse(
+        _iter_file(cached),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={job['filename']}", "ETag": f'"{job["cache_key"]}"'}
+    )
+
 @router.get("/user-settings")
-def get_user_settings(current_user: dict = Depends(get_current_user)):
+async def get_user_settings(current_user: dict = Depends(get_current_user)):
     try:
         print(f"Current user: {current_user}")  # Debug log
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT setting_key, setting_value 
-            FROM user_settings 
-            WHERE user_id = %s
-        """, (current_user['id'],))
-        
-        settings = {}
-        for row in cursor.fetchall():
-            settings[row['setting_key']] = row['setting_value']
-        
-        cursor.close()
-        conn.close()
-        return settings
+        return await get_repository().get_settings(current_user['id'])
         
     except Exception as e:
         print(f"Error in get_user_settings: {e}")  # Add debug logging
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/user-settings")
-def update_user_settings(settings: Dict[str, Any], current_user: dict = Depends(get_current_user)):
+async def update_user_settings(settings: Dict[str, Any], current_user: dict = Depends(get_current_user)):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Update or insert each setting
-        for key, value in settings.items():
-            cursor.execute("""
-                INSERT INTO user_settings (user_id, setting_key, setting_value) 
-                VALUES (%s, %s, %s)
-                ON DUPLICATE KEY UPDATE setting_value = VALUES(setting_value)
-            """, (current_user['id'], key, str(value)))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+        await get_repository().save_settings(current_user['id'], settings)
         return {"message": "Settings updated successfully"}
         
     except Exception as e:
@@ -376,37 +642,40 @@ def update_user_settings(settings: Dict[str, Any], current_user: dict = Depends(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/test-settings")
-def test_settings():
+async def test_settings():
     """Temporary test endpoint to check database connection"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("SELECT COUNT(*) as count FROM user_settings")
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
-        return {"message": "Database connection successful", "settings_count": result['count']}
+        count = await get_repository().count_settings()
+        return {"message": "Database connection successful", "settings_count": count}
         
     except Exception as e:
         print(f"Error in test_settings: {e}")
         return {"error": str(e)}
 
+# --- ADMIN PROFILING ENDPOINTS ---
+@router.get("/admin/profiles/{profile_id}")
+def admin_get_profile(profile_id: str,
+                      format: str = Query(default="json", pattern="^(json|folded)$"),
+                      admin_user: dict = Depends(get_admin_user)):
+    """
+    A request profile captured with ?profile=1 or the X-Profile header.
+    format=folded returns the raw folded stacks for flame graph tools.
+    """
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse(profile["folded"])
+    return profile
+
 # --- ADMIN USER MANAGEMENT ENDPOINTS ---
 @router.get("/admin/users")
-def admin_get_users():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, username, nickname, full_name, password_hash FROM users")
-    users = cursor.fetchall()
-    cursor.close()
-    conn.close()
+async def admin_get_users():
+    users = await get_repository().list_users()
     return {"users": users}
 
 @router.post("/admin/users")
-def admin_add_user(data: dict = Body(...)):
+async def admin_add_user(data: dict = Body(...)):
     username = data.get('username')
     password = data.get('password')
     nickname = data.get('nickname')
@@ -419,26 +688,15 @@ def admin_add_user(data: dict = Body(...)):
     if not is_valid:
         return {"error": f"Password validation failed: {'; '.join(errors)}"}
     
-    import bcrypt
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    hashed = await hash_password(password)
     try:
-        cursor.execute("INSERT INTO users (username, nickname, full_name, password_hash) VALUES (%s, %s, %s, %s)",
-                       (username, nickname, full_name, hashed))
-        conn.commit()
-        user_id = cursor.lastrowid
+        user_id = await get_repository().create_user(username, hashed, nickname, full_name)
     except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
         return {"error": str(e)}
-    cursor.close()
-    conn.close()
     return {"success": True, "user_id": user_id}
 
 @router.put("/admin/users/{user_id}")
-def admin_update_user(user_id: int, data: dict = Body(...)):
+async def admin_update_user(user_id: int, data: dict = Body(...)):
     username = data.get('username')
     password = data.get('password')
     nickname = data.get('nickname')
@@ -450,39 +708,17 @@ def admin_update_user(user_id: int, data: dict = Body(...)):
         if not is_valid:
             return {"error": f"Password validation failed: {'; '.join(errors)}"}
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    hashed = await hash_password(password) if password else None
     try:
-        if password:
-            import bcrypt
-            hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-            cursor.execute("UPDATE users SET username=%s, nickname=%s, full_name=%s, password_hash=%s WHERE id=%s",
-                           (username, nickname, full_name, hashed, user_id))
-        else:
-            cursor.execute("UPDATE users SET username=%s, nickname=%s, full_name=%s WHERE id=%s",
-                           (username, nickname, full_name, user_id))
-        conn.commit()
+        await get_repository().update_user(user_id, username, nickname, full_name, hashed)
     except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
         return {"error": str(e)}
-    cursor.close()
-    conn.close()
     return {"success": True}
 
 @router.delete("/admin/users/{user_id}")
-def admin_delete_user(user_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def admin_delete_user(user_id: int):
     try:
-        cursor.execute("DELETE FROM users WHERE id=%s", (user_id,))
-        conn.commit()
+        await get_repository().delete_user(user_id)
     except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
         return {"error": str(e)}
-    cursor.close()
-    conn.close()
     return {"success": True}
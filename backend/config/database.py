@@ -1,5 +1,4 @@
 import os
-import mysql.connector
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -13,11 +12,16 @@ MYSQL_CONFIG = {
     'database': os.getenv('MYSQL_DATABASE', 'etl_monitoring')
 }
 
+# User store backend: "mysql" (async connection pool) or "sqlite" (local stand-in for tests and benchmarks)
+USER_DB_BACKEND = os.getenv('USER_DB_BACKEND', 'mysql').lower()
+USER_DB_SQLITE_PATH = os.getenv('USER_DB_SQLITE_PATH', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'users.sqlite3'))
+
+# Async MySQL connection pool bounds
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+
 # JWT configuration
 SECRET_KEY = os.getenv('SECRET_KEY', 'supersecretkey')  # Change this in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
-
-def get_db_connection():
-    """Get a MySQL database connection"""
-    return mysql.connector.connect(**MYSQL_CONFIG) 
\ No newline at end of file
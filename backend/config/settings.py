@@ -0,0 +1,99 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Export cache configuration
+EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'exports'))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv('EXPORT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Background export jobs
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', '2'))
+EXPORT_MAX_PENDING = int(os.getenv('EXPORT_MAX_PENDING', '20'))
+EXPORT_JOB_TTL_SECONDS = int(os.getenv('EXPORT_JOB_TTL_SECONDS', '3600'))
+
+# Live dashboard updates (Server-Sent Events)
+LIVE_POLL_SECONDS = float(os.getenv('LIVE_POLL_SECONDS', '5'))
+LIVE_QUEUE_SIZE = int(os.getenv('LIVE_QUEUE_SIZE', '16'))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv('LIVE_HEARTBEAT_SECONDS', '15'))
+
+# Users allowed to call admin-only API features (comma separated usernames)
+ADMIN_USERNAMES = {name.strip() for name in os.getenv('ADMIN_USERNAMES', '').split(',') if name.strip()}
+
+# On-demand request profiling
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'cache', 'profiles'))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.001'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+
+# Prewarm Delta tables, the raw manifest and current summaries in the background at startup
+WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes')
+
+# Computed aggregates shared between worker processes through a local SQLite file
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', os.path.join(BASE_DIR, 'cache', 'results.sqlite3'))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv('RESULT_CACHE_TTL_SECONDS', '3600'))
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+RESULT_CACHE_LOCK_SECONDS = float(os.getenv('RESULT_CACHE_LOCK_SECONDS', '60'))
+
+# Stale-while-revalidate: serve the previous result of a view for up to this many seconds after its
+# sources change while the new one is computed in the background (0 always waits for fresh data)
+STALE_MAX_AGE_SECONDS = float(os.getenv('STALE_MAX_AGE_SECONDS', '300'))
+# How long a request waits for a computation before falling back to stale data or a 503
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', '15'))
+RECOMPUTE_WORKERS = int(os.getenv('RECOMPUTE_WORKERS', '4'))
+
+# Dedicated pool for Delta/Arrow/Excel work, with admission control
+ANALYTICS_WORKERS = int(os.getenv('ANALYTICS_WORKERS', '4'))
+ANALYTICS_MAX_QUEUE = int(os.getenv('ANALYTICS_MAX_QUEUE', '32'))
+ANALYTICS_RETRY_AFTER_SECONDS = int(os.getenv('ANALYTICS_RETRY_AFTER_SECONDS', '5'))
+
+# Engine for the per-table aggregation behind summaries and matrices: arrow, pandas or duckdb
+QUERY_BACKEND = os.getenv('QUERY_BACKEND', 'arrow').lower()
+
+# Per-(date, user) row counts of the Delta tables kept in delta_tables/_aggregates and advanced from
+# the transaction log, so summaries do not reload whole tables after every commit
+AGGREGATE_STORE_ENABLED = os.getenv('AGGREGATE_STORE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Late-arriving raw files: how often data/ is checked for new or changed .gz files (0 disables the
+# background check), where the last seen listing is kept, and how many recomputed dates are listed
+DIRTY_CHECK_SECONDS = float(os.getenv('DIRTY_CHECK_SECONDS', '30'))
+DIRTY_STATE_PATH = os.getenv('DIRTY_STATE_PATH', os.path.join(BASE_DIR, 'cache', 'raw_listing.json'))
+DIRTY_HISTORY_SIZE = int(os.getenv('DIRTY_HISTORY_SIZE', '200'))
+
+# Ingestion watcher: new raw files are appended to the Delta tables in micro-batches closed at
+# INGEST_BATCH_MAX_FILES files, INGEST_BATCH_MAX_BYTES bytes or INGEST_BATCH_MAX_SECONDS after the
+# oldest file arrived. INGEST_WATCH_ENABLED runs it inside the API process; it can also be started
+# on its own with `python data_ingestion/watcher.py`.
+INGEST_WATCH_ENABLED = os.getenv('INGEST_WATCH_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+INGEST_BATCH_MAX_FILES = int(os.getenv('INGEST_BATCH_MAX_FILES', '500'))
+INGEST_BATCH_MAX_BYTES = int(os.getenv('INGEST_BATCH_MAX_BYTES', str(64 * 1024 * 1024)))
+INGEST_BATCH_MAX_SECONDS = float(os.getenv('INGEST_BATCH_MAX_SECONDS', '2'))
+# Polling fallback when inotify is unavailable
+INGEST_POLL_SECONDS = float(os.getenv('INGEST_POLL_SECONDS', '1'))
+# A batch that fails is retried after 2, 4, 8, ... seconds, at most INGEST_RETRY_MAX_SECONDS apart
+INGEST_RETRY_MAX_SECONDS = float(os.getenv('INGEST_RETRY_MAX_SECONDS', '300'))
+
+# Upsert ingestion: instead of wiping the tables (load_bronze) or appending (watcher), records are
+# merged on INGEST_MERGE_KEY so re-delivered raw files replace their earlier rows
+INGEST_UPSERT = os.getenv('INGEST_UPSERT', 'false').lower() in ('1', 'true', 'yes')
+INGEST_MERGE_KEY = [name.strip() for name in os.getenv('INGEST_MERGE_KEY', 'user_id,type,timestamp').split(',')
+                    if name.strip()]
+
+# Data-quality profiling at ingestion: plausible value range per vital type, as
+# "TYPE:min:max,...", and how far a record's timestamp may fall outside its ingestion day
+# before it counts as clock skew
+QUALITY_VALUE_RANGES = {
+    parts[0].strip(): (float(parts[1]), float(parts[2]))
+    for parts in (spec.split(':') for spec in os.getenv(
+        'QUALITY_VALUE_RANGES', 'HEART_RATE:30:220,BLOOD_OXYGEN:70:100').split(',') if spec.strip())
+}
+QUALITY_CLOCK_SKEW_SECONDS = float(os.getenv('QUALITY_CLOCK_SKEW_SECONDS', '3600'))
+
+# Per-user ingestion baselines: EWMA smoothing factor of daily record counts per vital type, days
+# of history before a user can be flagged, and the deviation (in standard deviations) flagged
+BASELINE_ALPHA = float(os.getenv('BASELINE_ALPHA', '0.1'))
+BASELINE_MIN_DAYS = int(os.getenv('BASELINE_MIN_DAYS', '7'))
+BASELINE_Z_THRESHOLD = float(os.getenv('BASELINE_Z_THRESHOLD', '3'))
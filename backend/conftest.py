@@ -9,4 +9,69 @@ def db_config():
         'user': 'test_user',
         'password': 'test_password',
         'database': 'etl_monitoring_test'
-    } 
\ No newline at end of file
+    } 
+
+@pytest.fixture(autouse=True)
+def result_cache_path(tmp_path, monkeypatch):
+    """Keep every test's shared result cache in its own SQLite file."""
+    from services import result_cache
+    path = str(tmp_path / 'results.sqlite3')
+    monkeypatch.setattr(result_cache, 'RESULT_CACHE_PATH', path)
+    return path
+
+SAMPLE_DATES = {
+    # date -> epoch ms used in raw file names
+    '2025-07-28': 1753704000000,
+    '2025-07-29': 1753790400000,
+}
+
+# (user_id, date) -> vital types, one record each
+SAMPLE_RECORDS = {
+    ('userA', '2025-07-28'): ['HEART_RATE', 'STEPS'],
+    ('userB', '2025-07-28'): ['HEART_RATE'],
+    ('userA', '2025-07-29'): ['STEPS'],
+    ('userC', '2025-07-29'): ['HEART_RATE', 'STEPS', 'BLOOD_OXYGEN'],
+}
+
+@pytest.fixture
+def sample_lake(tmp_path, monkeypatch):
+    """Small raw directory and Delta lake shaped like load_bronze output.
+
+    userC is left out of silver_vitalsswt so its silver counts never reconcile.
+    """
+    import gzip
+    import json
+    import pandas as pd
+    from deltalake import write_deltalake
+    from services import delta_reader
+
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    rows = []
+    for (user_id, date), types in SAMPLE_RECORDS.items():
+        records = [{'type': t, 'value': 70 + i, 'timestamp': SAMPLE_DATES[date] + i * 1000}
+                   for i, t in enumerate(types)]
+        with gzip.open(data_dir / f"{user_id}_{SAMPLE_DATES[date]}.gz", 'wt', encoding='utf-8') as f:
+            json.dump(records, f)
+        rows.extend({**r, 'user_id': user_id, 'ingestion_date': date} for r in records)
+    df = pd.DataFrame(rows)
+
+    table_paths = {name: str(tmp_path / 'delta_tables' / name) for name in delta_reader.TABLE_PATHS}
+    for name, path in table_paths.items():
+        frame = df[df['user_id'] != 'userC'] if name == 'silver_vitalsswt' else df
+        write_deltalake(path, frame.reset_index(drop=True), mode='overwrite')
+
+    monkeypatch.setattr(delta_reader, 'TABLE_PATHS', table_paths)
+    monkeypatch.setattr(delta_reader, 'DATA_DIR', str(data_dir))
+    return {'data_dir': str(data_dir), 'table_paths': table_paths, 'records': df}
+
+@pytest.fixture
+def user_store(tmp_path):
+    """Auth, settings and admin endpoints backed by a throwaway SQLite database instead of MySQL."""
+    import asyncio
+    from services import user_repository
+    repository = user_repository.SQLiteUserRepository(str(tmp_path / 'users.sqlite3'))
+    user_repository.set_repository(repository)
+    yield repository
+    user_repository.set_repository(None)
+    asyncio.run(repository.close())
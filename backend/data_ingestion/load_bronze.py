@@ -1,11 +1,20 @@
 import pandas as pd
+import pyarrow as pa
+from deltalake import DeltaTable
 from deltalake.writer import write_deltalake
 import os
+import sys
 import shutil
+import argparse
 import gzip
 import json
 from datetime import datetime, UTC
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import INGEST_UPSERT, INGEST_MERGE_KEY
+from services import presence_index, delta_reader, user_sketches, ingest_status, quality_stats, baselines
+
 def read_gzipped_json(filename):
     with gzip.open(filename, 'rt', encoding='utf-8') as f:
         return json.load(f)
@@ -32,42 +41,127 @@ def extract_user_and_date_from_filename(filename):
         date_str = ''
     return user_id, date_str
 
-def load_bronze_and_silver_from_gz():
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_dir = os.path.join(BASE_DIR, 'data')
-    files = [os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith('.gz')]
+def get_table_paths(base_dir):
+    return {
+        'bronze': os.path.join(base_dir, 'delta_tables', 'bronze'),
+        'silver_rrbucket': os.path.join(base_dir, 'delta_tables', 'silver_rrbucket'),
+        'silver_vitalsbaseline': os.path.join(base_dir, 'delta_tables', 'silver_vitalsbaseline'),
+        'silver_vitalsswt': os.path.join(base_dir, 'delta_tables', 'silver_vitalsswt'),
+    }
+
+def read_records(files, source_column=None):
+    """
+    Records of the given .gz files as one flattened DataFrame, tagged with user_id and
+    ingestion_date (and with the file name in source_column when given)
+    """
     all_records = []
     for file in files:
         user_id, ingestion_date = extract_user_and_date_from_filename(file)
         records = read_gzipped_json(file)
-        if isinstance(records, list):
-            for rec in records:
-                rec['user_id'] = user_id
-                rec['ingestion_date'] = ingestion_date
-            all_records.extend(records)
-        else:
-            records['user_id'] = user_id
-            records['ingestion_date'] = ingestion_date
-            all_records.append(records)
+        if not isinstance(records, list):
+            records = [records]
+        for rec in records:
+            rec['user_id'] = user_id
+            rec['ingestion_date'] = ingestion_date
+            if source_column:
+                rec[source_column] = os.path.basename(file)
+        all_records.extend(records)
     df = pd.DataFrame(all_records)
 
     # Flatten dict columns
     df = flatten_dict_column(df, 'deviceInfo', 'device_')
     df = flatten_dict_column(df, 'metadata', 'meta_')
+    return df
+
+def read_profiled_records(files):
+    """Records of the given .gz files and their data-quality statistics per file and vital type"""
+    df = read_records(files, source_column=quality_stats.SOURCE_COLUMN)
+    quality = quality_stats.profile(quality_stats.records_table(df))
+    return df.drop(columns=[quality_stats.SOURCE_COLUMN]), quality
+
+def _sql_string(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+def merge_records(path, df, key_columns=INGEST_MERGE_KEY, commit_properties=None):
+    """
+    Upsert df into the Delta table at path: rows matching on key_columns (nulls match nulls) are
+    replaced, the rest inserted. The merge predicate is limited to the ingestion dates in df, so
+    only data files whose ingestion_date statistics overlap them are read and rewritten.
+    Returns the merge metrics.
+    """
+    missing = [column for column in key_columns if column not in df.columns]
+    if missing:
+        raise ValueError(f"Merge key columns missing from the records: {missing}")
+    # A record delivered twice in one batch must not match the same table row twice
+    df = df.drop_duplicates(subset=key_columns, keep='last').reset_index(drop=True)
+    if not os.path.exists(os.path.join(path, '_delta_log')):
+        write_deltalake(path, df, mode='overwrite', commit_properties=commit_properties)
+        return {'num_target_rows_inserted': len(df), 'num_target_rows_updated': 0}
+    dates = ", ".join(_sql_string(date_str) for date_str in sorted(df['ingestion_date'].dropna().unique()))
+    predicate = " AND ".join([f't."ingestion_date" IN ({dates})'] +
+                             [f'(t."{column}" IS NOT DISTINCT FROM s."{column}")' for column in key_columns])
+    return (DeltaTable(path)
+            .merge(pa.Table.from_pandas(df, preserve_index=False), predicate,
+                   source_alias='s', target_alias='t', merge_schema=True, commit_properties=commit_properties)
+            .when_matched_update_all()
+            .when_not_matched_insert_all()
+            .execute())
+
+def cluster_records(df):
+    """
+    Rows ordered by ingestion date, then user. Each data file then covers a narrow ingestion_date
+    range, so upsert merges (limited to the dates they bring) leave other dates' files untouched;
+    within a date, user_id statistics stay narrow for per-user reads (the user timeline).
+    """
+    return df.sort_values(['ingestion_date', 'user_id'], kind='stable').reset_index(drop=True)
+
+def load_bronze_and_silver_from_gz(upsert=INGEST_UPSERT):
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_dir = os.path.join(BASE_DIR, 'data')
+    files = [os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith('.gz')]
+    df, quality = read_profiled_records(files)
+    df = cluster_records(df)
 
     # Write to bronze and all silver tables
-    table_paths = {
-        'bronze': os.path.join(BASE_DIR, 'delta_tables', 'bronze'),
-        'silver_rrbucket': os.path.join(BASE_DIR, 'delta_tables', 'silver_rrbucket'),
-        'silver_vitalsbaseline': os.path.join(BASE_DIR, 'delta_tables', 'silver_vitalsbaseline'),
-        'silver_vitalsswt': os.path.join(BASE_DIR, 'delta_tables', 'silver_vitalsswt'),
-    }
+    table_paths = get_table_paths(BASE_DIR)
     for name, path in table_paths.items():
+        if upsert:
+            metrics = merge_records(path, df)
+            print(f"[SUCCESS] Data merged into Delta table: {name} "
+                  f"({metrics['num_target_rows_inserted']} inserted, {metrics['num_target_rows_updated']} updated)")
+            continue
         if os.path.exists(path):
             shutil.rmtree(path)
         os.makedirs(path, exist_ok=True)
         write_deltalake(path, df, mode='overwrite')
         print(f"[SUCCESS] Data loaded into Delta table: {name}")
 
+    # Null rates, value ranges and timestamp spread per raw file and vital type, served by /api/quality
+    quality_stats.write(table_paths, quality, overwrite=not upsert)
+    print(f"[SUCCESS] Quality statistics written: {quality_stats.quality_path(table_paths)}")
+
+    # Per-user EWMA baselines of daily counts; only days whose counts changed are replayed
+    baselines.current()
+    print(f"[SUCCESS] Ingestion baselines updated: {baselines.baseline_path(table_paths)}")
+
+    # Per-date user presence bitmaps, read by the sync-status and vitals views
+    presence_index.rebuild(table_paths)
+    print(f"[SUCCESS] Presence index written: {presence_index.index_path(table_paths)}")
+
+    # Per-date HyperLogLog sketches of user IDs, read by approximate summaries. Recreated tables
+    # restart their versions, so nothing from earlier sketches can be reused; merged tables keep
+    # their history and only the changed dates are re-sketched.
+    if upsert:
+        delta_reader.current_user_sketches()
+    else:
+        delta_reader.rebuild_user_sketches()
+    print(f"[SUCCESS] User sketches written: {user_sketches.sketch_path(table_paths)}")
+
+    # The tables now hold (at least) these files; the ingestion watcher appends anything newer
+    ingest_status.record_ingested(table_paths, files, replace=not upsert)
+
 if __name__ == "__main__":
-    load_bronze_and_silver_from_gz()
+    parser = argparse.ArgumentParser(description="Load the raw files into bronze and the silver tables")
+    parser.add_argument("--upsert", action="store_true", default=INGEST_UPSERT,
+                        help=f"merge on {', '.join(INGEST_MERGE_KEY)} instead of recreating the tables")
+    load_bronze_and_silver_from_gz(upsert=parser.parse_args().upsert)
@@ -0,0 +1,391 @@
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+import argparse
+import threading
+from deltalake import DeltaTable, CommitProperties
+from deltalake.writer import write_deltalake
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import (INGEST_BATCH_MAX_FILES, INGEST_BATCH_MAX_BYTES, INGEST_BATCH_MAX_SECONDS,
+                             INGEST_POLL_SECONDS, INGEST_UPSERT, INGEST_RETRY_MAX_SECONDS)
+from data_ingestion.load_bronze import get_table_paths, read_profiled_records, merge_records
+from services import ingest_status, quality_stats
+from utils.files import try_lock
+
+# Continuous ingestion. Instead of rebuilding every table from all raw files, new .gz files in
+# data/ are picked up as they land and appended to bronze and the silver tables in micro-batches.
+# A batch is written when it holds INGEST_BATCH_MAX_FILES files or INGEST_BATCH_MAX_BYTES bytes,
+# or INGEST_BATCH_MAX_SECONDS after its oldest file arrived, so a burst becomes a few large Delta
+# commits and a trickle still lands within seconds.
+#
+# New files are reported by inotify (closed after writing or moved in) on Linux; elsewhere the
+# directory is listed every INGEST_POLL_SECONDS and a file is taken once its size and mtime held
+# still for a whole poll. Files already in the tables are known from ingest_status, so on start the
+# watcher catches up with whatever arrived while it was down. Throughput and lag (file mtime to
+# commit) are written to ingest_status for /metrics and /api/ingestion/status.
+#
+# A batch commits to one table after another, so a failure can leave it in some tables only. It is
+# then retried after an exponential backoff as the same batch: every commit is tagged with the
+# batch ID, and tables whose history already holds that ID are skipped, so no table gets the
+# records twice. Batches left in flight by a crash are retried the same way on the next start.
+# Only one process watches a lake: the watcher holds a lock file next to the tables, and API
+# workers that find it taken do not start theirs.
+#
+# Readers need nothing else: the aggregate store and user sketches follow the new table versions
+# incrementally, and the presence index is ignored (tables are scanned) once their versions move on.
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len]
+_EVENT = struct.Struct("iIII")
+
+
+class InotifySource:
+    """Names of files closed after writing or moved into a directory, from Linux inotify"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout):
+        """Names reported within timeout seconds (empty when none)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, _, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """Names of files whose size and mtime did not change between two listings of a directory"""
+
+    def __init__(self, directory, poll_seconds: float = INGEST_POLL_SECONDS):
+        self.directory = directory
+        self.poll_seconds = poll_seconds
+        # {name: [size, mtime_ns]} at the previous listing, and as last reported
+        self.previous = {}
+        self.reported = {}
+
+    def _listing(self):
+        files = {}
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.gz'):
+                        stat = entry.stat()
+                        files[entry.name] = [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            pass
+        return files
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.poll_seconds))
+        current = self._listing()
+        names = [name for name, signature in current.items()
+                 if self.previous.get(name) == signature and self.reported.get(name) != signature]
+        for name in names:
+            self.reported[name] = current[name]
+        self.previous = current
+        return names
+
+    def close(self):
+        pass
+
+
+def open_source(directory, poll: bool = False):
+    """inotify where available, polling otherwise (or when asked for)"""
+    if not poll:
+        try:
+            return InotifySource(directory)
+        except OSError as e:
+            print(f"inotify unavailable ({e}); polling {directory} every {INGEST_POLL_SECONDS}s")
+    return PollingSource(directory)
+
+
+# Commit metadata key holding the ID of the watcher batch that wrote a commit
+BATCH_METADATA_KEY = "etl_ingest_batch"
+
+
+def table_version(path):
+    """Current version of a Delta table, None before it exists"""
+    if not os.path.exists(os.path.join(path, "_delta_log")):
+        return None
+    return DeltaTable(path).version()
+
+
+def _committed(path, batch_id, since):
+    """Whether a commit of the table after version since (None: any version) is tagged with batch_id"""
+    if not os.path.exists(os.path.join(path, "_delta_log")):
+        return False
+    dt = DeltaTable(path)
+    if since is not None and dt.version() == since:
+        return False
+    # A table recreated since has to be searched from its start
+    limit = dt.version() - since if since is not None and dt.version() > since else None
+    return any(commit.get(BATCH_METADATA_KEY) == batch_id for commit in dt.history(limit))
+
+
+def begin_batch(paths, table_paths) -> str:
+    """Record a batch of raw files as in flight before it is written; returns its ID"""
+    versions = {name: table_version(path) for name, path in table_paths.items()}
+    return ingest_status.begin_batch(table_paths, paths, versions)
+
+
+def ingest_batch(paths, table_paths, upsert: bool = INGEST_UPSERT, batch_id: str = None):
+    """
+    Append the records of the given raw files to every table (or merge them on the record key, so
+    re-delivered files replace their rows); returns the number of records.
+
+    With the ID of a batch from begin_batch, every commit is tagged with it and tables that already
+    hold a commit of the batch are skipped, so a batch that failed part-way can be written again
+    without duplicating rows. The batch is no longer in flight once this returns.
+    """
+    df, quality = read_profiled_records(paths)
+    batch = ingest_status.read_in_flight(table_paths).get(batch_id, {}) if batch_id else {}
+    properties = CommitProperties(custom_metadata={BATCH_METADATA_KEY: batch_id}) if batch_id else None
+    for name, path in table_paths.items():
+        if batch_id and _committed(path, batch_id, batch.get("versions", {}).get(name)):
+            continue
+        if upsert:
+            merge_records(path, df, commit_properties=properties)
+        else:
+            # New vitals may bring new columns; merge them into the table schema
+            write_deltalake(path, df, mode="append", schema_mode="merge", commit_properties=properties)
+    quality_stats.write(table_paths, quality)
+    ingest_status.record_ingested(table_paths, paths)
+    if batch_id:
+        ingest_status.end_batch(table_paths, batch_id)
+    return len(df)
+
+
+class Watcher:
+    def __init__(self, data_dir, table_paths, source=None, max_files: int = INGEST_BATCH_MAX_FILES,
+                 max_bytes: int = INGEST_BATCH_MAX_BYTES, max_seconds: float = INGEST_BATCH_MAX_SECONDS,
+                 upsert: bool = INGEST_UPSERT):
+        self.data_dir = data_dir
+        self.table_paths = table_paths
+        self.source = source
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.upsert = upsert
+        # {name: [size, mtime_ns]} waiting for the next batch, in arrival order
+        self.pending = {}
+        # Batches that failed, retried once their backoff is over: [batch ID, {name: [size, mtime_ns]},
+        # failed attempts, retry time]
+        self.retries = []
+        self.ingested = {}
+        self.stats = {key: 0 for key in ingest_status.STATS_KEYS}
+        self.stats.update(ingest_status.read_stats(table_paths))
+        self.stats.pop("updated_at", None)
+
+    def _current_files(self):
+        return sorted(name for name in os.listdir(self.data_dir) if name.endswith('.gz'))
+
+    def catch_up(self):
+        """
+        Queue the files that are not in the tables yet. Without any bookkeeping the tables are
+        assumed to hold every file already present (a full load_bronze run), unless there are none.
+        """
+        ingested = ingest_status.read_ingested(self.table_paths)
+        if ingested is None:
+            names = [os.path.join(self.data_dir, name) for name in self._current_files()]
+            if os.path.exists(os.path.join(self.table_paths["bronze"], "_delta_log")):
+                ingest_status.record_ingested(self.table_paths, names)
+                ingested = ingest_status.read_ingested(self.table_paths)
+            else:
+                ingested = {}
+        self.ingested = ingested
+        # Batches a previous run left part-way
+        for batch_id, batch in ingest_status.read_in_flight(self.table_paths).items():
+            files = {}
+            for name in batch["files"]:
+                try:
+                    files[name] = ingest_status.file_signature(os.path.join(self.data_dir, name))
+                except FileNotFoundError:
+                    pass
+            self.retries.append([batch_id, files, 0, 0.0])
+        self.queue(self._current_files())
+
+    def _retrying(self):
+        return {name for _, files, _, _ in self.retries for name in files}
+
+    def queue(self, names):
+        retrying = self._retrying()
+        for name in names:
+            if not name.endswith('.gz') or name in self.pending or name in retrying:
+                continue
+            try:
+                signature = ingest_status.file_signature(os.path.join(self.data_dir, name))
+            except FileNotFoundError:
+                continue
+            if self.ingested.get(name) != signature:
+                self.pending[name] = signature
+
+    def _pending_files(self):
+        return len(self.pending) + len(self._retrying())
+
+    def batch_due(self, now=None) -> bool:
+        now = time.time() if now is None else now
+        if any(retry_at <= now for _, _, _, retry_at in self.retries):
+            return True
+        if not self.pending:
+            return False
+        if len(self.pending) >= self.max_files:
+            return True
+        if sum(size for size, _ in self.pending.values()) >= self.max_bytes:
+            return True
+        oldest = min(mtime_ns for _, mtime_ns in self.pending.values()) / 1e9
+        return now - oldest >= self.max_seconds
+
+    def flush(self, now=None):
+        """
+        Write a failed batch whose backoff is over, or else the pending files (up to max_files), as
+        one batch; returns the number of files written
+        """
+        now = time.time() if now is None else now
+        retry = next((retry for retry in self.retries if retry[3] <= now), None)
+        if retry is not None:
+            self.retries.remove(retry)
+            batch_id, files, failures, _ = retry
+            files = {name: signature for name, signature in files.items()
+                     if os.path.exists(os.path.join(self.data_dir, name))}
+            if not files:
+                if batch_id:
+                    ingest_status.end_batch(self.table_paths, batch_id)
+                return 0
+        else:
+            names = list(self.pending)[:self.max_files]
+            if not names:
+                return 0
+            batch_id, files, failures = None, {name: self.pending.pop(name) for name in names}, 0
+        names, signatures = list(files), list(files.values())
+        paths = [os.path.join(self.data_dir, name) for name in names]
+        start = time.perf_counter()
+        try:
+            batch_id = batch_id or begin_batch(paths, self.table_paths)
+            records = ingest_batch(paths, self.table_paths, self.upsert, batch_id)
+        except Exception as e:
+            failures += 1
+            delay = min(2 ** failures, INGEST_RETRY_MAX_SECONDS)
+            print(f"Error ingesting batch of {len(names)} files (attempt {failures}, retrying in {delay:.0f}s): {e}")
+            self.retries.append([batch_id, files, failures, time.time() + delay])
+            self.stats["failed_batches"] += 1
+            self.stats["pending_files"] = self._pending_files()
+            ingest_status.write_stats(self.table_paths, self.stats)
+            return 0
+        committed_at = time.time()
+        elapsed = time.perf_counter() - start
+        lag = committed_at - min(mtime_ns for _, mtime_ns in signatures) / 1e9
+        for name, signature in zip(names, signatures):
+            self.ingested[name] = signature
+        self.stats.update({
+            "batches": self.stats["batches"] + 1,
+            "files": self.stats["files"] + len(names),
+            "records": self.stats["records"] + records,
+            "bytes": self.stats["bytes"] + sum(size for size, _ in signatures),
+            "pending_files": self._pending_files(),
+            "last_batch_files": len(names),
+            "last_batch_records": records,
+            "last_batch_seconds": elapsed,
+            "last_batch_at": committed_at,
+            "last_lag_seconds": lag,
+            "max_lag_seconds": max(self.stats["max_lag_seconds"], lag),
+        })
+        ingest_status.write_stats(self.table_paths, self.stats)
+        print(f"[SUCCESS] Ingested {len(names)} files ({records} records) in {elapsed:.2f}s, lag {lag:.2f}s")
+        return len(names)
+
+    def run_once(self, timeout: float = None):
+        """Wait for new files up to timeout seconds, then write a batch if one is due"""
+        if timeout is None:
+            timeout = self.max_seconds
+        self.queue(self.source.wait(timeout))
+        while self.batch_due():
+            if not self.flush():
+                break
+
+    def run(self, stop: threading.Event = None):
+        self.catch_up()
+        try:
+            while stop is None or not stop.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"Error watching {self.data_dir}: {e}")
+                    time.sleep(1)
+        finally:
+            self.source.close()
+
+
+_thread = None
+_lock_file = None
+
+
+def claim(table_paths) -> bool:
+    """Take the lake's watcher lock for this process; False when another process holds it"""
+    global _lock_file
+    if _lock_file is None:
+        _lock_file = try_lock(os.path.join(ingest_status.status_dir(table_paths), ingest_status.WATCHER_LOCK_FILENAME))
+    return _lock_file is not None
+
+
+def start(data_dir=None, table_paths=None):
+    """Watch data/ on a background thread (once, and only in the process holding the watcher lock)"""
+    global _thread
+    if _thread is not None:
+        return
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_dir = data_dir or os.path.join(base_dir, 'data')
+    table_paths = table_paths or get_table_paths(base_dir)
+    if not claim(table_paths):
+        print(f"Another process is watching {data_dir}; not starting the ingestion watcher here")
+        return
+    watcher = Watcher(data_dir, table_paths, open_source(data_dir))
+    _thread = threading.Thread(target=watcher.run, name="ingest-watcher", daemon=True)
+    _thread.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append new raw files to the Delta tables as they arrive")
+    parser.add_argument("--poll", action="store_true", help="list the directory instead of using inotify")
+    parser.add_argument("--upsert", action="store_true", default=INGEST_UPSERT,
+                        help="merge on the record key so re-delivered files replace their rows")
+    args = parser.parse_args()
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_dir = os.path.join(BASE_DIR, 'data')
+    if not claim(get_table_paths(BASE_DIR)):
+        sys.exit(f"Another process is watching {data_dir}")
+    Watcher(data_dir, get_table_paths(BASE_DIR), open_source(data_dir, poll=args.poll), upsert=args.upsert).run()
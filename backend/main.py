@@ -1,9 +1,48 @@
-from fastapi import FastAPI, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 from api.routes import router
+from config.settings import ADMIN_USERNAMES, WARMUP_ON_STARTUP, ANALYTICS_RETRY_AFTER_SECONDS, INGEST_WATCH_ENABLED
+from services import warmup, dirty_dates
+from services.user_repository import close_repository
+from services.analytics_executor import AnalyticsSaturated
+from services.auth_service import get_token_username
+from utils.metrics import span, start_request, server_timing_header, render_prometheus, REQUEST_DURATION
+from utils.profiling import RequestProfile, activate, deactivate, store_profile
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records serialization time as a span"""
+    def render(self, content) -> bytes:
+        with span("serialize"):
+            return super().render(content)
+
+
+API_PREFIX = "/api"
 
-app = FastAPI(title="ETL Monitoring API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prewarm tables and current summaries and watch for late raw files in the background so startup is not blocked"""
+    if WARMUP_ON_STARTUP:
+        warmup.start()
+    else:
+        warmup.skip()
+    dirty_dates.start()
+    if INGEST_WATCH_ENABLED:
+        # Imported here so the API does not load pandas at startup unless it ingests
+        from data_ingestion import watcher
+        watcher.start()
+    yield
+    await close_repository()
+
+
+app = FastAPI(title="ETL Monitoring API", default_response_class=TimedJSONResponse, lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -12,9 +51,81 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id", "Age", "X-Result-Stale"],
 )
 
-app.include_router(router, prefix="/api")
+def _route_template(request: Request) -> str:
+    """Path template of the matched route (e.g. /api/exports/{job_id}) so metrics stay low-cardinality"""
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Routes from the included API router report their path without the prefix
+    if request.url.path.startswith(API_PREFIX + "/") and not route.path.startswith(API_PREFIX + "/"):
+        return API_PREFIX + route.path
+    return route.path
+
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    """Record request latency per route and report stage timings in a Server-Timing header"""
+    start_request()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    REQUEST_DURATION.observe(
+        elapsed,
+        method=request.method,
+        route=_route_template(request),
+        status=response.status_code
+    )
+    response.headers["Server-Timing"] = server_timing_header(elapsed)
+    return response
+
+def _profiling_requested(request: Request) -> bool:
+    flag = request.query_params.get("profile", request.headers.get("x-profile"))
+    return flag is not None and flag.lower() not in ("", "0", "false")
+
+@app.middleware("http")
+async def request_profiling(request: Request, call_next):
+    """
+    Profile a single request when an admin asks for it with ?profile=1 or an X-Profile: 1 header.
+    The stored profile's ID is returned in the X-Profile-Id header.
+    """
+    if not _profiling_requested(request):
+        return await call_next(request)
+    if get_token_username(request.headers.get("authorization")) not in ADMIN_USERNAMES:
+        return JSONResponse(status_code=403, content={"detail": "Profiling is restricted to admin users"})
+    profile = RequestProfile()
+    token = activate(profile)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        deactivate(token)
+    profile_id = await run_in_threadpool(
+        store_profile, profile, request.method, request.url.path, str(request.url.query), time.perf_counter() - start)
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+app.include_router(router, prefix=API_PREFIX)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready", include_in_schema=False)
+def ready():
+    """Readiness probe: 503 until startup warmup has finished, with the cold-start report"""
+    status = warmup.readiness()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.exception_handler(AnalyticsSaturated)
+async def analytics_saturated_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy computing other reports, please retry shortly"},
+        headers={"Retry-After": str(ANALYTICS_RETRY_AFTER_SECONDS)}
+    )
 
 # 404 handler for API endpoints
 @app.exception_handler(404)
@@ -27,3 +138,5 @@ async def not_found_handler(request, exc):
             "path": str(request.url.path)
         }
     )
+
+warmup.record_import_time(time.perf_counter() - _import_started)
@@ -0,0 +1,232 @@
+import os
+import json
+import threading
+from urllib.parse import unquote
+from utils.lazy import lazy_import
+from utils.metrics import timed, register_collector
+from utils.files import tmp_path as _tmp_path
+
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+pq = lazy_import("pyarrow.parquet")
+
+# Row counts per (ingestion_date, user_id) of each Delta table, maintained from the transaction
+# log. The store remembers the last table version it processed and the counts contributed by each
+# data file of that version. When the table moves on, only the commits since then are read: files
+# they add are scanned and their counts added, files they remove have their stored counts
+# subtracted. Refresh cost is proportional to the new data rather than to the table.
+#
+# A full rebuild from the current snapshot happens when the commits cannot be applied file by
+# file: the store is missing or belongs to a recreated table, a commit file has been cleaned up,
+# or a commit removes a file the store never saw or uses deletion vectors.
+
+STORE_DIRNAME = "_aggregates"
+
+stats = {"incremental": 0, "rebuilds": 0, "files_read": 0, "files_removed": 0}
+
+_locks_lock = threading.Lock()
+_locks = {}
+_states = {}
+
+
+class NotIncremental(Exception):
+    """The commits since the stored version cannot be applied file by file"""
+
+
+class TableAggregates:
+    def __init__(self, table_id, version, files, totals):
+        self.table_id = table_id
+        self.version = version
+        # {data file path as written in the log: (ingestion_date, user_id, count) table}
+        self.files = files
+        # Counts summed over every file
+        self.totals = totals
+
+
+def _schema():
+    return pa.schema([("ingestion_date", pa.string()), ("user_id", pa.string()), ("count", pa.int64())])
+
+
+def _empty():
+    return _schema().empty_table()
+
+
+def _sum_counts(tables):
+    """Counts summed per (ingestion_date, user_id), dropping pairs that cancel out to zero"""
+    tables = [table for table in tables if table.num_rows]
+    if not tables:
+        return _empty()
+    grouped = pa.concat_tables(tables).group_by(["ingestion_date", "user_id"]).aggregate([("count", "sum")])
+    grouped = grouped.rename_columns({"count_sum": "count"}).select(["ingestion_date", "user_id", "count"])
+    return grouped.filter(pc.not_equal(grouped["count"], 0)).cast(_schema())
+
+
+def _negate(counts):
+    return counts.set_column(2, "count", pc.negate(counts["count"]))
+
+
+def _file_counts(table_path, path, partition_values):
+    """Counts of one data file, with partition columns taken from its add action"""
+    file_path = os.path.join(table_path, unquote(path))
+    available = set(pq.read_schema(file_path).names)
+    rows = pq.read_table(file_path, columns=[c for c in ("ingestion_date", "user_id") if c in available])
+    stats["files_read"] += 1
+    for column in ("ingestion_date", "user_id"):
+        if column not in available:
+            value = (partition_values or {}).get(column)
+            rows = rows.append_column(column, pa.array([value] * rows.num_rows, pa.string()))
+    grouped = rows.group_by(["ingestion_date", "user_id"]).aggregate([([], "count_all")])
+    return grouped.rename_columns({"count_all": "count"}).select(["ingestion_date", "user_id", "count"]).cast(_schema())
+
+
+def _uses_deletion_vectors(dt):
+    features = dt.protocol().reader_features or []
+    return "deletionVectors" in features
+
+
+@timed("aggregate_rebuild")
+def build(dt, table_path) -> TableAggregates:
+    """Counts of every file in the table's current snapshot"""
+    if _uses_deletion_vectors(dt):
+        raise NotIncremental("table uses deletion vectors")
+    actions = pa.table(dt.get_add_actions(flatten=True))
+    partition_columns = [name for name in actions.column_names if name.startswith("partition.")]
+    files = {}
+    for action in actions.select(["path"] + partition_columns).to_pylist():
+        partition_values = {name[len("partition."):]: action[name] for name in partition_columns}
+        files[action["path"]] = _file_counts(table_path, action["path"], partition_values)
+    stats["rebuilds"] += 1
+    return TableAggregates(dt.metadata().id, dt.version(), files, _sum_counts(list(files.values())))
+
+
+def _commit_actions(table_path, version):
+    """Actions of one commit, from its JSON file in _delta_log"""
+    log_path = os.path.join(table_path, "_delta_log", f"{version:020d}.json")
+    try:
+        with open(log_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        raise NotIncremental(f"commit {version} is no longer in the log")
+
+
+@timed("aggregate_advance")
+def advance(state: TableAggregates, table_path, version) -> TableAggregates:
+    """Apply the commits after state.version up to version; raises NotIncremental when that is not possible"""
+    files = dict(state.files)
+    deltas = [state.totals]
+    for commit in range(state.version + 1, version + 1):
+        for action in _commit_actions(table_path, commit):
+            if "add" in action:
+                add = action["add"]
+                if add.get("deletionVector"):
+                    raise NotIncremental(f"commit {commit} adds a file with a deletion vector")
+                try:
+                    counts = _file_counts(table_path, add["path"], add.get("partitionValues"))
+                except FileNotFoundError:
+                    # Removed again by a later commit and vacuumed since
+                    raise NotIncremental(f"data file {add['path']} of commit {commit} is gone")
+                if add["path"] in files:
+                    deltas.append(_negate(files[add["path"]]))
+                files[add["path"]] = counts
+                deltas.append(counts)
+            elif "remove" in action:
+                path = action["remove"]["path"]
+                if path not in files:
+                    raise NotIncremental(f"commit {commit} removes a file the store has no counts for")
+                deltas.append(_negate(files.pop(path)))
+                stats["files_removed"] += 1
+    stats["incremental"] += 1
+    return TableAggregates(state.table_id, version, files, _sum_counts(deltas))
+
+
+def store_path(table_path) -> str:
+    """Store file for a table, in the directory holding the Delta tables"""
+    return os.path.join(os.path.dirname(table_path), STORE_DIRNAME, f"{os.path.basename(table_path)}.parquet")
+
+
+def write(state: TableAggregates, path: str):
+    paths = sorted(state.files)
+    tables = [state.files[file_path] for file_path in paths]
+    table = pa.concat_tables([_empty()] + tables)
+    file_column = [file_path for file_path, counts in zip(paths, tables) for _ in range(counts.num_rows)]
+    table = table.append_column("path", pa.array(file_column, pa.string())).replace_schema_metadata({
+        "table_id": state.table_id,
+        "version": str(state.version),
+        # Files that hold no rows still have to be known, so a later remove can be applied
+        "paths": json.dumps(paths),
+    })
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _tmp_path(path)
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read(path: str) -> TableAggregates:
+    table = pq.read_table(path)
+    metadata = table.schema.metadata
+    counts = table.select(["ingestion_date", "user_id", "count"]).cast(_schema())
+    files = {file_path: _empty() for file_path in json.loads(metadata[b"paths"])}
+    if counts.num_rows:
+        order = pc.sort_indices(table["path"])
+        counts, file_column = counts.take(order), table["path"].take(order).to_pylist()
+        start = 0
+        for i in range(1, len(file_column) + 1):
+            if i == len(file_column) or file_column[i] != file_column[start]:
+                files[file_column[start]] = counts.slice(start, i - start)
+                start = i
+    return TableAggregates(metadata[b"table_id"].decode(), int(metadata[b"version"]), files,
+                           _sum_counts(list(files.values())))
+
+
+def _lock(table_path):
+    with _locks_lock:
+        return _locks.setdefault(table_path, threading.Lock())
+
+
+def date_user_counts(table_path, dt):
+    """
+    Row counts per (ingestion_date, user_id) of the table at dt's version, refreshing the
+    persisted store incrementally when possible. The returned table is shared; do not modify it.
+
+    Raises:
+        NotIncremental: the table uses deletion vectors, so file counts cannot be summed
+    """
+    version = dt.version()
+    with _lock(table_path):
+        state = _states.get(table_path)
+        path = store_path(table_path)
+        if state is None and os.path.exists(path):
+            try:
+                state = read(path)
+            except Exception as e:
+                print(f"Could not read aggregate store {path}: {e}")
+        if state is not None and (state.table_id != dt.metadata().id or state.version > version):
+            # Table was recreated; its history no longer continues from the stored version
+            state = None
+        if state is not None and state.version == version:
+            _states[table_path] = state
+            return state.totals
+        if state is not None:
+            try:
+                state = advance(state, table_path, version)
+            except NotIncremental as e:
+                print(f"Rebuilding aggregates for {table_path}: {e}")
+                state = None
+        if state is None:
+            state = build(dt, table_path)
+        write(state, path)
+        _states[table_path] = state
+        return state.totals
+
+
+def _collect_aggregate_stats():
+    return [
+        ("etl_aggregate_refreshes_total", "counter", "Aggregate store refreshes by kind",
+         [({"kind": "incremental"}, stats["incremental"]), ({"kind": "rebuild"}, stats["rebuilds"])]),
+        ("etl_aggregate_files_read_total", "counter", "Delta data files scanned by the aggregate store",
+         [({}, stats["files_read"])]),
+        ("etl_aggregate_files_removed_total", "counter", "Removed Delta data files subtracted from aggregates",
+         [({}, stats["files_removed"])]),
+    ]
+
+register_collector(_collect_aggregate_stats)
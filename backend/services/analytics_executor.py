@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import ANALYTICS_WORKERS, ANALYTICS_MAX_QUEUE
+from utils.metrics import register_collector
+from utils.profiling import profile_call
+
+# Delta/Arrow/Excel work runs on its own bounded pool instead of FastAPI's default threadpool,
+# which stays free for short blocking calls such as password hashing. At most ANALYTICS_WORKERS jobs run
+# and ANALYTICS_MAX_QUEUE wait; past that new work is rejected so the API can answer 503 at once
+# instead of queueing requests that would time out anyway.
+
+_executor = ThreadPoolExecutor(max_workers=ANALYTICS_WORKERS, thread_name_prefix="analytics")
+_lock = threading.Lock()
+_admitted = 0
+stats = {"completed": 0, "rejected": 0}
+
+
+class AnalyticsSaturated(Exception):
+    """The analytics pool and its queue are full."""
+
+
+def _release(_future):
+    global _admitted
+    with _lock:
+        _admitted -= 1
+        stats["completed"] += 1
+
+
+async def run_analytics(fn, *args, **kwargs):
+    """
+    Run a blocking analytical function on the analytics pool and await its result.
+
+    The function runs in a copy of the caller's context (timing spans, request profile).
+    Raises AnalyticsSaturated when ANALYTICS_WORKERS + ANALYTICS_MAX_QUEUE jobs are already admitted.
+    """
+    global _admitted
+    with _lock:
+        if _admitted >= ANALYTICS_WORKERS + ANALYTICS_MAX_QUEUE:
+            stats["rejected"] += 1
+            raise AnalyticsSaturated()
+        _admitted += 1
+    context = contextvars.copy_context()
+    future = _executor.submit(context.run, profile_call, partial(fn, *args, **kwargs))
+    # Released when the work finishes, even if the awaiting request was cancelled first
+    future.add_done_callback(_release)
+    return await asyncio.wrap_future(future)
+
+
+def load():
+    """(running, queued) analytics jobs"""
+    with _lock:
+        admitted = _admitted
+    running = min(admitted, ANALYTICS_WORKERS)
+    return running, admitted - running
+
+
+def _collect_analytics_stats():
+    running, queued = load()
+    return [
+        ("etl_analytics_running", "gauge", "Analytics jobs running", [({}, running)]),
+        ("etl_analytics_queued", "gauge", "Analytics jobs waiting for a worker", [({}, queued)]),
+        ("etl_analytics_completed_total", "counter", "Analytics jobs finished", [({}, stats["completed"])]),
+        ("etl_analytics_rejected_total", "counter", "Requests rejected because the analytics pool was saturated",
+         [({}, stats["rejected"])]),
+    ]
+
+register_collector(_collect_analytics_stats)
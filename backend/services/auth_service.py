@@ -1,48 +1,59 @@
-import mysql.connector
-import bcrypt
-from jose import jwt
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime, timedelta, UTC
-from config.database import MYSQL_CONFIG, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from config.database import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from services.user_repository import get_repository
+from utils.metrics import span
+from utils.lazy import lazy_import
 
-def get_db():
-    return mysql.connector.connect(**MYSQL_CONFIG)
+bcrypt = lazy_import("bcrypt")
+jwt = lazy_import("jose.jwt")
 
-def create_user(username: str, password: str, nickname: str = None, full_name: str = None):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE username=%s", (username,))
-    if cursor.fetchone():
-        conn.close()
+# bcrypt is deliberately slow CPU work (it releases the GIL), so it runs in the threadpool
+# while database calls stay on the event loop.
+
+async def hash_password(password: str) -> str:
+    with span("password_hash"):
+        hashed = await run_in_threadpool(bcrypt.hashpw, password.encode(), bcrypt.gensalt())
+    return hashed.decode()
+
+async def verify_password(password: str, password_hash) -> bool:
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode()
+    with span("password_verify"):
+        return await run_in_threadpool(bcrypt.checkpw, password.encode(), password_hash)
+
+async def create_user(username: str, password: str, nickname: str = None, full_name: str = None):
+    repository = get_repository()
+    if await repository.get_user(username):
         raise HTTPException(status_code=400, detail="Username already exists")
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-    cursor.execute("INSERT INTO users (username, nickname, full_name, password_hash) VALUES (%s, %s, %s, %s)", 
-                   (username, nickname, full_name, hashed))
-    conn.commit()
-    conn.close()
+    await repository.create_user(username, await hash_password(password), nickname, full_name)
     return True
 
-def authenticate_user(username: str, password: str):
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE username=%s", (username,))
-    user = cursor.fetchone()
-    conn.close()
-    if not user or not bcrypt.checkpw(password.encode(), user['password_hash'].encode()):
+async def authenticate_user(username: str, password: str):
+    user = await get_repository().get_credentials(username)
+    if not user:
+        return None
+    if not await verify_password(password, user['password_hash']):
         return None
     return user
 
-def get_user_by_username(username: str):
+async def get_user_by_username(username: str):
     """Get user details by username"""
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, username, nickname, full_name FROM users WHERE username=%s", (username,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    return await get_repository().get_user(username)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.now(UTC) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM) 
\ No newline at end of file
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def get_token_username(authorization: str):
+    """Username from a "Bearer <jwt>" header value, or None if missing or invalid"""
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    try:
+        payload = jwt.decode(authorization.replace("Bearer ", ""), SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.JWTError:
+        return None
+    return payload.get("sub")
@@ -0,0 +1,284 @@
+import os
+import json
+import math
+import hashlib
+import threading
+from config.settings import BASELINE_ALPHA, BASELINE_MIN_DAYS, BASELINE_Z_THRESHOLD
+from utils.lazy import lazy_import
+from utils.metrics import timed, register_collector
+from utils.files import tmp_path as _tmp_path
+from services import delta_reader, quality_stats
+
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+pq = lazy_import("pyarrow.parquet")
+
+# Rolling per-user baselines of daily record counts per vital type. For every (user, vital) pair
+# an exponentially weighted mean and variance of its daily count are carried from day to day
+# (alpha = BASELINE_ALPHA), so a new day costs one vectorized update of every known pair instead
+# of a pass over history. A known pair with no records on a day counts as zero.
+#
+# Each processed day keeps, per pair, its count and the baseline it was compared with (the state
+# before that day) and the resulting z-score, so anomalies for a date are a lookup. Daily counts
+# come from the quality table written at ingestion, never from bronze. When a day's counts change
+# (late or re-delivered files), the state is rewound to the baseline stored for that day and only
+# the days from there on are replayed.
+
+BASELINE_DIRNAME = "_baselines"
+BASELINE_FILENAME = "daily.parquet"
+
+stats = {"refreshes": 0, "days_processed": 0}
+
+_lock = threading.Lock()
+_cache = {}
+
+
+def baseline_path(table_paths) -> str:
+    return os.path.join(os.path.dirname(table_paths["bronze"]), BASELINE_DIRNAME, BASELINE_FILENAME)
+
+
+def _schema():
+    return pa.schema([
+        ("ingestion_date", pa.string()), ("user_id", pa.string()), ("type", pa.string()),
+        ("count", pa.int64()),
+        # Baseline before the day; days is how many days it was built from (0 for a new pair)
+        ("expected", pa.float64()), ("variance", pa.float64()), ("days", pa.int64()),
+        ("z_score", pa.float64()),
+    ])
+
+
+def _scale(mean, variance):
+    """Deviation unit: the EWMA standard deviation, floored at the Poisson sqrt(mean) and 1"""
+    return np.maximum(np.maximum(np.sqrt(variance), np.sqrt(np.maximum(mean, 0))), 1.0)
+
+
+def _digest(counts):
+    items = sorted(([user_id, vital, count] for (user_id, vital), count in counts.items()),
+                   key=lambda item: (item[0] or "", item[1] or ""))
+    return hashlib.sha1(json.dumps(items).encode("utf-8")).hexdigest()
+
+
+class Baselines:
+    def __init__(self, alpha: float = BASELINE_ALPHA):
+        self.alpha = alpha
+        # Known (user_id, type) pairs and their state after the last processed day
+        self.keys = []
+        self.index = {}
+        self.mean = np.zeros(0)
+        self.variance = np.zeros(0)
+        self.days = np.zeros(0, dtype=np.int64)
+        # {date: rows of that day} and {date: digest of the day's counts}
+        self.rows = {}
+        self.digests = {}
+        # [quality table id, version] the days were read from
+        self.source = None
+
+    def _add_keys(self, keys, mean, variance, days):
+        for key in keys:
+            self.index[key] = len(self.keys)
+            self.keys.append(key)
+        self.mean = np.concatenate([self.mean, mean])
+        self.variance = np.concatenate([self.variance, variance])
+        self.days = np.concatenate([self.days, days])
+
+    @classmethod
+    def before(cls, rows, alpha: float) -> "Baselines":
+        """State as it was before the day the rows belong to"""
+        state = cls(alpha)
+        known = rows.filter(pc.greater(rows["days"], 0))
+        state._add_keys(list(zip(known["user_id"].to_pylist(), known["type"].to_pylist())),
+                        known["expected"].to_numpy(), known["variance"].to_numpy(),
+                        known["days"].to_numpy().astype(np.int64))
+        return state
+
+    def rewind(self, date_str: str) -> "Baselines":
+        """New state as it was before date_str, keeping the days before it"""
+        later = [day for day in self.rows if day >= date_str]
+        if later:
+            state = Baselines.before(self.rows[min(later)], self.alpha)
+        else:
+            state = Baselines(self.alpha)
+            state._add_keys(list(self.keys), self.mean.copy(), self.variance.copy(), self.days.copy())
+        state.rows = {day: rows for day, rows in self.rows.items() if day < date_str}
+        state.digests = {day: digest for day, digest in self.digests.items() if day < date_str}
+        return state
+
+    def _observe(self, counts):
+        """Counts of the known pairs as an array (zero when absent), and the pairs seen for the first time"""
+        observed = np.zeros(len(self.keys))
+        new_keys = []
+        for key, count in counts.items():
+            i = self.index.get(key)
+            if i is None:
+                new_keys.append(key)
+            else:
+                observed[i] = count
+        return observed, new_keys
+
+    def _fold(self, observed, new_keys, counts):
+        diff = observed - self.mean
+        increment = self.alpha * diff
+        self.mean = self.mean + increment
+        self.variance = (1 - self.alpha) * (self.variance + diff * increment)
+        self.days = self.days + 1
+        self._add_keys(new_keys, np.array([counts[key] for key in new_keys], dtype=np.float64),
+                       np.zeros(len(new_keys)), np.ones(len(new_keys), dtype=np.int64))
+
+    def step(self, date_str: str, counts):
+        """Compare one day's {(user_id, type): count} with the baselines, then fold it in"""
+        observed, new_keys = self._observe(counts)
+        keys = self.keys + new_keys
+        expected, variance, days = self.mean, self.variance, self.days
+        z_scores = (observed - expected) / _scale(expected, variance)
+        self._fold(observed, new_keys, counts)
+
+        n_new = len(new_keys)
+        new_counts = np.array([counts[key] for key in new_keys], dtype=np.int64)
+        self.rows[date_str] = pa.table({
+            "ingestion_date": pa.array([date_str] * len(keys), pa.string()),
+            "user_id": pa.array([key[0] for key in keys], pa.string()),
+            "type": pa.array([key[1] for key in keys], pa.string()),
+            "count": pa.array(np.concatenate([observed.astype(np.int64), new_counts])),
+            "expected": pa.array(np.concatenate([expected, np.zeros(n_new)])),
+            "variance": pa.array(np.concatenate([variance, np.zeros(n_new)])),
+            "days": pa.array(np.concatenate([days, np.zeros(n_new, dtype=np.int64)])),
+            # New pairs have no baseline to compare with
+            "z_score": pa.array(np.concatenate([z_scores, np.full(n_new, np.nan)]), from_pandas=True),
+        }, schema=_schema())
+        stats["days_processed"] += 1
+
+
+def write(state: Baselines, path: str):
+    table = pa.concat_tables([_schema().empty_table()] + [state.rows[day] for day in sorted(state.rows)])
+    table = table.replace_schema_metadata({
+        "alpha": repr(state.alpha),
+        "digests": json.dumps(state.digests),
+        "source": json.dumps(state.source),
+    })
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _tmp_path(path)
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read(path: str) -> Baselines:
+    table = pq.read_table(path)
+    metadata = table.schema.metadata
+    table = table.cast(_schema())
+    alpha = float(metadata[b"alpha"])
+    table = table.take(pc.sort_indices(table["ingestion_date"]))
+    dates = table["ingestion_date"].to_pylist()
+    rows = {}
+    start = 0
+    for i in range(1, len(dates) + 1):
+        if i == len(dates) or dates[i] != dates[start]:
+            rows[dates[start]] = table.slice(start, i - start)
+            start = i
+    if rows:
+        # State after the last day: fold that day into the baseline stored with it
+        last = max(rows)
+        state = Baselines.before(rows[last], alpha)
+        counts = {(row["user_id"], row["type"]): row["count"] for row in rows[last].to_pylist()}
+        state._fold(*state._observe(counts), counts)
+    else:
+        state = Baselines(alpha)
+    state.rows = rows
+    state.digests = json.loads(metadata[b"digests"])
+    state.source = json.loads(metadata[b"source"])
+    return state
+
+
+def _daily_counts(dt):
+    """{date: {(user_id, type): records}} from the quality table"""
+    table = dt.to_pyarrow_table(columns=["ingestion_date", "user_id", "type", "records"])
+    grouped = table.group_by(["ingestion_date", "user_id", "type"]).aggregate([("records", "sum")])
+    counts = {}
+    for row in grouped.to_pylist():
+        if row["ingestion_date"] and row["records_sum"]:
+            counts.setdefault(row["ingestion_date"], {})[(row["user_id"], row["type"])] = row["records_sum"]
+    return counts
+
+
+@timed("baseline_refresh")
+def current():
+    """
+    Baselines up to the latest ingested day, replaying only the days whose counts changed since
+    they were last processed. None before any quality statistics exist. Do not modify the result.
+    """
+    table_paths = delta_reader.TABLE_PATHS
+    quality_path = quality_stats.quality_path(table_paths)
+    if not os.path.exists(os.path.join(quality_path, "_delta_log")):
+        return None
+    path = baseline_path(table_paths)
+    with _lock:
+        dt = delta_reader.open_table(quality_path)
+        source = [dt.metadata().id, dt.version()]
+        state = _cache.get(path)
+        if state is None and os.path.exists(path):
+            try:
+                state = read(path)
+            except Exception as e:
+                print(f"Could not read baselines {path}: {e}")
+        if state is not None and state.source == source and state.alpha == BASELINE_ALPHA:
+            _cache[path] = state
+            return state
+
+        counts = _daily_counts(dt)
+        digests = {day: _digest(day_counts) for day, day_counts in counts.items()}
+        if state is None or state.alpha != BASELINE_ALPHA:
+            state = Baselines(BASELINE_ALPHA)
+        changed = [day for day in set(digests) | set(state.digests) if digests.get(day) != state.digests.get(day)]
+        if changed:
+            start = min(changed)
+            state = state.rewind(start)
+            for day in sorted(day for day in counts if day >= start):
+                state.step(day, counts[day])
+                state.digests[day] = digests[day]
+        # Otherwise the table changed without changing any day's counts
+        state.source = source
+        write(state, path)
+        _cache[path] = state
+        stats["refreshes"] += 1
+        return state
+
+
+def get_anomalies(date_str: str, threshold: float = BASELINE_Z_THRESHOLD, min_days: int = BASELINE_MIN_DAYS):
+    """
+    (user, vital type) pairs whose record count on date_str deviates from their baseline by at
+    least threshold deviations, largest first. Only pairs with min_days of history are checked.
+    """
+    state = current()
+    rows = state.rows.get(date_str) if state is not None else None
+    if rows is None:
+        return {"date": date_str, "available": False, "threshold": threshold, "min_days": min_days,
+                "checked": 0, "anomalies": []}
+    checked = rows.filter(pc.greater_equal(rows["days"], min_days))
+    flagged = checked.filter(pc.greater_equal(pc.abs(checked["z_score"]), threshold))
+    anomalies = []
+    for row in flagged.to_pylist():
+        anomalies.append({
+            "user_id": row["user_id"],
+            "type": row["type"],
+            "count": row["count"],
+            "expected": row["expected"],
+            "std": math.sqrt(row["variance"]),
+            "z_score": row["z_score"],
+            "ratio": row["count"] / row["expected"] if row["expected"] else None,
+            "direction": "low" if row["z_score"] < 0 else "high",
+            "days": row["days"],
+        })
+    anomalies.sort(key=lambda anomaly: -abs(anomaly["z_score"]))
+    return {"date": date_str, "available": True, "threshold": threshold, "min_days": min_days,
+            "checked": checked.num_rows, "anomalies": anomalies}
+
+
+def _collect_baseline_stats():
+    return [
+        ("etl_baseline_refreshes_total", "counter", "Refreshes of the per-user ingestion baselines",
+         [({}, stats["refreshes"])]),
+        ("etl_baseline_days_processed_total", "counter", "Days folded into the per-user baselines",
+         [({}, stats["days_processed"])]),
+    ]
+
+register_collector(_collect_baseline_stats)
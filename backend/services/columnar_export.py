@@ -0,0 +1,77 @@
+from utils.lazy import lazy_import
+
+pa = lazy_import("pyarrow")
+pa_csv = lazy_import("pyarrow.csv")
+pa_ipc = lazy_import("pyarrow.ipc")
+pq = lazy_import("pyarrow.parquet")
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+EXPORT_BATCH_ROWS = 64 * 1024
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the caller in chunks."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _open_writer(sink, schema, fmt):
+    if fmt == "csv":
+        return pa_csv.CSVWriter(sink, schema)
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    if fmt == "arrow":
+        return pa_ipc.new_stream(sink, schema)
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def iter_table_bytes(table: "pa.Table", fmt: str, batch_rows: int = EXPORT_BATCH_ROWS):
+    """
+    Serialize an Arrow table to CSV, Parquet or Arrow IPC stream, yielding bytes batch by batch.
+
+    Args:
+        table (pa.Table): Table to export
+        fmt (str): One of EXPORT_FORMATS
+        batch_rows (int): Rows written per chunk
+
+    Yields:
+        bytes: Encoded output, suitable for a StreamingResponse
+    """
+    sink = _ChunkSink()
+    file = pa.PythonFile(sink, mode="w")
+    writer = _open_writer(file, table.schema, fmt)
+    for batch in table.to_batches(max_chunksize=batch_rows):
+        if fmt == "parquet":
+            writer.write_batch(batch, row_group_size=batch_rows)
+        else:
+            writer.write_batch(batch)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    data = sink.drain()
+    if data:
+        yield data
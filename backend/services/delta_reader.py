@@ -1,9 +1,22 @@
-from deltalake import DeltaTable
-import pandas as pd
 import os
 import json
+import math
+import hashlib
+import threading
 from datetime import datetime, timedelta, UTC
 import calendar
+from utils.lazy import lazy_import
+from utils.metrics import span, timed
+from services.result_cache import shared_result, MatrixCodec
+from services.query_backends import get_backend
+from services import presence_index, user_sketches, result_cache, aggregate_store
+from config.settings import AGGREGATE_STORE_ENABLED
+from utils.singleflight import SingleFlight
+
+deltalake = lazy_import("deltalake")
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
 
 # Update BASE_DIR to point to the correct delta_tables directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -13,6 +26,122 @@ TABLE_PATHS = {
     "silver_vitalsbaseline": os.path.join(BASE_DIR, "delta_tables", "silver_vitalsbaseline"),
     "silver_vitalsswt": os.path.join(BASE_DIR, "delta_tables", "silver_vitalsswt"),
 }
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+def raw_file_date(fname):
+    """UTC ingestion date encoded in a raw file name (<user_id>_<epoch ms>...gz), or '' if unparseable."""
+    try:
+        _, rest = fname.split('_', 1)
+        ingestion_date = rest.split('_')[0].split('.')[0]
+        return datetime.fromtimestamp(int(ingestion_date) / 1000, UTC).strftime('%Y-%m-%d')
+    except Exception:
+        return ''
+
+# Opened DeltaTable per path. Reopening replays the transaction log from the last checkpoint;
+# a cached table only has to read the commits added since it was last used. A full reload deletes
+# and recreates a table, restarting its log at version 0, which a cached handle would never follow,
+# so each handle keeps the inode and mtime of the commit file it is at and is reopened once that
+# file is gone or was replaced.
+_open_tables = {}
+_open_tables_lock = threading.Lock()
+
+def _commit_stamp(path, version):
+    """Inode and mtime of a table's commit file for a version, None when there is none"""
+    try:
+        stat = os.stat(os.path.join(path, "_delta_log", f"{version:020d}.json"))
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+def open_table(path):
+    """DeltaTable for a path, advanced to its latest version"""
+    with _open_tables_lock:
+        entry = _open_tables.get(path)
+        dt = None
+        if entry is not None and _commit_stamp(path, entry[0].version()) == entry[1]:
+            dt = entry[0]
+            try:
+                dt.update_incremental()
+            except Exception as e:
+                print(f"Reopening Delta table {path}: {e}")
+                dt = None
+        if dt is None:
+            dt = deltalake.DeltaTable(path)
+        _open_tables[path] = (dt, _commit_stamp(path, dt.version()))
+        return dt
+
+@timed("delta_versions")
+def get_table_versions():
+    """Current Delta version of every table, None for tables that cannot be opened."""
+    versions = {}
+    for name, path in TABLE_PATHS.items():
+        try:
+            versions[name] = open_table(path).version()
+        except Exception:
+            versions[name] = None
+    return versions
+
+def get_table_identities():
+    """
+    Path, Delta table ID and version of every table. Versions restart when a table is recreated
+    (a full reload), so only all three identify the data a result was built from.
+    """
+    identities = {}
+    for name, path in TABLE_PATHS.items():
+        try:
+            dt = open_table(path)
+            identities[name] = {"path": path, "id": dt.metadata().id, "version": dt.version()}
+        except Exception:
+            identities[name] = {"path": path, "id": None, "version": None}
+    return identities
+
+@timed("raw_manifest")
+def get_raw_manifest_digest(date_list=None):
+    """
+    Digest of the raw .gz files (name, size, mtime), optionally restricted to files for the given dates.
+
+    Changes whenever a raw file relevant to those dates is added, removed or rewritten.
+    """
+    wanted = set(date_list) if date_list is not None else None
+    entries = []
+    try:
+        with os.scandir(DATA_DIR) as it:
+            for entry in it:
+                if not entry.name.endswith('.gz'):
+                    continue
+                if wanted is not None and raw_file_date(entry.name) not in wanted:
+                    continue
+                stat = entry.stat()
+                entries.append(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns}")
+    except FileNotFoundError:
+        pass
+    return hashlib.sha256("\n".join(sorted(entries)).encode()).hexdigest()
+
+def _raw_digests_by_date():
+    """Digest of each UTC date's raw .gz files (name, size, mtime), as {date: digest}."""
+    entries = {}
+    try:
+        with os.scandir(DATA_DIR) as it:
+            for entry in it:
+                if not entry.name.endswith('.gz'):
+                    continue
+                date_str = raw_file_date(entry.name)
+                if date_str:
+                    stat = entry.stat()
+                    entries.setdefault(date_str, []).append(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns}")
+    except FileNotFoundError:
+        pass
+    return {date_str: hashlib.sha256("\n".join(sorted(names)).encode()).hexdigest()
+            for date_str, names in entries.items()}
+
+def source_signature(date_list=None):
+    """Where the sources live and their current versions; changes whenever a view over date_list may change."""
+    return {
+        # Table IDs too, since a recreated table restarts its versions
+        "tables": get_table_identities(),
+        "raw_dir": DATA_DIR,
+        "raw": get_raw_manifest_digest(date_list),
+    }
 
 def get_week_dates(date_str):
     """Get all dates in the week containing the given date."""
@@ -33,102 +162,177 @@ def get_month_dates(date_str):
         dates.append(datetime(year, month, day).strftime('%Y-%m-%d'))
     return dates
 
-def get_aggregated_summary(date_list, period_type):
-    """Get aggregated summary for a list of dates."""
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_dir = os.path.join(BASE_DIR, 'data')
-    
-    # Aggregate raw records for all dates
-    raw_count = 0
-    raw_users = set()
-    raw_records_by_user = {}  # Track raw records per user
-    for date_str in date_list:
-        for fname in os.listdir(data_dir):
-            if fname.endswith('.gz'):
-                user_id, rest = fname.split('_', 1)
-                ingestion_date = rest.split('_')[0].split('.')[0]
-                try:
-                    dt = datetime.fromtimestamp(int(ingestion_date) / 1000, UTC)
-                    date_str_file = dt.strftime('%Y-%m-%d')
-                except Exception:
-                    date_str_file = ''
-                if date_str_file == date_str:
-                    import gzip, json
-                    with gzip.open(os.path.join(data_dir, fname), 'rt', encoding='utf-8') as f:
-                        records = json.load(f)
-                        if isinstance(records, list):
-                            record_count = len(records)
-                            raw_count += record_count
-                            raw_users.add(user_id)
-                            raw_records_by_user[user_id] = raw_records_by_user.get(user_id, 0) + record_count
-                        else:
-                            raw_count += 1
-                            raw_users.add(user_id)
-                            raw_records_by_user[user_id] = raw_records_by_user.get(user_id, 0) + 1
-    
-    # Aggregate bronze records for all dates
-    bronze_count = 0
-    bronze_users = set()
-    bronze_records_by_user = {}  # Track bronze records per user
-    try:
-        dt_bronze = DeltaTable(TABLE_PATHS['bronze'])
-        df_bronze = dt_bronze.to_pandas()
-        for date_str in date_list:
-            df_filtered = df_bronze[df_bronze['ingestion_date'] == date_str]
-            bronze_count += len(df_filtered)
-            bronze_users.update(df_filtered['user_id'].unique())
-            # Count records per user
-            for user_id in df_filtered['user_id'].unique():
-                user_records = len(df_filtered[df_filtered['user_id'] == user_id])
-                bronze_records_by_user[user_id] = bronze_records_by_user.get(user_id, 0) + user_records
-    except Exception as e:
-        bronze_count = 0
-        bronze_users = set()
-    
-    # Aggregate silver records for all dates
-    silver_count = 0
-    silver_users = set()
-    silver_records_by_user = {}  # Track silver records per user
-    for key in ['silver_rrbucket', 'silver_vitalsbaseline', 'silver_vitalsswt']:
-        try:
-            dt_silver = DeltaTable(TABLE_PATHS[key])
-            df_silver = dt_silver.to_pandas()
-            for date_str in date_list:
-                df_filtered = df_silver[df_silver['ingestion_date'] == date_str]
-                silver_count += len(df_filtered)
-                silver_users.update(df_filtered['user_id'].unique())
-                # Count records per user
-                for user_id in df_filtered['user_id'].unique():
-                    user_records = len(df_filtered[df_filtered['user_id'] == user_id])
-                    silver_records_by_user[user_id] = silver_records_by_user.get(user_id, 0) + user_records
-        except Exception:
+def get_range_dates(start_str, end_str):
+    """Get all dates from start_str to end_str, inclusive."""
+    start = datetime.strptime(start_str, '%Y-%m-%d')
+    end = datetime.strptime(end_str, '%Y-%m-%d')
+    if end < start:
+        raise ValueError("end date must not be before start date")
+    return [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end - start).days + 1)]
+
+def get_view_dates(date_str, view_type):
+    """Dates covered by a daily, weekly or monthly view of the given date."""
+    if view_type == "weekly":
+        return get_week_dates(date_str)
+    if view_type == "monthly":
+        return get_month_dates(date_str)
+    return [date_str]
+
+SILVER_TABLES = ['silver_rrbucket', 'silver_vitalsbaseline', 'silver_vitalsswt']
+SYNC_COLUMN_LABELS = {
+    "bronze": "Bronze Data",
+    "silver_rrbucket": "Silver RRBucket",
+    "silver_vitalsbaseline": "Silver VitalsBaseline",
+    "silver_vitalsswt": "Silver VitalSWT",
+}
+DEFAULT_VITALS = ["STEPS", "HEART_RATE", "HEART_RATE_VARIABILITY_SDNN", "BLOOD_OXYGEN", "RESPIRATORY_RATE"]
+DASHBOARD_SECTIONS = ("summary", "sync_status", "user_vitals")
+
+
+@timed("raw_scan")
+def _raw_counts_by_date(date_list):
+    """Raw record count per date and user, read from the gzipped files in DATA_DIR."""
+    import gzip
+    wanted = set(date_list)
+    counts = {}
+    for fname in os.listdir(DATA_DIR):
+        if not fname.endswith('.gz'):
             continue
-    
+        date_str = raw_file_date(fname)
+        if date_str in wanted:
+            user_id = fname.split('_', 1)[0]
+            with gzip.open(os.path.join(DATA_DIR, fname), 'rt', encoding='utf-8') as f:
+                records = json.load(f)
+            by_user = counts.setdefault(date_str, {})
+            by_user[user_id] = by_user.get(user_id, 0) + (len(records) if isinstance(records, list) else 1)
+    return counts
+
+
+def scan_sources(date_list, include_raw=True, backend=None, include_tables=True):
+    """
+    Read every source once so several views of the same dates can share the work.
+
+    Each Delta table is loaded a single time through the query backend (QUERY_BACKEND unless
+    one is given), projected to the columns the summaries and matrices use (ingestion_date,
+    the user ID columns and, for bronze, the vital type) over all dates, since the matrices
+    list every user ever seen. The raw directory is listed once and reduced to record counts
+    per date and user.
+
+    With the aggregate store enabled, per-(date, user) row counts come from it instead; tables
+    are then only loaded when include_tables is set (the matrices need them) or the store is
+    unavailable for a table.
+    """
+    backend = get_backend(backend)
+    tables = {}
+    aggregates = {}
+    user_columns = {}
+    for name, path in TABLE_PATHS.items():
+        try:
+            dt = open_table(path)
+            fields = [field.name for field in dt.schema().fields]
+            user_columns[name] = [field for field in fields if 'user_id' in field.lower()]
+            columns = ['ingestion_date'] + user_columns[name]
+            if name == 'bronze' and 'type' in fields:
+                columns.append('type')
+            aggregates[name] = None
+            if AGGREGATE_STORE_ENABLED and 'ingestion_date' in fields and 'user_id' in fields:
+                try:
+                    with span(f"aggregate_refresh_{name}"):
+                        aggregates[name] = aggregate_store.date_user_counts(path, dt)
+                except Exception as e:
+                    print(f"Aggregate store unavailable for {name}: {str(e)}")
+            if include_tables or aggregates[name] is None:
+                with span(f"delta_read_{name}"):
+                    tables[name] = backend.load(dt, columns)
+            else:
+                tables[name] = None
+        except Exception as e:
+            print(f"Error reading table {name}: {str(e)}")
+            tables[name] = None
+            aggregates[name] = None
+            user_columns[name] = []
+    return {
+        "dates": list(date_list),
+        "backend": backend,
+        "tables": tables,
+        "aggregates": aggregates,
+        "user_columns": user_columns,
+        "raw_counts": _raw_counts_by_date(date_list) if include_raw else None,
+    }
+
+
+def _table_counts(scan, name, date_list):
+    """Row count per (ingestion_date, user_id) of one table over the dates, or None if it could not be read."""
+    totals = scan.get("aggregates", {}).get(name)
+    if totals is not None:
+        return totals.filter(pc.is_in(totals["ingestion_date"], value_set=pa.array(list(date_list), pa.string())))
+    source = scan["tables"].get(name)
+    if source is None:
+        return None
+    return scan["backend"].date_user_counts(source, date_list)
+
+
+def _raw_counts(scan, date_list):
+    if scan["raw_counts"] is None or not set(date_list) <= set(scan["dates"]):
+        scan = {**scan, "raw_counts": _raw_counts_by_date(date_list)}
+    counts = {}
+    for date_str in date_list:
+        for user_id, count in scan["raw_counts"].get(date_str, {}).items():
+            counts[user_id] = counts.get(user_id, 0) + count
+    return counts
+
+
+def _delta_counts(scan, names, date_list):
+    """Record count per user over the given dates summed across the named tables, plus the total row count."""
+    counts = {}
+    total = 0
+    for name in names:
+        if scan.get("aggregates", {}).get(name) is not None:
+            by_date = _table_counts(scan, name, date_list)
+            grouped = by_date.group_by('user_id').aggregate([('count', 'sum')])
+            table_counts = dict(zip(grouped['user_id'].to_pylist(), grouped['count_sum'].to_pylist()))
+            rows = pc.sum(by_date['count']).as_py() or 0
+        else:
+            source = scan["tables"].get(name)
+            if source is None:
+                continue
+            table_counts, rows = scan["backend"].user_counts(source, date_list)
+        total += rows
+        for user_id, count in table_counts.items():
+            counts[user_id] = counts.get(user_id, 0) + count
+    return counts, total
+
+
+def _is_successful(raw_records, bronze_records, silver_records):
+    """A user's ingestion succeeded when raw == bronze > 0 and each silver table holds a copy."""
+    return (raw_records == bronze_records and
+            bronze_records > 0 and
+            silver_records == raw_records * 3)
+
+
+@timed("summary_compute")
+def _summarize(scan, date_list):
+    raw_records_by_user = _raw_counts(scan, date_list)
+    bronze_records_by_user, bronze_count = _delta_counts(scan, ['bronze'], date_list)
+    silver_records_by_user, silver_count = _delta_counts(scan, SILVER_TABLES, date_list)
+    raw_count = sum(raw_records_by_user.values())
+    raw_users = set(raw_records_by_user)
+
     # Calculate successful and failed ingestions based on new logic
     successful_ingestions = 0
     failed_ingestions = 0
-    
     for user_id in raw_users:
-        raw_records = raw_records_by_user.get(user_id, 0)
-        bronze_records = bronze_records_by_user.get(user_id, 0)
-        silver_records = silver_records_by_user.get(user_id, 0)
-        
-        # Check if user meets all criteria for successful ingestion
-        if (raw_records == bronze_records and 
-            bronze_records > 0 and 
-            silver_records == raw_records * 3):
+        if _is_successful(raw_records_by_user.get(user_id, 0),
+                          bronze_records_by_user.get(user_id, 0),
+                          silver_records_by_user.get(user_id, 0)):
             successful_ingestions += 1
         else:
             failed_ingestions += 1
-    
+
     # Status
     raw_to_bronze_success = (raw_count == bronze_count and raw_count > 0)
     bronze_to_silver_success = (bronze_count * 3 == silver_count and bronze_count > 0)
-    
     return {
-        "period_type": period_type,
-        "date_range": f"{date_list[0]} to {date_list[-1]}",
-        "date_list": date_list,
         "total_users": len(raw_users),
         "total_raw": raw_count,
         "total_bronze": bronze_count,
@@ -137,233 +341,589 @@ def get_aggregated_summary(date_list, period_type):
         "bronze_to_silver_status": "Success" if bronze_to_silver_success else "Failed",
         "successful_ingestions": successful_ingestions,
         "failed_ingestions": failed_ingestions,
-        "users": sorted(list(raw_users))
+        "users": sorted(raw_users)
+    }
+
+
+def get_aggregated_summary(date_list, period_type, scan=None):
+    """Get aggregated summary for a list of dates."""
+    if scan is None:
+        scan = scan_sources(date_list, include_tables=False)
+    return {
+        "period_type": period_type,
+        "date_range": f"{date_list[0]} to {date_list[-1]}",
+        "date_list": date_list,
+        **_summarize(scan, date_list)
     }
 
-def get_weekly_summary(date_str: str) -> dict:
+@shared_result("weekly_summary", get_week_dates, source_signature)
+def get_weekly_summary(date_str: str, scan=None) -> dict:
     """Get summary for the week containing the given date."""
     week_dates = get_week_dates(date_str)
-    return get_aggregated_summary(week_dates, "week")
+    return get_aggregated_summary(week_dates, "week", scan)
 
-def get_monthly_summary(date_str: str) -> dict:
+@shared_result("monthly_summary", get_month_dates, source_signature)
+def get_monthly_summary(date_str: str, scan=None) -> dict:
     """Get summary for the month containing the given date."""
     month_dates = get_month_dates(date_str)
-    return get_aggregated_summary(month_dates, "month")
-
-
-def get_data_sync_status(date_str: str) -> dict:
-    def check_availability(df, user_id):
-        if df.empty:
-            return "Missing"
-        user_id_cols = [col for col in df.columns if 'user_id' in col.lower()]
-        for col in user_id_cols:
-            if user_id in df[col].values:
-                return "Available"
-        return "Missing"
-
-    def get_all_users():
-        all_users = set()
-        for name, path in TABLE_PATHS.items():
-            try:
-                dt = DeltaTable(path)
-                df = dt.to_pandas()
-                user_id_cols = [col for col in df.columns if 'user_id' in col.lower()]
-                for col in user_id_cols:
-                    all_users.update(df[col].dropna().unique())
-            except Exception as e:
-                print(f"Error getting users from {name}: {str(e)}")
-                continue
-        return sorted(all_users)
-
-    def get_column_names():
-        columns = ["user_id"]
-        for name in TABLE_PATHS:
-            if name == "bronze":
-                columns.append("Bronze Data")
-            elif name == "silver_rrbucket":
-                columns.append("Silver RRBucket")
-            elif name == "silver_vitalsbaseline":
-                columns.append("Silver VitalsBaseline")
-            elif name == "silver_vitalsswt":
-                columns.append("Silver VitalSWT")
-            else:
-                columns.append(name.replace("_", " ").title())
-        return columns
+    return get_aggregated_summary(month_dates, "month", scan)
 
-    result = []
-    tables = {}
-    empty_df = pd.DataFrame(columns=['user_id'])
-    columns = get_column_names()
-    all_users = get_all_users()
+@shared_result("summary", lambda date_str: [date_str], source_signature)
+def get_summary(date_str: str, scan=None) -> dict:
+    """Get summary for a single date."""
+    if scan is None:
+        scan = scan_sources([date_str], include_tables=False)
+    return {"date": date_str, **_summarize(scan, [date_str])}
+
+
+RANGE_GRANULARITIES = ("day", "week", "month")
+MAX_RANGE_DAYS = 366
+
+
+def _bucket_start(date_str, granularity):
+    """First day of the day, ISO week or calendar month containing date_str."""
+    if granularity == "week":
+        return get_week_dates(date_str)[0]
+    if granularity == "month":
+        return date_str[:8] + "01"
+    return date_str
+
+
+def _source_counts(scan, date_list):
+    """
+    Row count per (ingestion_date, user_id) of every source in one table with raw, bronze and
+    silver columns (zero where a row comes from another source) and an in_raw flag.
+    """
+    parts = []
+    def part(counts, column, in_raw=0):
+        num_rows = counts.num_rows
+        zeros = pa.array(np.zeros(num_rows, dtype=np.int64))
+        parts.append(pa.table({
+            "ingestion_date": counts["ingestion_date"],
+            "user_id": counts["user_id"],
+            **{name: counts["count"] if name == column else zeros for name in ("raw", "bronze", "silver")},
+            "in_raw": pa.array(np.full(num_rows, in_raw, dtype=np.int64)),
+        }))
+
+    if scan["raw_counts"] is None or not set(date_list) <= set(scan["dates"]):
+        scan = {**scan, "raw_counts": _raw_counts_by_date(date_list)}
+    raw = [(date_str, user_id, count) for date_str in date_list
+           for user_id, count in scan["raw_counts"].get(date_str, {}).items()]
+    part(pa.table({"ingestion_date": pa.array([r[0] for r in raw], pa.string()),
+                   "user_id": pa.array([r[1] for r in raw], pa.string()),
+                   "count": pa.array([r[2] for r in raw], pa.int64())}), "raw", in_raw=1)
+    for column, names in (("bronze", ['bronze']), ("silver", SILVER_TABLES)):
+        for name in names:
+            counts = _table_counts(scan, name, date_list)
+            if counts is not None:
+                part(counts, column)
+    return pa.concat_tables(parts)
+
+
+@timed("range_summary_compute")
+def _summarize_range(scan, date_list, granularity):
+    starts = [_bucket_start(date_str, granularity) for date_str in date_list]
+    bucket_starts = sorted(set(starts))
+    position = {start: i for i, start in enumerate(bucket_starts)}
+    bucket_of_date = np.array([position[start] for start in starts], dtype=np.int64)
+
+    counts = _source_counts(scan, date_list)
+    date_index = pc.index_in(counts["ingestion_date"], value_set=pa.array(date_list, pa.string()))
+    counts = counts.append_column("bucket", pa.array(bucket_of_date[date_index.to_numpy(zero_copy_only=False)]))
+    # One group-by to per-(bucket, user) totals; the per-bucket sums below are plain array reductions
+    by_user = counts.group_by(["bucket", "user_id"]).aggregate(
+        [("raw", "sum"), ("bronze", "sum"), ("silver", "sum"), ("in_raw", "max")])
+    bucket = by_user["bucket"].to_numpy()
+    raw, bronze, silver = (by_user[f"{name}_sum"].to_numpy() for name in ("raw", "bronze", "silver"))
+    in_raw = by_user["in_raw_max"].to_numpy() > 0
+    successful = in_raw & (raw == bronze) & (bronze > 0) & (silver == raw * 3)
+
+    def per_bucket(values):
+        return np.bincount(bucket, weights=values, minlength=len(bucket_starts)).astype(np.int64).tolist()
+
+    totals = {
+        "total_users": per_bucket(in_raw),
+        "total_raw": per_bucket(raw),
+        "total_bronze": per_bucket(bronze),
+        "total_silver": per_bucket(silver),
+        "successful_ingestions": per_bucket(successful),
+    }
+    buckets = []
+    for i, bucket_start in enumerate(bucket_starts):
+        dates = [date_str for date_str, start in zip(date_list, starts) if start == bucket_start]
+        raw_count, bronze_count, silver_count = totals["total_raw"][i], totals["total_bronze"][i], totals["total_silver"][i]
+        buckets.append({
+            "bucket": bucket_start,
+            "start": dates[0],
+            "end": dates[-1],
+            "total_users": totals["total_users"][i],
+            "total_raw": raw_count,
+            "total_bronze": bronze_count,
+            "total_silver": silver_count,
+            "raw_to_bronze_status": "Success" if raw_count == bronze_count and raw_count > 0 else "Failed",
+            "bronze_to_silver_status": "Success" if bronze_count * 3 == silver_count and bronze_count > 0 else "Failed",
+            "successful_ingestions": totals["successful_ingestions"][i],
+            "failed_ingestions": totals["total_users"][i] - totals["successful_ingestions"][i],
+        })
+    return buckets
+
+
+def _range_summary(start_str, end_str, granularity, date_list, scan=None):
+    if scan is None:
+        scan = scan_sources(date_list, include_tables=False)
+    return {
+        "start": start_str,
+        "end": end_str,
+        "granularity": granularity,
+        "buckets": _summarize_range(scan, date_list, granularity),
+    }
 
+
+def get_range_summary(start_str, end_str, granularity="day", scan=None) -> dict:
+    """
+    Summary counts and statuses per day, ISO week or calendar month bucket of a date range.
+
+    Every source is read once for the whole range and reduced with one group-by per (bucket, user),
+    so a year costs one scan rather than one per day. Buckets are clipped to the range, and each
+    bucket's counts and statuses follow the same rules as the daily, weekly and monthly summaries.
+
+    Raises:
+        ValueError: bad dates, end before start, a range over MAX_RANGE_DAYS or an unknown granularity
+    """
+    if granularity not in RANGE_GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}', expected one of {', '.join(RANGE_GRANULARITIES)}")
+    date_list = get_range_dates(start_str, end_str)
+    if len(date_list) > MAX_RANGE_DAYS:
+        raise ValueError(f"Date range must not exceed {MAX_RANGE_DAYS} days")
+
+    if scan is not None or not result_cache.RESULT_CACHE_ENABLED:
+        return _range_summary(start_str, end_str, granularity, date_list, scan)
+    params = {"start": start_str, "end": end_str, "granularity": granularity}
+    return result_cache.get_or_compute(
+        result_cache.make_key("range_summary", params, source_signature(date_list)),
+        lambda: _range_summary(start_str, end_str, granularity, date_list),
+        view=result_cache.make_key("range_summary", params, None))
+
+
+_sketch_lock = threading.Lock()
+
+def _sketch_counts(path):
+    """Row counts per (ingestion_date, user_id) of a table, from the aggregate store unless it cannot follow the table"""
+    dt = open_table(path)
+    if AGGREGATE_STORE_ENABLED:
+        try:
+            return aggregate_store.date_user_counts(path, dt)
+        except aggregate_store.NotIncremental as e:
+            print(f"Sketching {path} from a scan: {e}")
+    table = dt.to_pyarrow_table(columns=['ingestion_date', 'user_id'])
+    return table.group_by(['ingestion_date', 'user_id']).aggregate([([], "count_all")]).rename_columns(
+        ['ingestion_date', 'user_id', 'count'])
+
+def _refresh_sketches(previous, versions, raw_digests):
+    """
+    Sketches for the given table versions and raw digests. For a table whose version moved, only
+    the dates whose per-user row counts changed are re-sketched; raw sketches are only rebuilt for
+    dates whose files changed.
+    """
+    if previous is None or previous.precision != user_sketches.PRECISION:
+        previous = user_sketches.UserSketches({}, {}, {}, {})
+    # The loaded sketches are shared with other readers; build a new object
+    sketches = user_sketches.UserSketches(dict(previous.sketches), dict(previous.records), dict(versions),
+                                          dict(raw_digests), table_digests=dict(previous.table_digests))
     for name, path in TABLE_PATHS.items():
+        if versions.get(name) is not None and previous.versions.get(name) == versions[name]:
+            continue
         try:
-            dt = DeltaTable(path)
-            df = dt.to_pandas()
-            # Filter by ingestion_date
-            filtered = df[df['ingestion_date'] == date_str]
-            tables[name] = filtered if not filtered.empty else empty_df
+            counts = _sketch_counts(path)
+            digests = user_sketches.daily_digests(counts['ingestion_date'], counts['user_id'], counts['count'])
         except Exception as e:
-            print(f"Error processing table {name}: {str(e)}")
-            tables[name] = empty_df
+            print(f"Error sketching table {name}: {str(e)}")
+            sketches.replace(name, {})
+            sketches.table_digests.pop(name, None)
             continue
+        known = previous.table_digests.get(name)
+        if known is None:
+            # Sketched before digests were kept (or never): start the table over
+            sketches.replace(name, {})
+            known = {}
+        for date_str in known:
+            if date_str not in digests:
+                sketches.drop(name, date_str)
+        changed = [date_str for date_str, digest in digests.items() if known.get(date_str) != digest]
+        if changed:
+            rows = counts.filter(pc.is_in(counts['ingestion_date'], value_set=pa.array(changed, pa.string())))
+            sketches.update(name, user_sketches.daily_sketches(rows['ingestion_date'], rows['user_id'],
+                                                               counts=rows['count']))
+        sketches.table_digests[name] = digests
+    for date_str in previous.raw_digests:
+        if date_str not in raw_digests:
+            sketches.drop(user_sketches.RAW, date_str)
+    changed = [date_str for date_str, digest in raw_digests.items() if previous.raw_digests.get(date_str) != digest]
+    if changed:
+        counts = _raw_counts_by_date(changed)
+        for date_str in changed:
+            by_user = counts.get(date_str, {})
+            sketch = user_sketches.HyperLogLog()
+            sketch.add(list(by_user))
+            sketches.update(user_sketches.RAW, {date_str: (sketch, sum(by_user.values()))})
+    return sketches
+
+def current_user_sketches():
+    """Daily user sketches matching the current table versions and raw files, refreshed first if needed."""
+    path = user_sketches.sketch_path(TABLE_PATHS)
+    versions = get_table_versions()
+    raw_digests = _raw_digests_by_date()
+    sketches = user_sketches.load(path)
+    if sketches is not None and sketches.versions == versions and sketches.raw_digests == raw_digests:
+        return sketches
+    with _sketch_lock:
+        sketches = user_sketches.load(path)
+        if sketches is None or sketches.versions != versions or sketches.raw_digests != raw_digests:
+            sketches = _refresh_sketches(sketches, versions, raw_digests)
+            user_sketches.write(sketches, path)
+    return sketches
+
+def rebuild_user_sketches():
+    """Sketch every source from scratch, e.g. after the tables were recreated and their versions restarted."""
+    with _sketch_lock:
+        sketches = _refresh_sketches(None, get_table_versions(), _raw_digests_by_date())
+        user_sketches.write(sketches, user_sketches.sketch_path(TABLE_PATHS))
+    return sketches
 
-    for uid in all_users:
-        row = {
-            "user_id": uid,
-            "bronze": check_availability(tables.get('bronze', empty_df), uid),
-            "silver_rrbucket": check_availability(tables.get('silver_rrbucket', empty_df), uid),
-            "silver_vitalsbaseline": check_availability(tables.get('silver_vitalsbaseline', empty_df), uid),
-            "silver_vitalsswt": check_availability(tables.get('silver_vitalsswt', empty_df), uid)
-        }
-        result.append(row)
+@timed("approximate_summary")
+def get_approximate_summary(date_list, period_type=None) -> dict:
+    """
+    Summary of a date range from the daily user sketches, without reading the sources.
 
+    Distinct users are HyperLogLog estimates, reported with the relative standard error and
+    bounds of about 95% (two standard errors); record totals and statuses are exact.
+    Successful/failed ingestions need exact per-user counts and are left out (None).
+    """
+    sketches = current_user_sketches()
+    distinct = {}
+    for source, names in (("raw", [user_sketches.RAW]), ("bronze", ['bronze']), ("silver", SILVER_TABLES)):
+        distinct[source] = round(sketches.union(names, date_list).estimate())
+    raw_count = sketches.record_count([user_sketches.RAW], date_list)
+    bronze_count = sketches.record_count(['bronze'], date_list)
+    silver_count = sketches.record_count(SILVER_TABLES, date_list)
+    relative_error = user_sketches.HyperLogLog(precision=sketches.precision).relative_error
+    total_users = distinct["raw"]
+    summary = {
+        "total_users": total_users,
+        "total_raw": raw_count,
+        "total_bronze": bronze_count,
+        "total_silver": silver_count,
+        "raw_to_bronze_status": "Success" if raw_count == bronze_count and raw_count > 0 else "Failed",
+        "bronze_to_silver_status": "Success" if bronze_count * 3 == silver_count and bronze_count > 0 else "Failed",
+        "successful_ingestions": None,
+        "failed_ingestions": None,
+        "approximate": True,
+        "distinct_users": distinct,
+        "relative_error": round(relative_error, 5),
+        "total_users_bounds": {
+            "lower": max(0, int(total_users * (1 - 2 * relative_error))),
+            "upper": int(math.ceil(total_users * (1 + 2 * relative_error))),
+            "confidence": 0.95,
+        },
+    }
+    if period_type is None:
+        return summary
     return {
-        "columns": columns,
-        "data": result
+        "period_type": period_type,
+        "date_range": f"{date_list[0]} to {date_list[-1]}",
+        "date_list": date_list,
+        **summary
     }
 
 
-def get_user_vitals_status(date_str: str) -> dict:
-    def get_all_users():
-        all_users = set()
-        for name, path in TABLE_PATHS.items():
-            try:
-                dt = DeltaTable(path)
-                df = dt.to_pandas()
-                user_id_cols = [col for col in df.columns if 'user_id' in col.lower()]
-                for col in user_id_cols:
-                    all_users.update(df[col].dropna().unique())
-            except Exception as e:
-                print(f"Error getting users from {name}: {str(e)}")
-                continue
-        return sorted(all_users)
+def get_user_record_counts(date_list, scan=None):
+    """
+    Raw, bronze and silver record counts per user over the given dates, with the same
+    success rule the summaries use.
+    """
+    if scan is None:
+        scan = scan_sources(date_list, include_tables=False)
+    raw = _raw_counts(scan, date_list)
+    bronze, _ = _delta_counts(scan, ['bronze'], date_list)
+    silver, _ = _delta_counts(scan, SILVER_TABLES, date_list)
+    users = sorted(set(raw) | set(bronze) | set(silver))
+    raw_col = [raw.get(u, 0) for u in users]
+    bronze_col = [bronze.get(u, 0) for u in users]
+    silver_col = [silver.get(u, 0) for u in users]
+    status = ["Success" if _is_successful(r, b, s) else "Failed" for r, b, s in zip(raw_col, bronze_col, silver_col)]
+    return pa.table({
+        "user_id": pa.array(users, pa.string()),
+        "raw": pa.array(raw_col, pa.int64()),
+        "bronze": pa.array(bronze_col, pa.int64()),
+        "silver": pa.array(silver_col, pa.int64()),
+        "status": pa.array(status, pa.string()),
+    })
 
-    def get_vitals_columns():
-        try:
-            dt = DeltaTable(TABLE_PATHS['bronze'])
-            df = dt.to_pandas()
-            if 'type' in df.columns:
-                vitals = df['type'].unique().tolist()
-                vitals = sorted([vital for vital in vitals if vital and vital.strip()])
-                return ["user_id"] + vitals
-            else:
-                return ["user_id", "STEPS", "HEART_RATE", "HEART_RATE_VARIABILITY_SDNN", "BLOOD_OXYGEN", "RESPIRATORY_RATE"]
-        except Exception as e:
-            print(f"Error getting vitals columns: {str(e)}")
-            return ["user_id", "STEPS", "HEART_RATE", "HEART_RATE_VARIABILITY_SDNN", "BLOOD_OXYGEN", "RESPIRATORY_RATE"]
-
-    dt = DeltaTable(TABLE_PATHS['bronze'])
-    df = dt.to_pandas()
-    df = df[df['ingestion_date'] == date_str]
-    columns = get_vitals_columns()
-    vitals = columns[1:]
-    result = []
-    all_users = get_all_users()
-    for uid in all_users:
-        user_df = df[df['user_id'] == uid]
-        entry = {"user_id": uid}
-        for vital in vitals:
-            entry[vital] = "Available" if not user_df.empty and vital in user_df['type'].values else "Missing"
-        result.append(entry)
+
+def current_presence_index():
+    """The persisted presence index when it matches the current table versions, else None"""
+    return presence_index.current(TABLE_PATHS, get_table_versions())
+
+
+def refresh_presence_index():
+    """Rebuild the presence index if it is missing or was built from older table versions"""
+    if current_presence_index() is None:
+        presence_index.rebuild(TABLE_PATHS)
+
+
+def get_all_users(scan=None):
+    """Sorted user IDs seen in any Delta table, across all dates."""
+    index = current_presence_index()
+    if index is not None:
+        return list(index.users)
+    if scan is None:
+        scan = scan_sources([], include_raw=False)
+    all_users = set()
+    for name, source in scan["tables"].items():
+        if source is None:
+            continue
+        for col in scan["user_columns"][name]:
+            all_users.update(scan["backend"].distinct(source, col))
+    return sorted(all_users)
+
+
+def get_vitals_columns(scan=None):
+    """Matrix columns for the vitals view: user_id followed by every vital type in bronze."""
+    index = current_presence_index()
+    if index is not None:
+        return ["user_id"] + (DEFAULT_VITALS if index.vitals is None else index.vitals)
+    if scan is None:
+        scan = scan_sources([], include_raw=False)
+    bronze = scan["tables"].get('bronze')
+    if bronze is None or 'type' not in scan["backend"].columns(bronze):
+        return ["user_id"] + DEFAULT_VITALS
+    vitals = scan["backend"].distinct(bronze, 'type')
+    return ["user_id"] + sorted([vital for vital in vitals if vital and vital.strip()])
+
+
+def _date_user_grid(date_list, all_users):
+    """Every (date, user) pair as Arrow arrays, dates outermost."""
+    users = pa.array(all_users, type=pa.string())
+    dates = pa.array(list(date_list), type=pa.string())
+    date_col = pc.take(dates, np.repeat(np.arange(len(dates)), len(users)))
+    user_col = pc.take(users, np.tile(np.arange(len(users)), len(dates)))
+    return date_col, user_col
+
+
+def _presence(date_col, user_col, dates, users):
+    """Mask over the grid marking (date, user) pairs that occur in the given columns."""
+    grid_keys = pc.binary_join_element_wise(date_col, user_col, "|")
+    seen_keys = pc.binary_join_element_wise(dates, users, "|")
+    return pc.is_in(grid_keys, value_set=pc.unique(seen_keys.drop_null()))
+
+
+def _status(mask):
+    return pc.if_else(mask, "Available", "Missing")
+
+
+def _matrix_from_index(index, kind, names, date_list, all_users):
+    """Status matrix over the (date, user) grid with one column per table or vital, from bitmaps."""
+    date_col, user_col = _date_user_grid(date_list, all_users)
+    ids = index.ids(all_users)
+    columns = {"ingestion_date": date_col, "user_id": user_col}
+    for name in names:
+        masks = [index.mask(kind, name, date_str, ids) for date_str in date_list]
+        columns[name] = _status(pa.array(np.concatenate(masks) if masks else np.zeros(0, dtype=bool)))
+    return pa.table(columns)
+
+
+@timed("sync_matrix")
+def build_sync_matrix(date_list, all_users=None, scan=None):
+    """
+    Availability of every known user in each Delta table, one row per (ingestion_date, user_id).
+
+    Built column-wise from Arrow arrays so large ranges never materialize per-row Python objects.
+    Uses the presence index when it is current, without reading the tables.
+    """
+    index = current_presence_index()
+    if index is not None:
+        if all_users is None:
+            all_users = index.users
+        return _matrix_from_index(index, presence_index.TABLE, list(TABLE_PATHS), date_list, all_users)
+    if scan is None:
+        scan = scan_sources(date_list, include_raw=False)
+    if all_users is None:
+        all_users = get_all_users(scan)
+    date_col, user_col = _date_user_grid(date_list, all_users)
+    columns = {"ingestion_date": date_col, "user_id": user_col}
+    for name in TABLE_PATHS:
+        mask = pa.array(np.zeros(len(user_col), dtype=bool))
+        source = scan["tables"].get(name)
+        if source is not None:
+            for col in scan["user_columns"][name]:
+                dates, users = scan["backend"].present_pairs(source, col, date_list)
+                mask = pc.or_(mask, _presence(date_col, user_col, dates, users))
+        columns[name] = _status(mask)
+    return pa.table(columns)
+
+
+@timed("vitals_matrix")
+def build_vitals_matrix(date_list, all_users=None, vitals=None, scan=None):
+    """
+    Availability of each vital type per user in bronze, one row per (ingestion_date, user_id).
+    """
+    index = current_presence_index()
+    if index is not None:
+        if all_users is None:
+            all_users = index.users
+        if vitals is None:
+            vitals = get_vitals_columns()[1:]
+        return _matrix_from_index(index, presence_index.VITAL, vitals, date_list, all_users)
+    if scan is None:
+        scan = scan_sources(date_list, include_raw=False)
+    if all_users is None:
+        all_users = get_all_users(scan)
+    if vitals is None:
+        vitals = get_vitals_columns(scan)[1:]
+    date_col, user_col = _date_user_grid(date_list, all_users)
+    columns = {"ingestion_date": date_col, "user_id": user_col}
+    bronze = scan["tables"].get('bronze')
+    for vital in vitals:
+        if bronze is None or 'type' not in scan["backend"].columns(bronze):
+            mask = pa.array(np.zeros(len(user_col), dtype=bool))
+        else:
+            dates, users = scan["backend"].present_pairs(bronze, "user_id", date_list, vital)
+            mask = _presence(date_col, user_col, dates, users)
+        columns[vital] = _status(mask)
+    return pa.table(columns)
+
+
+MATRIX_STATUSES = ("Available", "Missing")
+
+
+@timed("matrix_query")
+def query_matrix(matrix, status_filters=None, search=None, sort=None):
+    """
+    Filter, search and sort a sync-status or vitals matrix as Arrow before it is paginated.
+
+    Args:
+        matrix (pa.Table): Matrix with a user_id column and one status column per table or vital
+        status_filters (list): "<column>:<Available|Missing>" conditions, all of which must hold
+        search (str): User ID prefix
+        sort (str): Column to sort by, "-" prefix for descending; ties are broken by user_id
+
+    Raises:
+        ValueError: unknown column or status in a filter or sort
+    """
+    status_columns = [name for name in matrix.column_names if name not in ("user_id", "ingestion_date")]
+    mask = None
+    for condition in status_filters or []:
+        column, _, status = condition.partition(":")
+        if column not in status_columns:
+            raise ValueError(f"Unknown status column '{column}', expected one of {', '.join(status_columns)}")
+        if status not in MATRIX_STATUSES:
+            raise ValueError(f"Unknown status '{status}', expected Available or Missing")
+        condition_mask = pc.equal(matrix[column], status)
+        mask = condition_mask if mask is None else pc.and_(mask, condition_mask)
+    if search:
+        prefix_mask = pc.starts_with(matrix["user_id"], pattern=search)
+        mask = prefix_mask if mask is None else pc.and_(mask, prefix_mask)
+    if mask is not None:
+        matrix = matrix.filter(mask)
+    if sort:
+        column = sort.lstrip("-")
+        order = "descending" if sort.startswith("-") else "ascending"
+        if column != "user_id" and column not in status_columns:
+            raise ValueError(f"Unknown sort column '{column}'")
+        keys = [(column, order)] if column == "user_id" else [(column, order), ("user_id", "ascending")]
+        matrix = matrix.sort_by(keys)
+    return matrix
+
+
+@shared_result("sync_status", lambda date_str: [date_str], source_signature, MatrixCodec)
+def get_sync_status_matrix(date_str: str, scan=None):
+    """Display columns and Arrow matrix of the sync-status view for one date."""
+    columns = ["user_id"] + [SYNC_COLUMN_LABELS.get(name, name.replace("_", " ").title()) for name in TABLE_PATHS]
+    matrix = build_sync_matrix([date_str], scan=scan).drop_columns(["ingestion_date"])
+    return columns, matrix
+
+
+@shared_result("user_vitals", lambda date_str: [date_str], source_signature, MatrixCodec)
+def get_user_vitals_matrix(date_str: str, scan=None):
+    """Display columns and Arrow matrix of the user-vitals view for one date."""
+    if scan is None and current_presence_index() is None:
+        scan = scan_sources([date_str], include_raw=False)
+    columns = get_vitals_columns(scan)
+    matrix = build_vitals_matrix([date_str], vitals=columns[1:], scan=scan).drop_columns(["ingestion_date"])
+    return columns, matrix
+
+
+def get_missing_users(date_list, table: str, reference: str = "bronze"):
+    """
+    Sorted users present in the reference table but missing from `table` on the same date,
+    for any of the given dates.
+
+    Raises:
+        ValueError: unknown table name
+    """
+    for name in (table, reference):
+        if name not in TABLE_PATHS:
+            raise ValueError(f"Unknown table '{name}', expected one of {', '.join(TABLE_PATHS)}")
+    index = current_presence_index()
+    if index is not None:
+        return index.names(index.missing(table, reference, date_list))
+    matrix = build_sync_matrix(date_list)
+    rows = matrix.filter(pc.and_(pc.equal(matrix[reference], "Available"), pc.equal(matrix[table], "Missing")))
+    return sorted(set(rows["user_id"].to_pylist()))
+
+
+def get_data_sync_status(date_str: str, scan=None) -> dict:
+    columns, matrix = get_sync_status_matrix(date_str, scan)
     return {
         "columns": columns,
-        "data": result
+        "data": matrix.to_pylist()
     }
 
 
-def get_summary(date_str: str) -> dict:
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_dir = os.path.join(BASE_DIR, 'data')
-    # Count raw records for the date
-    raw_count = 0
-    raw_users = set()
-    raw_records_by_user = {}  # Track raw records per user
-    for fname in os.listdir(data_dir):
-        if fname.endswith('.gz'):
-            user_id, rest = fname.split('_', 1)
-            ingestion_date = rest.split('_')[0].split('.')[0]
-            try:
-                dt = datetime.fromtimestamp(int(ingestion_date) / 1000, UTC)
-                date_str_file = dt.strftime('%Y-%m-%d')
-            except Exception:
-                date_str_file = ''
-            if date_str_file == date_str:
-                import gzip, json
-                with gzip.open(os.path.join(data_dir, fname), 'rt', encoding='utf-8') as f:
-                    records = json.load(f)
-                    if isinstance(records, list):
-                        record_count = len(records)
-                        raw_count += record_count
-                        raw_users.add(user_id)
-                        raw_records_by_user[user_id] = raw_records_by_user.get(user_id, 0) + record_count
-                    else:
-                        raw_count += 1
-                        raw_users.add(user_id)
-                        raw_records_by_user[user_id] = raw_records_by_user.get(user_id, 0) + 1
-    # Bronze
-    bronze_count = 0
-    bronze_users = set()
-    bronze_records_by_user = {}  # Track bronze records per user
-    try:
-        dt_bronze = DeltaTable(TABLE_PATHS['bronze'])
-        df_bronze = dt_bronze.to_pandas()
-        df_bronze = df_bronze[df_bronze['ingestion_date'] == date_str]
-        bronze_count = len(df_bronze)
-        bronze_users = set(df_bronze['user_id'].unique())
-        # Count records per user
-        for user_id in df_bronze['user_id'].unique():
-            user_records = len(df_bronze[df_bronze['user_id'] == user_id])
-            bronze_records_by_user[user_id] = user_records
-    except Exception as e:
-        bronze_count = 0
-        bronze_users = set()
-    # Silver (sum all silver tables)
-    silver_count = 0
-    silver_users = set()
-    silver_records_by_user = {}  # Track silver records per user
-    for key in ['silver_rrbucket', 'silver_vitalsbaseline', 'silver_vitalsswt']:
-        try:
-            dt_silver = DeltaTable(TABLE_PATHS[key])
-            df_silver = dt_silver.to_pandas()
-            df_silver = df_silver[df_silver['ingestion_date'] == date_str]
-            silver_count += len(df_silver)
-            silver_users.update(df_silver['user_id'].unique())
-            # Count records per user
-            for user_id in df_silver['user_id'].unique():
-                user_records = len(df_silver[df_silver['user_id'] == user_id])
-                silver_records_by_user[user_id] = silver_records_by_user.get(user_id, 0) + user_records
-        except Exception:
-            continue
-    # Calculate successful and failed ingestions based on new logic
-    successful_ingestions = 0
-    failed_ingestions = 0
-    
-    for user_id in raw_users:
-        raw_records = raw_records_by_user.get(user_id, 0)
-        bronze_records = bronze_records_by_user.get(user_id, 0)
-        silver_records = silver_records_by_user.get(user_id, 0)
-        
-        # Check if user meets all criteria for successful ingestion
-        if (raw_records == bronze_records and 
-            bronze_records > 0 and 
-            silver_records == raw_records * 3):
-            successful_ingestions += 1
-        else:
-            failed_ingestions += 1
-    
-    # Status
-    raw_to_bronze_success = (raw_count == bronze_count and raw_count > 0)
-    bronze_to_silver_success = (bronze_count * 3 == silver_count and bronze_count > 0)
+def get_user_vitals_status(date_str: str, scan=None) -> dict:
+    columns, matrix = get_user_vitals_matrix(date_str, scan)
     return {
-        "date": date_str,
-        "total_users": len(raw_users),
-        "total_raw": raw_count,
-        "total_bronze": bronze_count,
-        "total_silver": silver_count,
-        "raw_to_bronze_status": "Success" if raw_to_bronze_success else "Failed",
-        "bronze_to_silver_status": "Success" if bronze_to_silver_success else "Failed",
-        "successful_ingestions": successful_ingestions,
-        "failed_ingestions": failed_ingestions,
-        "users": sorted(list(raw_users))
+        "columns": columns,
+        "data": matrix.to_pylist()
+    }
+
+
+_dashboard_flights = SingleFlight("dashboard")
+
+def get_dashboard(date_str: str, view_type: str = "daily", sections=DASHBOARD_SECTIONS, arrow: bool = False) -> dict:
+    """
+    Summary, sync-status and user-vitals views of a date computed from one shared scan.
+
+    The summary covers the daily, weekly or monthly period of the date; the matrices cover
+    the date itself. Only the requested sections are computed, and the raw directory is only
+    read when the summary is included. Identical concurrent requests share one computation.
+    With arrow, matrix sections are (columns, Arrow matrix) so callers can filter and slice
+    before converting rows; otherwise they are {"columns", "data"}.
+    """
+    date_list = get_view_dates(date_str, view_type)
+    key = (date_str, view_type, tuple(sections), json.dumps(source_signature(date_list), sort_keys=True))
+    result = _dashboard_flights.do(key, lambda: _compute_dashboard(date_str, view_type, sections, date_list))
+    if arrow:
+        return dict(result)
+    return {
+        section: {"columns": value[0], "data": value[1].to_pylist()} if section in ("sync_status", "user_vitals")
+        else value
+        for section, value in result.items()
     }
+
+
+def _compute_dashboard(date_str, view_type, sections, date_list):
+    scan = scan_sources(date_list, include_raw="summary" in sections)
+    result = {}
+    if "summary" in sections:
+        if view_type == "weekly":
+            result["summary"] = get_weekly_summary(date_str, scan)
+        elif view_type == "monthly":
+            result["summary"] = get_monthly_summary(date_str, scan)
+        else:
+            result["summary"] = get_summary(date_str, scan)
+    if "sync_status" in sections:
+        result["sync_status"] = get_sync_status_matrix(date_str, scan)
+    if "user_vitals" in sections:
+        result["user_vitals"] = get_user_vitals_matrix(date_str, scan)
+    return result
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import threading
+from config.settings import DIRTY_CHECK_SECONDS, DIRTY_STATE_PATH, DIRTY_HISTORY_SIZE
+from utils.metrics import register_collector
+from utils.files import tmp_path as _tmp_path, try_lock
+from services import delta_reader, result_cache, user_sketches
+
+# Late-arriving raw files. The listing of data/ (name, size, mtime) is compared with the one seen
+# last time; every new, rewritten or removed .gz file is mapped to its UTC date by the epoch-ms
+# part of its name (delta_reader.raw_file_date, the rule load_bronze uses for ingestion_date).
+# Only those dates and the weeks and months around them are dirty: their cached summaries are
+# dropped, stale fallbacks included, recomputed if they had been requested, and logged so the
+# recently recomputed dates can be listed. Everything else keeps its cached results. Weekly and
+# monthly summaries are cached once per period (under its first date), so a dirty month costs one
+# recomputation however many of its dates changed.
+#
+# Every worker runs the check, but the listing is shared: a check holds a lock file next to it and
+# workers that find the lock taken skip that round.
+#
+# Views keyed on the raw digest of their dates (summary exports, range summaries, the daily user
+# sketches, live dashboards) already miss their cache for a dirty date; the sketches are refreshed
+# here so the next approximate summary does not pay for it.
+
+# Per-date views that read the raw files, by result cache name
+RAW_VIEWS = {
+    "summary": delta_reader.get_summary,
+    "weekly_summary": delta_reader.get_weekly_summary,
+    "monthly_summary": delta_reader.get_monthly_summary,
+}
+
+stats = {"checks": 0, "dirty_files": 0, "dirty_dates": 0, "recomputed": 0}
+
+_lock = threading.Lock()
+_thread = None
+
+
+def _listing():
+    """{name: [size, mtime_ns]} of the raw .gz files"""
+    files = {}
+    try:
+        with os.scandir(delta_reader.DATA_DIR) as it:
+            for entry in it:
+                if entry.name.endswith('.gz'):
+                    stat = entry.stat()
+                    files[entry.name] = [stat.st_size, stat.st_mtime_ns]
+    except FileNotFoundError:
+        pass
+    return files
+
+
+def _load_state():
+    try:
+        with open(DIRTY_STATE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save_state(state):
+    os.makedirs(os.path.dirname(DIRTY_STATE_PATH), exist_ok=True)
+    tmp_path = _tmp_path(DIRTY_STATE_PATH)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, DIRTY_STATE_PATH)
+
+
+def changed_files(previous, current):
+    """Names of files added, rewritten or removed between two listings"""
+    return sorted(name for name in set(previous) | set(current) if previous.get(name) != current.get(name))
+
+
+def dirty_scope(dates):
+    """Dirty dates with the weeks (by Monday) and months enclosing them"""
+    dates = sorted(set(dates))
+    return {
+        "dates": dates,
+        "weeks": sorted({delta_reader.get_week_dates(date_str)[0] for date_str in dates}),
+        "months": sorted({date_str[:7] for date_str in dates}),
+    }
+
+
+def _view_date(name, date_str):
+    """Date the cached view of the given kind covering date_str is keyed on: its first date"""
+    if name == "weekly_summary":
+        return delta_reader.get_week_dates(date_str)[0]
+    if name == "monthly_summary":
+        return delta_reader.get_month_dates(date_str)[0]
+    return date_str
+
+
+def mark_dirty(dates):
+    """
+    Drop the cached raw-dependent views of the dates and their weeks and months, then recompute
+    the ones that had been cached. Returns [(view name, date)] recomputed.
+    """
+    candidates = {}
+    for name in RAW_VIEWS:
+        for date_str in dates:
+            view_date = _view_date(name, date_str)
+            candidates[result_cache.view_key(name, view_date)] = (name, view_date)
+    cached = [candidates[view] for view in result_cache.invalidate_views(candidates)]
+    recomputed = []
+    for name, view_date in sorted(cached):
+        try:
+            RAW_VIEWS[name](view_date)
+            recomputed.append((name, view_date))
+        except Exception as e:
+            print(f"Error recomputing {name} for {view_date}: {e}")
+    if os.path.exists(user_sketches.sketch_path(delta_reader.TABLE_PATHS)):
+        delta_reader.current_user_sketches()
+    stats["recomputed"] += len(recomputed)
+    return recomputed
+
+
+def check_once():
+    """
+    Compare data/ with the listing seen last time and handle the dirty dates. The first check only
+    records the listing. Returns the dirty scope, or None when nothing changed or another worker
+    is checking.
+    """
+    lock = try_lock(f"{DIRTY_STATE_PATH}.lock")
+    if lock is None:
+        return None
+    with lock, _lock:
+        stats["checks"] += 1
+        state = _load_state()
+        current = _listing()
+        if state is None:
+            _save_state({"files": current, "history": []})
+            return None
+        changed = changed_files(state["files"], current)
+        if not changed:
+            return None
+        detected_at = time.time()
+        files_by_date = {}
+        for name in changed:
+            date_str = delta_reader.raw_file_date(name)
+            if date_str:
+                files_by_date.setdefault(date_str, []).append(name)
+        scope = dirty_scope(files_by_date)
+        recomputed = mark_dirty(scope["dates"])
+        recomputed_at = time.time()
+        history = state.get("history", [])
+        for date_str in scope["dates"]:
+            history.append({
+                "date": date_str,
+                "week": delta_reader.get_week_dates(date_str)[0],
+                "month": date_str[:7],
+                "files": files_by_date[date_str],
+                "recomputed_views": [f"{name}:{view_date}" for name, view_date in recomputed
+                                     if _view_date(name, date_str) == view_date],
+                "detected_at": detected_at,
+                "recomputed_at": recomputed_at,
+            })
+        _save_state({"files": current, "history": history[-DIRTY_HISTORY_SIZE:]})
+        stats["dirty_files"] += len(changed)
+        stats["dirty_dates"] += len(scope["dates"])
+        return scope
+
+
+def recent(limit: int = 50):
+    """Most recently recomputed dates, newest first"""
+    state = _load_state() or {}
+    return list(reversed(state.get("history", [])))[:limit]
+
+
+def _run(interval):
+    while True:
+        try:
+            check_once()
+        except Exception as e:
+            print(f"Error checking raw files: {e}")
+        time.sleep(interval)
+
+
+def start(interval: float = DIRTY_CHECK_SECONDS):
+    """Check data/ every interval seconds on a background thread (once; 0 disables)"""
+    global _thread
+    if interval <= 0 or _thread is not None:
+        return
+    _thread = threading.Thread(target=_run, args=(interval,), name="dirty-dates", daemon=True)
+    _thread.start()
+
+
+def _collect_dirty_stats():
+    return [
+        ("etl_dirty_checks_total", "counter", "Checks of data/ for late raw files", [({}, stats["checks"])]),
+        ("etl_dirty_files_total", "counter", "New, rewritten or removed raw files found", [({}, stats["dirty_files"])]),
+        ("etl_dirty_dates_total", "counter", "Dates marked dirty by late raw files", [({}, stats["dirty_dates"])]),
+        ("etl_dirty_recomputed_total", "counter", "Cached views recomputed for dirty dates",
+         [({}, stats["recomputed"])]),
+    ]
+
+register_collector(_collect_dirty_stats)
@@ -1,192 +1,205 @@
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
 from datetime import datetime
 import io
+from utils.lazy import lazy_import
+from utils.metrics import timed
 
-def create_summary_excel(summary_data, view_type, date_range):
+openpyxl = lazy_import("openpyxl")
+styles = lazy_import("openpyxl.styles")
+
+def write_summary_sheet(ws, summary_data, view_type, date_range):
     """
-    Create an Excel file with summary data
+    Write the summary report layout (metrics, ingestion and pipeline status, users) into a worksheet
     
     Args:
+        ws: openpyxl worksheet to fill
         summary_data (dict): Summary data from the API
         view_type (str): 'daily', 'weekly', or 'monthly'
         date_range (str): Date range string for display
-    
-    Returns:
-        bytes: Excel file as bytes
     """
-    try:
-        print(f"Creating Excel file - View Type: {view_type}, Date Range: {date_range}")
-        print(f"Summary data keys: {list(summary_data.keys()) if summary_data else 'None'}")
-        
-        # Create a new workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = f"{view_type.title()} Summary"
-        
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        subheader_font = Font(bold=True, color="000000")
-        subheader_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Title
-        ws['A1'] = f"ETL Monitoring - {view_type.title()} Summary Report"
-        ws['A1'].font = Font(bold=True, size=16)
-        ws.merge_cells('A1:B1')
-        
-        # Date range - Convert to DD-MM-YYYY format
-        def format_date_range(date_range_str):
-            """Convert date range from YYYY-MM-DD to DD-MM-YYYY format"""
-            if ' to ' in date_range_str:
-                # Handle date ranges like "2025-07-28 to 2025-08-03"
-                start_date, end_date = date_range_str.split(' to ')
-                start_formatted = datetime.strptime(start_date, '%Y-%m-%d').strftime('%d-%m-%Y')
-                end_formatted = datetime.strptime(end_date, '%Y-%m-%d').strftime('%d-%m-%Y')
-                return f"{start_formatted} to {end_formatted}"
-            else:
-                # Handle single date like "2025-07-28"
-                return datetime.strptime(date_range_str, '%Y-%m-%d').strftime('%d-%m-%Y')
-        
-        formatted_date_range = format_date_range(date_range)
-        ws['A2'] = f"Period: {formatted_date_range}"
-        ws['A2'].font = Font(bold=True, size=12)
-        ws.merge_cells('A2:B2')
-        
-        # Generated timestamp
-        ws['A3'] = f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        ws['A3'].font = Font(italic=True, size=10)
-        ws.merge_cells('A3:B3')
-        
-        # Add some spacing
-        ws['A4'] = ""
-        ws['A5'] = ""
-        
-        # Key Metrics Section
-        row = 6
-        ws[f'A{row}'] = "Key Metrics"
-        ws[f'A{row}'].font = header_font
-        ws[f'A{row}'].fill = header_fill
-        ws.merge_cells(f'A{row}:B{row}')
-        
-        row += 1
-        metrics_data = [
-            ["Metric", "Value"],
-            ["Total Raw Records", summary_data.get('total_raw', 0)],
-            ["Total Bronze Records", summary_data.get('total_bronze', 0)],
-            ["Total Silver Records", summary_data.get('total_silver', 0)]
-        ]
-        
-        for i, row_data in enumerate(metrics_data):
-            current_row = row + i
-            for col, value in enumerate(row_data, 1):
-                cell = ws.cell(row=current_row, column=col, value=value)
-                cell.border = border
-                if i == 0:  # Header row
-                    cell.font = subheader_font
-                    cell.fill = subheader_fill
-        
-        row += len(metrics_data)
-        ws[f'A{row}'] = ""
-        row += 1
-        
-        # Ingestion Status Section
-        ws[f'A{row}'] = "Ingestion Status"
+    # Define styles
+    header_font = styles.Font(bold=True, color="FFFFFF")
+    header_fill = styles.PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    subheader_font = styles.Font(bold=True, color="000000")
+    subheader_fill = styles.PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
+    border = styles.Border(
+        left=styles.Side(style='thin'),
+        right=styles.Side(style='thin'),
+        top=styles.Side(style='thin'),
+        bottom=styles.Side(style='thin')
+    )
+    
+    # Title
+    ws['A1'] = f"ETL Monitoring - {view_type.title()} Summary Report"
+    ws['A1'].font = styles.Font(bold=True, size=16)
+    ws.merge_cells('A1:B1')
+    
+    # Date range - Convert to DD-MM-YYYY format
+    def format_date_range(date_range_str):
+        """Convert date range from YYYY-MM-DD to DD-MM-YYYY format"""
+        if ' to ' in date_range_str:
+            # Handle date ranges like "2025-07-28 to 2025-08-03"
+            start_date, end_date = date_range_str.split(' to ')
+            start_formatted = datetime.strptime(start_date, '%Y-%m-%d').strftime('%d-%m-%Y')
+            end_formatted = datetime.strptime(end_date, '%Y-%m-%d').strftime('%d-%m-%Y')
+            return f"{start_formatted} to {end_formatted}"
+        else:
+            # Handle single date like "2025-07-28"
+            return datetime.strptime(date_range_str, '%Y-%m-%d').strftime('%d-%m-%Y')
+    
+    formatted_date_range = format_date_range(date_range)
+    ws['A2'] = f"Period: {formatted_date_range}"
+    ws['A2'].font = styles.Font(bold=True, size=12)
+    ws.merge_cells('A2:B2')
+    
+    # Generated timestamp
+    ws['A3'] = f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    ws['A3'].font = styles.Font(italic=True, size=10)
+    ws.merge_cells('A3:B3')
+    
+    # Add some spacing
+    ws['A4'] = ""
+    ws['A5'] = ""
+    
+    # Key Metrics Section
+    row = 6
+    ws[f'A{row}'] = "Key Metrics"
+    ws[f'A{row}'].font = header_font
+    ws[f'A{row}'].fill = header_fill
+    ws.merge_cells(f'A{row}:B{row}')
+    
+    row += 1
+    metrics_data = [
+        ["Metric", "Value"],
+        ["Total Raw Records", summary_data.get('total_raw', 0)],
+        ["Total Bronze Records", summary_data.get('total_bronze', 0)],
+        ["Total Silver Records", summary_data.get('total_silver', 0)]
+    ]
+    
+    for i, row_data in enumerate(metrics_data):
+        current_row = row + i
+        for col, value in enumerate(row_data, 1):
+            cell = ws.cell(row=current_row, column=col, value=value)
+            cell.border = border
+            if i == 0:  # Header row
+                cell.font = subheader_font
+                cell.fill = subheader_fill
+    
+    row += len(metrics_data)
+    ws[f'A{row}'] = ""
+    row += 1
+    
+    # Ingestion Status Section
+    ws[f'A{row}'] = "Ingestion Status"
+    ws[f'A{row}'].font = header_font
+    ws[f'A{row}'].fill = header_fill
+    ws.merge_cells(f'A{row}:B{row}')
+    
+    row += 1
+    ingestion_data = [
+        ["Metric", "Value"],
+        ["Total Users", summary_data.get('total_users', 0)],
+        ["Successful Ingestions", summary_data.get('successful_ingestions', 0)],
+        ["Missing Ingestions", summary_data.get('total_users', 0) - summary_data.get('successful_ingestions', 0)]
+    ]
+    
+    for i, row_data in enumerate(ingestion_data):
+        current_row = row + i
+        for col, value in enumerate(row_data, 1):
+            cell = ws.cell(row=current_row, column=col, value=value)
+            cell.border = border
+            if i == 0:  # Header row
+                cell.font = subheader_font
+                cell.fill = subheader_fill
+    
+    row += len(ingestion_data)
+    ws[f'A{row}'] = ""
+    row += 1
+    
+    # Pipeline Status Section
+    ws[f'A{row}'] = "Pipeline Status"
+    ws[f'A{row}'].font = header_font
+    ws[f'A{row}'].fill = header_fill
+    ws.merge_cells(f'A{row}:B{row}')
+    
+    row += 1
+    pipeline_data = [
+        ["Pipeline Stage", "Status"],
+        ["Raw to Bronze", summary_data.get('raw_to_bronze_status', 'Unknown')],
+        ["Bronze to Silver", summary_data.get('bronze_to_silver_status', 'Unknown')],
+        ["Overall Status", "Success" if (
+            summary_data.get('raw_to_bronze_status') == 'Success' and
+            summary_data.get('bronze_to_silver_status') == 'Success' and
+            summary_data.get('total_users', 0) == summary_data.get('successful_ingestions', 0)
+        ) else "Failed"]
+    ]
+    
+    for i, row_data in enumerate(pipeline_data):
+        current_row = row + i
+        for col, value in enumerate(row_data, 1):
+            cell = ws.cell(row=current_row, column=col, value=value)
+            cell.border = border
+            if i == 0:  # Header row
+                cell.font = subheader_font
+                cell.fill = subheader_fill
+            elif col == 2 and i > 0:  # Status column
+                if value == 'Success':
+                    cell.fill = styles.PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+                elif value == 'Failed':
+                    cell.fill = styles.PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+    
+    row += len(pipeline_data)
+    ws[f'A{row}'] = ""
+    row += 1
+    
+    # Users List Section (if available)
+    if 'users' in summary_data and summary_data['users']:
+        ws[f'A{row}'] = "Users"
         ws[f'A{row}'].font = header_font
         ws[f'A{row}'].fill = header_fill
         ws.merge_cells(f'A{row}:B{row}')
         
         row += 1
-        ingestion_data = [
-            ["Metric", "Value"],
-            ["Total Users", summary_data.get('total_users', 0)],
-            ["Successful Ingestions", summary_data.get('successful_ingestions', 0)],
-            ["Missing Ingestions", summary_data.get('total_users', 0) - summary_data.get('successful_ingestions', 0)]
-        ]
-        
-        for i, row_data in enumerate(ingestion_data):
-            current_row = row + i
-            for col, value in enumerate(row_data, 1):
-                cell = ws.cell(row=current_row, column=col, value=value)
-                cell.border = border
-                if i == 0:  # Header row
-                    cell.font = subheader_font
-                    cell.fill = subheader_fill
-        
-        row += len(ingestion_data)
-        ws[f'A{row}'] = ""
-        row += 1
-        
-        # Pipeline Status Section
-        ws[f'A{row}'] = "Pipeline Status"
-        ws[f'A{row}'].font = header_font
-        ws[f'A{row}'].fill = header_fill
+        # Header for user IDs
+        ws[f'A{row}'] = "User ID"
+        ws[f'A{row}'].font = subheader_font
+        ws[f'A{row}'].fill = subheader_fill
+        ws[f'A{row}'].border = border
         ws.merge_cells(f'A{row}:B{row}')
         
         row += 1
-        pipeline_data = [
-            ["Pipeline Stage", "Status"],
-            ["Raw to Bronze", summary_data.get('raw_to_bronze_status', 'Unknown')],
-            ["Bronze to Silver", summary_data.get('bronze_to_silver_status', 'Unknown')],
-            ["Overall Status", "Success" if (
-                summary_data.get('raw_to_bronze_status') == 'Success' and
-                summary_data.get('bronze_to_silver_status') == 'Success' and
-                summary_data.get('total_users', 0) == summary_data.get('successful_ingestions', 0)
-            ) else "Failed"]
-        ]
-        
-        for i, row_data in enumerate(pipeline_data):
-            current_row = row + i
-            for col, value in enumerate(row_data, 1):
-                cell = ws.cell(row=current_row, column=col, value=value)
-                cell.border = border
-                if i == 0:  # Header row
-                    cell.font = subheader_font
-                    cell.fill = subheader_fill
-                elif col == 2 and i > 0:  # Status column
-                    if value == 'Success':
-                        cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                    elif value == 'Failed':
-                        cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-        
-        row += len(pipeline_data)
-        ws[f'A{row}'] = ""
-        row += 1
-        
-        # Users List Section (if available)
-        if 'users' in summary_data and summary_data['users']:
-            ws[f'A{row}'] = "Users"
-            ws[f'A{row}'].font = header_font
-            ws[f'A{row}'].fill = header_fill
-            ws.merge_cells(f'A{row}:B{row}')
-            
-            row += 1
-            # Header for user IDs
-            ws[f'A{row}'] = "User ID"
-            ws[f'A{row}'].font = subheader_font
-            ws[f'A{row}'].fill = subheader_fill
+        # Each user ID on its own row, spanning both columns
+        for user_id in summary_data['users']:
+            ws[f'A{row}'] = user_id
             ws[f'A{row}'].border = border
             ws.merge_cells(f'A{row}:B{row}')
-            
             row += 1
-            # Each user ID on its own row, spanning both columns
-            for user_id in summary_data['users']:
-                ws[f'A{row}'] = user_id
-                ws[f'A{row}'].border = border
-                ws.merge_cells(f'A{row}:B{row}')
-                row += 1
+    
+    # Set specific column widths for better formatting
+    ws.column_dimensions['A'].width = 35  # Metric/Pipeline Stage column
+    ws.column_dimensions['B'].width = 25  # Value/Status column
+
+@timed("excel_build")
+def create_summary_excel(summary_data, view_type, date_range):
+    """
+    Create an Excel file with summary data
+    
+    Args:
+        summary_data (dict): Summary data from the API
+        view_type (str): 'daily', 'weekly', or 'monthly'
+        date_range (str): Date range string for display
+    
+    Returns:
+        bytes: Excel file as bytes
+    """
+    try:
+        print(f"Creating Excel file - View Type: {view_type}, Date Range: {date_range}")
+        print(f"Summary data keys: {list(summary_data.keys()) if summary_data else 'None'}")
         
-        # Set specific column widths for better formatting
-        ws.column_dimensions['A'].width = 35  # Metric/Pipeline Stage column
-        ws.column_dimensions['B'].width = 25  # Value/Status column
+        # Create a new workbook
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = f"{view_type.title()} Summary"
+        write_summary_sheet(ws, summary_data, view_type, date_range)
         
         # Save to bytes
         output = io.BytesIO()
@@ -201,4 +214,80 @@ def create_summary_excel(summary_data, view_type, date_range):
         print(f"Error creating Excel file: {e}")
         import traceback
         traceback.print_exc()
-        raise e 
\ No newline at end of file
+        raise e
+
+
+# Rows per worksheet in the xlsx format, header included
+EXCEL_MAX_ROWS = 1048576
+
+
+def table_sheets(title, table):
+    """
+    (sheet title, rows) parts of a table that each fit in one worksheet with its header row.
+    Tables too long for one sheet continue on "<title> (2)", "<title> (3)", ...
+    """
+    rows_per_sheet = EXCEL_MAX_ROWS - 1
+    if table.num_rows <= rows_per_sheet:
+        return [(title, table)]
+    return [(title if i == 0 else f"{title} ({i + 1})", table.slice(offset, rows_per_sheet))
+            for i, offset in enumerate(range(0, table.num_rows, rows_per_sheet))]
+
+
+def write_table_sheet(ws, table):
+    """
+    Write an Arrow table into a worksheet as a header row plus one row per record
+    
+    Args:
+        ws: openpyxl worksheet to fill
+        table (pyarrow.Table): Data to write; "Available"/"Success" and "Missing"/"Failed" cells are colour coded
+    """
+    header_font = styles.Font(bold=True, color="FFFFFF")
+    header_fill = styles.PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    ok_fill = styles.PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+    bad_fill = styles.PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+    
+    for col, name in enumerate(table.column_names, 1):
+        cell = ws.cell(row=1, column=col, value=name)
+        cell.font = header_font
+        cell.fill = header_fill
+        ws.column_dimensions[cell.column_letter].width = max(15, len(name) + 2)
+    
+    columns = [table[name].to_pylist() for name in table.column_names]
+    for row, values in enumerate(zip(*columns), 2):
+        for col, value in enumerate(values, 1):
+            cell = ws.cell(row=row, column=col, value=value)
+            if value in ("Available", "Success"):
+                cell.fill = ok_fill
+            elif value in ("Missing", "Failed"):
+                cell.fill = bad_fill
+    ws.freeze_panes = "A2"
+
+@timed("excel_build")
+def create_report_excel(summary_data, view_type, date_range, user_counts=None, sync_matrix=None, vitals_matrix=None):
+    """
+    Create a multi-sheet Excel report: the summary sheet plus any of the detail tables provided
+    
+    Args:
+        summary_data (dict): Summary data from the API
+        view_type (str): 'daily', 'weekly', or 'monthly'
+        date_range (str): Date range string for display
+        user_counts (pyarrow.Table, optional): Per-user raw/bronze/silver record counts
+        sync_matrix (pyarrow.Table, optional): Sync-status matrix
+        vitals_matrix (pyarrow.Table, optional): User-vitals matrix
+    
+    Returns:
+        bytes: Excel file as bytes
+    """
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = f"{view_type.title()} Summary"
+    write_summary_sheet(ws, summary_data, view_type, date_range)
+    
+    for title, table in (("User Counts", user_counts), ("Sync Status", sync_matrix), ("Vitals Status", vitals_matrix)):
+        if table is not None:
+            for sheet_title, part in table_sheets(title, table):
+                write_table_sheet(wb.create_sheet(sheet_title), part)
+    
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+import threading
+from config.settings import EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_BYTES
+from utils.metrics import register_cache
+from utils.files import tmp_path as _tmp_path
+
+# Generated export files on local disk, named by a digest of everything that went into them.
+# Least recently used files (by mtime, refreshed on every hit) are evicted once the
+# directory grows past EXPORT_CACHE_MAX_BYTES.
+
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0, "evictions": 0}
+register_cache("export", stats)
+
+
+def make_key(**inputs) -> str:
+    """Content address for an export: sha256 over its JSON-encoded inputs."""
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _path(key: str, extension: str) -> str:
+    return os.path.join(EXPORT_CACHE_DIR, f"{key}.{extension}")
+
+
+def lookup(key: str, extension: str):
+    """Path of a cached export, or None. A hit marks the file as recently used."""
+    path = _path(key, extension)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        with _lock:
+            stats["misses"] += 1
+        return None
+    with _lock:
+        stats["hits"] += 1
+    return path
+
+
+def open_entry(key: str, extension: str):
+    """
+    Open file of a cached export, or None. The file stays readable once opened even if it is
+    evicted meanwhile; an entry evicted between the lookup and the open counts as a miss.
+    """
+    path = lookup(key, extension)
+    if path is None:
+        return None
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        with _lock:
+            stats["hits"] -= 1
+            stats["misses"] += 1
+        return None
+
+
+def store(key: str, extension: str, data: bytes) -> str:
+    """Atomically write an export into the cache and evict old entries if over budget."""
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    path = _path(key, extension)
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    evict()
+    return path
+
+
+def store_stream(key: str, extension: str, chunks):
+    """
+    Pass chunks through to the caller while writing them to the cache.
+
+    The entry only becomes visible once the stream has been fully consumed, so an
+    interrupted download never leaves a truncated file behind.
+    """
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    path = _path(key, extension)
+    tmp_path = _tmp_path(path)
+    completed = False
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        completed = True
+    finally:
+        if completed:
+            os.replace(tmp_path, path)
+            evict()
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def evict(max_bytes: int = None):
+    """Remove least recently used exports until the cache fits in max_bytes."""
+    if max_bytes is None:
+        max_bytes = EXPORT_CACHE_MAX_BYTES
+    with _lock:
+        entries = []
+        total = 0
+        try:
+            with os.scandir(EXPORT_CACHE_DIR) as it:
+                for entry in it:
+                    if entry.name.endswith(".tmp") or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+        except FileNotFoundError:
+            return
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                stats["evictions"] += 1
+            except FileNotFoundError:
+                pass
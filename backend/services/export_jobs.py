@@ -0,0 +1,168 @@
+import uuid
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import EXPORT_WORKERS, EXPORT_MAX_PENDING, EXPORT_JOB_TTL_SECONDS
+from services import export_cache
+from services.delta_reader import (
+    get_summary,
+    get_weekly_summary,
+    get_monthly_summary,
+    get_view_dates,
+    scan_sources,
+    get_table_identities,
+    get_raw_manifest_digest,
+    get_user_record_counts,
+    build_sync_matrix,
+    build_vitals_matrix
+)
+from services.excel_export import create_report_excel
+from utils.metrics import register_collector
+
+# Report workbooks are built on a small dedicated pool so a heavy export never occupies the
+# threads that serve interactive requests. Finished workbooks live in the export cache;
+# the job table only tracks status and progress.
+
+REPORT_SHEETS = ("user_counts", "sync_status", "vitals_status")
+
+_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export-job")
+_jobs = {}
+_lock = threading.Lock()
+
+
+class ExportQueueFull(Exception):
+    """Raised when EXPORT_MAX_PENDING jobs are already queued or running."""
+
+
+def _update(job_id, **fields):
+    with _lock:
+        _jobs[job_id].update(fields)
+
+
+def _prune():
+    cutoff = time.time() - EXPORT_JOB_TTL_SECONDS
+    with _lock:
+        for job_id in [j for j, job in _jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            del _jobs[job_id]
+
+
+def _build_report(job_id, view_type, date, date_list, sheets, custom_count):
+    _update(job_id, status="running", progress=5, stage="scan")
+    scan = scan_sources(date_list)
+    if view_type == "weekly":
+        summary_data = get_weekly_summary(date, scan)
+    elif view_type == "monthly":
+        summary_data = get_monthly_summary(date, scan)
+    else:
+        summary_data = get_summary(date, scan)
+    if custom_count is not None:
+        # Summaries can be shared cached results; never modify them in place
+        summary_data = {**summary_data, 'total_users': custom_count}
+    date_range = summary_data.get('date_range', summary_data.get('date', date))
+
+    tables = {}
+    steps = [
+        ("user_counts", get_user_record_counts),
+        ("sync_status", build_sync_matrix),
+        ("vitals_status", build_vitals_matrix),
+    ]
+    for i, (sheet, build) in enumerate(steps, 1):
+        if sheet in sheets:
+            _update(job_id, progress=5 + i * 20, stage=sheet)
+            tables[sheet] = build(date_list, scan=scan)
+
+    _update(job_id, progress=85, stage="workbook")
+    return create_report_excel(
+        summary_data,
+        view_type,
+        date_range,
+        user_counts=tables.get("user_counts"),
+        sync_matrix=tables.get("sync_status"),
+        vitals_matrix=tables.get("vitals_status")
+    )
+
+
+def _run(job_id, view_type, date, date_list, sheets, custom_count, cache_key):
+    try:
+        data = _build_report(job_id, view_type, date, date_list, sheets, custom_count)
+        export_cache.store(cache_key, "xlsx", data)
+        _update(job_id, status="completed", progress=100, stage="done", size=len(data), finished_at=time.time())
+    except Exception as e:
+        print(f"Error in export job {job_id}: {e}")
+        _update(job_id, status="failed", stage="failed", error=str(e), finished_at=time.time())
+
+
+def submit_report(owner_id, view_type, date, sheets, custom_count=None) -> dict:
+    """
+    Queue a multi-sheet report workbook and return its job record.
+
+    A report whose inputs are unchanged since it was last built completes immediately from the
+    export cache.
+
+    Raises:
+        ExportQueueFull: too many jobs are already pending
+        ValueError: unknown sheet name
+    """
+    unknown = set(sheets) - set(REPORT_SHEETS)
+    if unknown:
+        raise ValueError(f"Unknown sheets: {', '.join(sorted(unknown))}")
+    _prune()
+    date_list = get_view_dates(date, view_type)
+    sheets = [sheet for sheet in REPORT_SHEETS if sheet in sheets]
+    cache_key = export_cache.make_key(
+        view="report",
+        view_type=view_type,
+        dates=date_list,
+        sheets=sheets,
+        tables=get_table_identities(),
+        raw=get_raw_manifest_digest(date_list),
+        user_count=custom_count
+    )
+    job_id = uuid.uuid4().hex
+    job = {
+        "job_id": job_id,
+        "owner_id": owner_id,
+        "status": "queued",
+        "progress": 0,
+        "stage": "queued",
+        "view_type": view_type,
+        "date": date,
+        "sheets": sheets,
+        "filename": f"etl_report_{view_type}_{date}.xlsx",
+        "cache_key": cache_key,
+        "size": None,
+        "error": None,
+        "created_at": time.time(),
+        "finished_at": None,
+    }
+
+    cached_path = export_cache.lookup(cache_key, "xlsx")
+    with _lock:
+        if cached_path:
+            job.update(status="completed", progress=100, stage="done", finished_at=time.time())
+            _jobs[job_id] = job
+            return dict(job)
+        pending = sum(1 for j in _jobs.values() if j["status"] in ("queued", "running"))
+        if pending >= EXPORT_MAX_PENDING:
+            raise ExportQueueFull(f"{pending} export jobs are already pending")
+        _jobs[job_id] = job
+    _executor.submit(_run, job_id, view_type, date, date_list, sheets, custom_count, cache_key)
+    return dict(job)
+
+
+def get_job(job_id):
+    """Snapshot of a job record, or None if unknown or expired."""
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def _collect_job_stats():
+    with _lock:
+        counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+        for job in _jobs.values():
+            counts[job["status"]] += 1
+    return [("etl_export_jobs", "gauge", "Tracked export jobs by status",
+             [({"status": status}, count) for status, count in counts.items()])]
+
+register_collector(_collect_job_stats)
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import uuid
+import threading
+from utils.metrics import register_collector
+from utils.files import tmp_path as _tmp_path
+from services import delta_reader
+
+# Bookkeeping shared by the ingestion scripts and the API: which raw files are already in the
+# Delta tables, and counters of the ingestion watcher. Both live as small JSON files next to the
+# tables, so /metrics reports the watcher whether it runs in the API process or on its own.
+#
+# A watcher batch commits to each table separately. Before writing, it is recorded as in flight
+# with an ID (which tags its Delta commits) and the table versions it started from, and it is
+# removed once every table holds it. A batch still in flight after a failure or crash is retried
+# under the same ID, and the tables whose history already has a commit with it are skipped.
+
+STATUS_DIRNAME = "_ingest"
+INGESTED_FILENAME = "ingested.json"
+STATS_FILENAME = "stats.json"
+IN_FLIGHT_FILENAME = "in_flight.json"
+WATCHER_LOCK_FILENAME = "watcher.lock"
+
+STATS_KEYS = ("batches", "files", "records", "bytes", "failed_batches", "pending_files",
+              "last_batch_files", "last_batch_records", "last_batch_seconds", "last_batch_at",
+              "last_lag_seconds", "max_lag_seconds")
+
+_lock = threading.Lock()
+
+
+def status_dir(table_paths) -> str:
+    return os.path.join(os.path.dirname(table_paths["bronze"]), STATUS_DIRNAME)
+
+
+def _read_json(path, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def _write_json(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+def file_signature(path):
+    """[size, mtime_ns] of a raw file, the identity ingestion bookkeeping compares"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def read_ingested(table_paths):
+    """{file name: [size, mtime_ns]} of the raw files in the tables, or None when never recorded"""
+    return _read_json(os.path.join(status_dir(table_paths), INGESTED_FILENAME), None)
+
+
+def record_ingested(table_paths, files, replace=False):
+    """
+    Remember that the given raw file paths are in the tables (replace=True after a full reload,
+    which also forgets the batches in flight)
+    """
+    with _lock:
+        ingested = {} if replace else (read_ingested(table_paths) or {})
+        for path in files:
+            try:
+                ingested[os.path.basename(path)] = file_signature(path)
+            except FileNotFoundError:
+                pass
+        _write_json(os.path.join(status_dir(table_paths), INGESTED_FILENAME), ingested)
+        if replace and read_in_flight(table_paths):
+            _write_json(os.path.join(status_dir(table_paths), IN_FLIGHT_FILENAME), {})
+
+
+def read_in_flight(table_paths):
+    """{batch ID: {"files": [file name], "versions": {table: version before the batch}}} not yet finished"""
+    return _read_json(os.path.join(status_dir(table_paths), IN_FLIGHT_FILENAME), {})
+
+
+def begin_batch(table_paths, files, versions) -> str:
+    """Record a batch of raw file paths about to be written from the given table versions; returns its ID"""
+    batch_id = uuid.uuid4().hex
+    with _lock:
+        in_flight = read_in_flight(table_paths)
+        in_flight[batch_id] = {"files": [os.path.basename(path) for path in files], "versions": versions}
+        _write_json(os.path.join(status_dir(table_paths), IN_FLIGHT_FILENAME), in_flight)
+    return batch_id
+
+
+def end_batch(table_paths, batch_id):
+    """Forget a batch that every table holds (or that was given up)"""
+    with _lock:
+        in_flight = read_in_flight(table_paths)
+        if in_flight.pop(batch_id, None) is not None:
+            _write_json(os.path.join(status_dir(table_paths), IN_FLIGHT_FILENAME), in_flight)
+
+
+def read_stats(table_paths):
+    return _read_json(os.path.join(status_dir(table_paths), STATS_FILENAME), {})
+
+
+def write_stats(table_paths, stats):
+    _write_json(os.path.join(status_dir(table_paths), STATS_FILENAME), {**stats, "updated_at": time.time()})
+
+
+def current_stats():
+    """Watcher counters for the tables the API reads"""
+    return read_stats(delta_reader.TABLE_PATHS)
+
+
+def _collect_ingest_stats():
+    stats = current_stats()
+    value = lambda key: stats.get(key) or 0
+    return [
+        ("etl_ingest_batches_total", "counter", "Micro-batches appended by the ingestion watcher",
+         [({}, value("batches"))]),
+        ("etl_ingest_failed_batches_total", "counter", "Micro-batches that could not be written",
+         [({}, value("failed_batches"))]),
+        ("etl_ingest_files_total", "counter", "Raw files ingested by the watcher", [({}, value("files"))]),
+        ("etl_ingest_records_total", "counter", "Records ingested by the watcher", [({}, value("records"))]),
+        ("etl_ingest_pending_files", "gauge", "Raw files waiting for the next micro-batch",
+         [({}, value("pending_files"))]),
+        ("etl_ingest_last_batch_seconds", "gauge", "Time to write the last micro-batch",
+         [({}, value("last_batch_seconds"))]),
+        ("etl_ingest_records_per_second", "gauge", "Write throughput of the last micro-batch",
+         [({}, value("last_batch_records") / value("last_batch_seconds") if value("last_batch_seconds") else 0)]),
+        ("etl_ingest_lag_seconds", "gauge", "Oldest file's wait from arrival to commit in the last micro-batch",
+         [({}, value("last_lag_seconds"))]),
+        ("etl_ingest_max_lag_seconds", "gauge", "Largest arrival-to-commit lag seen by the watcher",
+         [({}, value("max_lag_seconds"))]),
+    ]
+
+register_collector(_collect_ingest_stats)
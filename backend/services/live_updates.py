@@ -0,0 +1,218 @@
+import asyncio
+import threading
+import time
+from config.settings import LIVE_POLL_SECONDS, LIVE_QUEUE_SIZE
+from utils.metrics import register_collector
+from services.delta_reader import (
+    get_dashboard,
+    get_view_dates,
+    get_table_identities,
+    get_raw_manifest_digest
+)
+
+# One watcher thread polls source versions for every (date, view_type) that has subscribers.
+# When a source changes the dashboard is recomputed once per key and only the aggregates that
+# differ are fanned out to that key's subscribers, each through its own bounded queue. Snapshots
+# (the first event, and the reset sent to a client that fell behind) carry only the page of each
+# matrix the client asked for.
+
+MATRIX_SECTIONS = ("sync_status", "user_vitals")
+
+
+def diff_dashboard(old, new):
+    """
+    Changed parts of a dashboard: summary fields whose values differ, and matrix rows that
+    were added or changed (plus user IDs that disappeared) per section.
+    """
+    changes = {}
+    old_summary = old.get("summary") or {}
+    summary = {key: value for key, value in new.get("summary", {}).items() if old_summary.get(key) != value}
+    if summary:
+        changes["summary"] = summary
+    for section in MATRIX_SECTIONS:
+        if section not in new:
+            continue
+        before = old.get(section) or {"columns": [], "data": []}
+        after = new[section]
+        old_rows = {row["user_id"]: row for row in before["data"]}
+        new_ids = {row["user_id"] for row in after["data"]}
+        rows = [row for row in after["data"] if old_rows.get(row["user_id"]) != row]
+        removed = sorted(set(old_rows) - new_ids)
+        if rows or removed or before["columns"] != after["columns"]:
+            changes[section] = {"columns": after["columns"], "rows": rows, "removed": removed}
+    return changes
+
+
+def page_view(data, page: int, page_size: int):
+    """Dashboard with one page of each matrix's rows, paginated like the dashboard endpoint"""
+    view = dict(data)
+    start = (page - 1) * page_size
+    for section in MATRIX_SECTIONS:
+        if section in data:
+            rows = data[section]["data"]
+            view[section] = {
+                "columns": data[section]["columns"],
+                "data": rows[start:start + page_size],
+                "total_users": len(rows),
+                "total_pages": (len(rows) + page_size - 1) // page_size,
+                "page": page,
+                "page_size": page_size,
+            }
+    return view
+
+
+class Subscriber:
+    """One SSE client: a bounded asyncio queue fed from the watcher thread."""
+
+    def __init__(self, key, loop, queue_size, page=1, page_size=10):
+        self.key = key
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.page = page
+        self.page_size = page_size
+
+    def snapshot(self, data):
+        return page_view(data, self.page, self.page_size)
+
+    def offer(self, event, latest):
+        """Called on the subscriber's event loop. A full queue is replaced by one snapshot of the latest state."""
+        if self.queue.full():
+            self.dropped += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {"event": "snapshot", "data": self.snapshot(latest)}
+        self.queue.put_nowait(event)
+
+
+class LiveHub:
+    def __init__(self, poll_seconds=LIVE_POLL_SECONDS, queue_size=LIVE_QUEUE_SIZE):
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._state = {}
+        self._key_locks = {}
+        self._thread = None
+        self.stats = {"recomputes": 0, "events": 0, "dropped": 0}
+
+    def subscribe(self, key, loop, page=1, page_size=10) -> Subscriber:
+        subscriber = Subscriber(key, loop, self.queue_size, page, page_size)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-updates", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.key)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.key]
+                    self._state.pop(subscriber.key, None)
+                    self._key_locks.pop(subscriber.key, None)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _signature(self, key, table_identities):
+        date_str, view_type = key
+        return (tuple(sorted(table_identities.items(), key=lambda item: item[0])),
+                get_raw_manifest_digest(get_view_dates(date_str, view_type)))
+
+    def _refresh(self, key, table_identities):
+        """
+        Recompute a key if its sources moved. Returns (previous data or None, current data,
+        whether it was recomputed).
+        """
+        with self._key_lock(key):
+            signature = self._signature(key, table_identities)
+            state = self._state.get(key)
+            if state is not None and state["signature"] == signature:
+                return state["data"], state["data"], False
+            date_str, view_type = key
+            data = get_dashboard(date_str, view_type)
+            self.stats["recomputes"] += 1
+            with self._lock:
+                if key in self._subscribers:
+                    self._state[key] = {"signature": signature, "data": data, "computed_at": time.time()}
+                else:
+                    # The last subscriber left meanwhile; keep nothing for the key
+                    self._state.pop(key, None)
+                    self._key_locks.pop(key, None)
+            return (state["data"] if state else None), data, True
+
+    def snapshot(self, key):
+        """Current dashboard for a key, computed at most once however many clients ask at the same time."""
+        state = self._state.get(key)
+        if state is not None:
+            return state["data"]
+        return self._refresh(key, get_table_identities())[1]
+
+    def poll_once(self):
+        """Check every subscribed key for new Delta versions or raw files and publish changes."""
+        with self._lock:
+            keys = list(self._subscribers)
+        if not keys:
+            return
+        table_identities = get_table_identities()
+        for key in keys:
+            try:
+                refreshed = self._refresh(key, table_identities)
+            except Exception as e:
+                print(f"Error refreshing live dashboard {key}: {e}")
+                continue
+            previous, data, recomputed = refreshed
+            if not recomputed or previous is None:
+                continue
+            changes = diff_dashboard(previous, data)
+            if changes:
+                self._publish(key, {"event": "update", "data": changes}, data)
+
+    def _publish(self, key, event, latest):
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for subscriber in subscribers:
+            self.stats["events"] += 1
+            try:
+                subscriber.loop.call_soon_threadsafe(self._deliver, subscriber, event, latest)
+            except RuntimeError:
+                # Event loop already closed; the request's cleanup will unsubscribe it
+                pass
+
+    def _deliver(self, subscriber, event, latest):
+        dropped = subscriber.dropped
+        subscriber.offer(event, latest)
+        self.stats["dropped"] += subscriber.dropped - dropped
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Error in live update watcher: {e}")
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+live_hub = LiveHub()
+
+
+def _collect_live_stats():
+    return [
+        ("etl_live_subscribers", "gauge", "Connected live dashboard clients", [({}, live_hub.subscriber_count())]),
+        ("etl_live_recomputes_total", "counter", "Dashboard recomputations triggered by source changes",
+         [({}, live_hub.stats["recomputes"])]),
+        ("etl_live_events_total", "counter", "Update events queued to clients", [({}, live_hub.stats["events"])]),
+        ("etl_live_dropped_total", "counter", "Client backlogs collapsed into a snapshot",
+         [({}, live_hub.stats["dropped"])]),
+    ]
+
+register_collector(_collect_live_stats)
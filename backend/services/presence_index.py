@@ -0,0 +1,187 @@
+import os
+import json
+import threading
+from utils.lazy import lazy_import
+from utils.metrics import timed
+from utils.files import tmp_path as _tmp_path
+
+deltalake = lazy_import("deltalake")
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+pq = lazy_import("pyarrow.parquet")
+pyroaring = lazy_import("pyroaring")
+
+# Which users appear in each Delta table, and with each vital type in bronze, per ingestion date.
+# User IDs are mapped to dense integers (their position in the sorted user list) and each
+# (table, date) and (vital, date) pair is stored as one compressed Roaring bitmap, so availability
+# checks and weekly/monthly unions are bitmap operations instead of scans of the tables.
+#
+# The index is written next to the Delta tables after ingestion and records the table versions it
+# was built from; readers only use it while those versions are still current.
+
+INDEX_DIRNAME = "_presence_index"
+INDEX_FILENAME = "presence.parquet"
+
+TABLE = "table"
+VITAL = "vital"
+
+_cache_lock = threading.Lock()
+_cache = {}
+
+
+class PresenceIndex:
+    def __init__(self, users, bitmaps, versions, vitals):
+        self.users = users
+        self.bitmaps = bitmaps
+        self.versions = versions
+        # Sorted vital types in bronze, None when bronze has no type column
+        self.vitals = vitals
+        self._ids = {user_id: i for i, user_id in enumerate(users)}
+
+    def bitmap(self, kind: str, name: str, date_str: str):
+        """Users (as dense IDs) present for one table or vital on one date"""
+        return self.bitmaps.get((kind, name, date_str)) or pyroaring.FrozenBitMap()
+
+    def missing(self, name: str, reference: str, date_list):
+        """Users present in the reference table but not in `name` on the same date, for any of the dates"""
+        return pyroaring.FrozenBitMap.union(pyroaring.FrozenBitMap(), *(
+            self.bitmap(TABLE, reference, d) - self.bitmap(TABLE, name, d) for d in date_list))
+
+    def ids(self, user_ids):
+        """Dense IDs for user IDs; users the index has never seen get -1"""
+        return np.array([self._ids.get(user_id, -1) for user_id in user_ids], dtype=np.int64)
+
+    def names(self, bitmap):
+        return [self.users[i] for i in bitmap]
+
+    def mask(self, kind: str, name: str, date_str: str, ids):
+        """Boolean array marking which of the given dense IDs are present"""
+        members = np.zeros(len(self.users) + 1, dtype=bool)
+        present = np.frombuffer(self.bitmap(kind, name, date_str).to_array(), dtype=np.uint32)
+        members[present] = True
+        # -1 (unknown user) indexes the trailing False slot
+        return members[ids]
+
+
+def _date_bitmaps(dates, ids):
+    """{date: bitmap of the IDs seen with it}, skipping null dates and users"""
+    table = pa.table({"ingestion_date": dates, "id": ids}).filter(
+        pc.and_(pc.is_valid(dates), pc.is_valid(ids)))
+    grouped = table.group_by("ingestion_date").aggregate([("id", "distinct")])
+    return {
+        date_str: pyroaring.BitMap(id_list)
+        for date_str, id_list in zip(grouped["ingestion_date"].to_pylist(), grouped["id_distinct"].to_pylist())
+    }
+
+
+@timed("presence_index_build")
+def build(table_paths) -> PresenceIndex:
+    """Index every table in table_paths ({name: path}) at its current version"""
+    tables = {}
+    versions = {}
+    user_columns = {}
+    for name, path in table_paths.items():
+        dt = deltalake.DeltaTable(path)
+        fields = [field.name for field in dt.schema().fields]
+        user_columns[name] = [field for field in fields if 'user_id' in field.lower()]
+        columns = ['ingestion_date'] + user_columns[name]
+        if name == 'bronze' and 'type' in fields:
+            columns.append('type')
+        versions[name] = dt.version()
+        tables[name] = dt.to_pyarrow_table(columns=columns)
+
+    all_users = set()
+    for name, table in tables.items():
+        for col in user_columns[name]:
+            all_users.update(pc.unique(table[col].drop_null()).to_pylist())
+    users = sorted(all_users)
+    value_set = pa.array(users, pa.string())
+
+    bitmaps = {}
+    vitals = None
+    for name, table in tables.items():
+        for col in user_columns[name]:
+            ids = pc.index_in(table[col], value_set=value_set)
+            for date_str, bitmap in _date_bitmaps(table["ingestion_date"], ids).items():
+                bitmaps.setdefault((TABLE, name, date_str), pyroaring.BitMap()).update(bitmap)
+        if name == 'bronze' and 'type' in table.column_names:
+            ids = pc.index_in(table["user_id"], value_set=value_set)
+            vitals = sorted(vital for vital in pc.unique(table["type"].drop_null()).to_pylist()
+                            if vital and vital.strip())
+            for vital in vitals:
+                is_vital = pc.equal(table["type"], vital)
+                for date_str, bitmap in _date_bitmaps(table["ingestion_date"].filter(is_vital),
+                                                      ids.filter(is_vital)).items():
+                    bitmaps[(VITAL, vital, date_str)] = bitmap
+    frozen = {}
+    for key, bitmap in bitmaps.items():
+        bitmap.run_optimize()
+        frozen[key] = pyroaring.FrozenBitMap(bitmap)
+    return PresenceIndex(users, frozen, versions, vitals)
+
+
+def index_path(table_paths) -> str:
+    """Index file in the directory holding the Delta tables"""
+    return os.path.join(os.path.dirname(table_paths["bronze"]), INDEX_DIRNAME, INDEX_FILENAME)
+
+
+def write(index: PresenceIndex, path: str):
+    keys = sorted(index.bitmaps)
+    table = pa.table({
+        "kind": pa.array([key[0] for key in keys], pa.string()),
+        "name": pa.array([key[1] for key in keys], pa.string()),
+        "ingestion_date": pa.array([key[2] for key in keys], pa.string()),
+        "bitmap": pa.array([index.bitmaps[key].serialize() for key in keys], pa.binary()),
+    }).replace_schema_metadata({
+        "users": json.dumps(index.users),
+        "versions": json.dumps(index.versions),
+        "vitals": json.dumps(index.vitals),
+    })
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _tmp_path(path)
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read(path: str) -> PresenceIndex:
+    table = pq.read_table(path)
+    metadata = table.schema.metadata
+    bitmaps = {
+        (kind, name, date_str): pyroaring.FrozenBitMap.deserialize(data)
+        for kind, name, date_str, data in zip(table["kind"].to_pylist(), table["name"].to_pylist(),
+                                              table["ingestion_date"].to_pylist(), table["bitmap"].to_pylist())
+    }
+    return PresenceIndex(json.loads(metadata[b"users"]), bitmaps, json.loads(metadata[b"versions"]),
+                         json.loads(metadata[b"vitals"]))
+
+
+def rebuild(table_paths) -> PresenceIndex:
+    """Build the index for the current table versions and persist it next to the tables"""
+    index = build(table_paths)
+    write(index, index_path(table_paths))
+    return index
+
+
+def current(table_paths, versions) -> PresenceIndex:
+    """
+    The persisted index if it was built from exactly these table versions, else None.
+    Loaded indexes are kept in memory until the file changes.
+    """
+    path = index_path(table_paths)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is None or cached[0] != mtime:
+            try:
+                cached = _cache[path] = (mtime, read(path))
+            except Exception as e:
+                print(f"Could not read presence index {path}: {e}")
+                return None
+    index = cached[1]
+    if index.versions != {name: versions.get(name) for name in table_paths}:
+        return None
+    return index
@@ -0,0 +1,167 @@
+import os
+from config.settings import QUALITY_VALUE_RANGES, QUALITY_CLOCK_SKEW_SECONDS
+from utils.lazy import lazy_import
+from utils.metrics import timed
+from services import delta_reader
+
+deltalake = lazy_import("deltalake")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+pd = lazy_import("pandas")
+
+# Data-quality statistics computed while records are ingested, so bad vitals (missing values,
+# implausible heart rate or SpO2, device clocks far off the ingestion day) show up without anyone
+# scanning bronze. Every batch is profiled in one grouped Arrow pass per (raw file, vital type):
+# record and null counts, value min/max, out-of-range counts and the timestamp span.
+#
+# The rows are kept per raw file in a small Delta table next to the others, so a re-delivered file
+# replaces its own rows; queries roll them up to (date, user, vital type).
+
+QUALITY_DIRNAME = "_quality"
+
+# Column read_records tags each record with when the loader profiles it; dropped before writing
+SOURCE_COLUMN = "_source_file"
+
+KEY_COLUMNS = ["ingestion_date", "user_id", "type", "source_file"]
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def quality_path(table_paths) -> str:
+    """Quality Delta table in the directory holding the other tables"""
+    return os.path.join(os.path.dirname(table_paths["bronze"]), QUALITY_DIRNAME)
+
+
+def _timestamps_ms(series):
+    """Epoch milliseconds of a timestamp column holding epoch numbers or ISO strings (null if neither)"""
+    numeric = pd.to_numeric(series, errors="coerce")
+    if numeric.notna().any() or series.isna().all():
+        # Epoch seconds are far below any millisecond timestamp after 1973
+        return numeric.where(numeric.abs() >= 1e11, numeric * 1000)
+    parsed = pd.to_datetime(series, utc=True, errors="coerce", format="ISO8601")
+    return (parsed - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1)
+
+
+def records_table(df):
+    """Arrow table of the columns profiled, from the loader's flattened record DataFrame"""
+    column = lambda name: df[name] if name in df.columns else pd.Series([None] * len(df), index=df.index)
+    return pa.table({
+        "ingestion_date": pa.array(column("ingestion_date"), pa.string(), from_pandas=True),
+        "user_id": pa.array(column("user_id"), pa.string(), from_pandas=True),
+        "type": pa.array(column("type").astype("string"), pa.string(), from_pandas=True),
+        "source_file": pa.array(column(SOURCE_COLUMN), pa.string(), from_pandas=True),
+        "value": pa.array(pd.to_numeric(column("value"), errors="coerce"), pa.float64(), from_pandas=True),
+        "timestamp": pa.array(_timestamps_ms(column("timestamp")), pa.float64(), from_pandas=True),
+    })
+
+
+@timed("quality_profile")
+def profile(table):
+    """Quality statistics per (ingestion_date, user_id, type, source_file) of a records_table"""
+    value = table["value"]
+    vital = table["type"]
+    out_of_range = pa.array([False] * table.num_rows)
+    for vital_type, (low, high) in QUALITY_VALUE_RANGES.items():
+        outside = pc.or_(pc.less(value, low), pc.greater(value, high))
+        out_of_range = pc.or_(out_of_range, pc.fill_null(pc.and_(pc.equal(vital, vital_type), outside), False))
+
+    timestamp = pc.cast(table["timestamp"], pa.int64())
+    day_start = pc.cast(pc.strptime(table["ingestion_date"], format="%Y-%m-%d", unit="ms", error_is_null=True),
+                        pa.int64())
+    skew_ms = int(QUALITY_CLOCK_SKEW_SECONDS * 1000)
+    skewed = pc.or_(pc.less(timestamp, pc.subtract(day_start, skew_ms)),
+                    pc.greater_equal(timestamp, pc.add(day_start, DAY_MS + skew_ms)))
+
+    as_count = lambda mask: pc.cast(mask, pa.int64())
+    work = table.select(KEY_COLUMNS).append_column("value", value).append_column("timestamp", timestamp)
+    for name, mask in (("value_null", pc.is_null(value)), ("out_of_range", out_of_range),
+                       ("timestamp_null", pc.is_null(timestamp)), ("clock_skewed", pc.fill_null(skewed, False))):
+        work = work.append_column(name, as_count(mask))
+    grouped = work.group_by(KEY_COLUMNS).aggregate([
+        ([], "count_all"),
+        ("value_null", "sum"), ("value", "min"), ("value", "max"), ("out_of_range", "sum"),
+        ("timestamp_null", "sum"), ("timestamp", "min"), ("timestamp", "max"), ("clock_skewed", "sum"),
+    ])
+    return grouped.rename_columns({
+        "count_all": "records", "value_null_sum": "value_nulls", "out_of_range_sum": "out_of_range",
+        "timestamp_null_sum": "timestamp_nulls", "clock_skewed_sum": "clock_skewed",
+    }).select(KEY_COLUMNS + ["records", "value_nulls", "value_min", "value_max", "out_of_range",
+                            "timestamp_nulls", "timestamp_min", "timestamp_max", "clock_skewed"])
+
+
+def _sql_list(values):
+    return ", ".join("'" + str(value).replace("'", "''") + "'" for value in values)
+
+
+@timed("quality_write")
+def write(table_paths, stats, overwrite: bool = False):
+    """
+    Store profiled rows. overwrite replaces the whole table (full reload); otherwise the rows of
+    the profiled raw files replace whatever was recorded for those files before.
+
+    The rows describe each file as last delivered. Only upsert ingestion (INGEST_UPSERT) replaces
+    a re-delivered file's rows in the data tables too; in append mode bronze keeps the earlier
+    copy as well, so its counts for such a file can exceed the ones recorded here.
+    """
+    path = quality_path(table_paths)
+    if overwrite or not os.path.exists(os.path.join(path, "_delta_log")):
+        deltalake.write_deltalake(path, stats, mode="overwrite", schema_mode="overwrite")
+        return
+    if stats.num_rows == 0:
+        return
+    dates = _sql_list(sorted(set(stats["ingestion_date"].drop_null().to_pylist())))
+    files = _sql_list(sorted(set(stats["source_file"].to_pylist())))
+    predicate = (f't."ingestion_date" IN ({dates}) AND t."source_file" = s."source_file" '
+                 f'AND (t."type" IS NOT DISTINCT FROM s."type")')
+    (deltalake.DeltaTable(path)
+     .merge(stats, predicate, source_alias="s", target_alias="t")
+     .when_matched_update_all()
+     .when_not_matched_insert_all()
+     # Vital types a re-delivered file no longer contains
+     .when_not_matched_by_source_delete(f't."source_file" IN ({files})')
+     .execute())
+
+
+@timed("quality_query")
+def get_quality(date_str: str, user_id: str = None, vital: str = None):
+    """
+    Quality statistics of one ingestion date per user and vital type, rolled up over raw files,
+    read from the quality table only. profiled is False when nothing has been profiled yet.
+    """
+    path = quality_path(delta_reader.TABLE_PATHS)
+    if not os.path.exists(os.path.join(path, "_delta_log")):
+        return {"date": date_str, "profiled": False, "rows": []}
+    table = delta_reader.open_table(path).to_pyarrow_table()
+    mask = pc.equal(table["ingestion_date"], date_str)
+    if user_id is not None:
+        mask = pc.and_(mask, pc.equal(table["user_id"], user_id))
+    if vital is not None:
+        mask = pc.and_(mask, pc.equal(table["type"], vital))
+    table = table.filter(mask)
+    grouped = table.group_by(["user_id", "type"]).aggregate([
+        ("records", "sum"), ("value_nulls", "sum"), ("value_min", "min"), ("value_max", "max"),
+        ("out_of_range", "sum"), ("timestamp_nulls", "sum"), ("timestamp_min", "min"),
+        ("timestamp_max", "max"), ("clock_skewed", "sum"), ("source_file", "count_distinct"),
+    ])
+    rows = []
+    for row in grouped.to_pylist():
+        records = row["records_sum"]
+        spread = (None if row["timestamp_min_min"] is None
+                  else (row["timestamp_max_max"] - row["timestamp_min_min"]) / 1000)
+        rows.append({
+            "user_id": row["user_id"],
+            "type": row["type"],
+            "records": records,
+            "files": row["source_file_count_distinct"],
+            "value_null_rate": row["value_nulls_sum"] / records if records else None,
+            "value_min": row["value_min_min"],
+            "value_max": row["value_max_max"],
+            "out_of_range": row["out_of_range_sum"],
+            "timestamp_null_rate": row["timestamp_nulls_sum"] / records if records else None,
+            "timestamp_min": row["timestamp_min_min"],
+            "timestamp_max": row["timestamp_max_max"],
+            "timestamp_spread_seconds": spread,
+            "clock_skewed": row["clock_skewed_sum"],
+        })
+    rows.sort(key=lambda row: (row["user_id"] or "", row["type"] or ""))
+    return {"date": date_str, "profiled": True, "rows": rows}
@@ -0,0 +1,179 @@
+import threading
+from config.settings import QUERY_BACKEND
+from utils.lazy import lazy_import
+
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+pd = lazy_import("pandas")
+
+# Engines behind the per-table work of the summary, sync-status and vitals views. scan_sources
+# loads each Delta table once through the configured backend; the views then only ask it for
+# per-user record counts (overall or per date), distinct values and the distinct
+# (ingestion_date, user) pairs present, and build their Arrow results from those. Every backend
+# must return identical answers (tests/test_query_backends.py checks this), so the choice is
+# purely about speed and memory.
+
+
+def _date_user_counts_table(table):
+    """(ingestion_date, user_id, count) with the same types from every backend"""
+    return table.select(["ingestion_date", "user_id", "count"]).cast(pa.schema([
+        ("ingestion_date", pa.string()), ("user_id", pa.string()), ("count", pa.int64())]))
+
+
+class ArrowBackend:
+    """Tables materialized as Arrow and queried with pyarrow.compute"""
+    name = "arrow"
+
+    def load(self, dt, columns):
+        return dt.to_pyarrow_table(columns=columns)
+
+    def columns(self, source):
+        return source.column_names
+
+    def _for_dates(self, source, date_list):
+        return source.filter(pc.is_in(source["ingestion_date"], value_set=pa.array(list(date_list), pa.string())))
+
+    def user_counts(self, source, date_list):
+        """({user_id: row count}, total rows) over the given dates"""
+        rows = self._for_dates(source, date_list)
+        grouped = rows.group_by('user_id').aggregate([('ingestion_date', 'count')])
+        return dict(zip(grouped['user_id'].to_pylist(), grouped['ingestion_date_count'].to_pylist())), rows.num_rows
+
+    def date_user_counts(self, source, date_list):
+        """Row count per (ingestion_date, user_id) over the given dates, as an Arrow table"""
+        rows = self._for_dates(source, date_list)
+        grouped = rows.group_by(['ingestion_date', 'user_id']).aggregate([([], 'count_all')])
+        return _date_user_counts_table(grouped.rename_columns({'count_all': 'count'}))
+
+    def distinct(self, source, column):
+        """Distinct non-null values of a column over all dates"""
+        return pc.unique(source[column].drop_null()).to_pylist()
+
+    def present_pairs(self, source, user_column, date_list, vital=None):
+        """(ingestion_date, user) arrays of the rows on the given dates, optionally of one vital type"""
+        rows = self._for_dates(source, date_list)
+        if vital is not None:
+            rows = rows.filter(pc.equal(rows["type"], vital))
+        return rows["ingestion_date"], rows[user_column]
+
+
+class PandasBackend:
+    """Tables materialized as pandas DataFrames"""
+    name = "pandas"
+
+    def load(self, dt, columns):
+        return dt.to_pandas(columns=columns)
+
+    def columns(self, source):
+        return list(source.columns)
+
+    def user_counts(self, source, date_list):
+        rows = source[source["ingestion_date"].isin(list(date_list))]
+        counts = rows.groupby("user_id", dropna=False, sort=False).size()
+        return {(None if pd.isna(user_id) else user_id): int(count) for user_id, count in counts.items()}, len(rows)
+
+    def date_user_counts(self, source, date_list):
+        rows = source[source["ingestion_date"].isin(list(date_list))]
+        counts = rows.groupby(["ingestion_date", "user_id"], dropna=False, sort=False).size().reset_index(name="count")
+        return _date_user_counts_table(pa.Table.from_pandas(counts, preserve_index=False))
+
+    def distinct(self, source, column):
+        return source[column].dropna().unique().tolist()
+
+    def present_pairs(self, source, user_column, date_list, vital=None):
+        rows = source[source["ingestion_date"].isin(list(date_list))]
+        if vital is not None:
+            rows = rows[rows["type"] == vital]
+        pairs = rows[["ingestion_date", user_column]].drop_duplicates()
+        return (pa.array(pairs["ingestion_date"], pa.string(), from_pandas=True),
+                pa.array(pairs[user_column], pa.string(), from_pandas=True))
+
+
+class DuckDBSource:
+    """The data files of one Delta table version, read by DuckDB on demand"""
+
+    def __init__(self, files, columns, partitioned):
+        self.files = files
+        self.columns = columns
+        self.partitioned = partitioned
+
+
+class DuckDBBackend:
+    """SQL over the table's Parquet files with embedded DuckDB; nothing is materialized up front"""
+    name = "duckdb"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _connection(self):
+        # DuckDB connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Imported here rather than through a lazy_import proxy: a proxy holding a copy of
+            # duckdb's namespace can crash the interpreter at exit
+            import duckdb
+            conn = self._local.conn = duckdb.connect()
+        return conn
+
+    def load(self, dt, columns):
+        # The files of the current snapshot only, so superseded files are never read
+        partitioned = bool(dt.metadata().partition_columns)
+        return DuckDBSource(dt.file_uris(), columns, partitioned)
+
+    def columns(self, source):
+        return list(source.columns)
+
+    def _query(self, source, select, where="", params=()):
+        projection = ", ".join(f'"{column}"' for column in source.columns)
+        sql = (f"SELECT {select} FROM (SELECT {projection} FROM read_parquet(?, union_by_name = true, "
+               f"hive_partitioning = {str(source.partitioned).lower()}, hive_types_autocast = false)) {where}")
+        return self._connection().execute(sql, [source.files, *params]).to_arrow_table()
+
+    def _date_filter(self, date_list):
+        return f"WHERE ingestion_date IN ({', '.join(['?'] * len(date_list))})", list(date_list)
+
+    def user_counts(self, source, date_list):
+        if not source.files or not date_list:
+            return {}, 0
+        where, params = self._date_filter(date_list)
+        result = self._query(source, "user_id, COUNT(*) AS count", f"{where} GROUP BY user_id", params)
+        counts = dict(zip(result["user_id"].to_pylist(), result["count"].to_pylist()))
+        return counts, sum(counts.values())
+
+    def date_user_counts(self, source, date_list):
+        if not source.files or not date_list:
+            return _date_user_counts_table(pa.table({"ingestion_date": pa.array([], pa.string()),
+                                                     "user_id": pa.array([], pa.string()),
+                                                     "count": pa.array([], pa.int64())}))
+        where, params = self._date_filter(date_list)
+        result = self._query(source, "ingestion_date, user_id, COUNT(*) AS count",
+                             f"{where} GROUP BY ingestion_date, user_id", params)
+        return _date_user_counts_table(result)
+
+    def distinct(self, source, column):
+        if not source.files:
+            return []
+        result = self._query(source, f'DISTINCT "{column}" AS value', f'WHERE "{column}" IS NOT NULL')
+        return result["value"].to_pylist()
+
+    def present_pairs(self, source, user_column, date_list, vital=None):
+        if not source.files or not date_list:
+            return pa.array([], pa.string()), pa.array([], pa.string())
+        where, params = self._date_filter(date_list)
+        if vital is not None:
+            where += " AND type = ?"
+            params.append(vital)
+        result = self._query(source, f'DISTINCT ingestion_date, "{user_column}" AS user_id', where, params)
+        return pc.cast(result["ingestion_date"], pa.string()), pc.cast(result["user_id"], pa.string())
+
+
+BACKENDS = {backend.name: backend for backend in (ArrowBackend(), PandasBackend(), DuckDBBackend())}
+
+
+def get_backend(name: str = None):
+    """Backend by name, QUERY_BACKEND by default"""
+    name = name or QUERY_BACKEND
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown query backend '{name}', expected one of {', '.join(BACKENDS)}")
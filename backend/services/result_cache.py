@@ -0,0 +1,371 @@
+import os
+import io
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import wraps
+from typing import Any, NamedTuple
+from config.settings import (
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_PATH,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_LOCK_SECONDS,
+    RECOMPUTE_WORKERS
+)
+from utils.lazy import lazy_import
+from utils.metrics import register_cache
+from utils.singleflight import SingleFlight
+from utils.profiling import profile_call
+
+pa = lazy_import("pyarrow")
+pa_ipc = lazy_import("pyarrow.ipc")
+
+# Computed aggregates shared by every worker process on the host through one SQLite file.
+# Entries are keyed by view name, parameters and a signature of the sources they were computed
+# from, so a new Delta version or raw file simply produces a new key. A per-key lease in the
+# same database makes one worker compute a missing entry while the others wait and read it.
+# Entries also record which view they belong to, so after the sources change the previous
+# result for the same view can still be served (marked stale) while the new one is computed.
+
+_local = threading.local()
+_flights = SingleFlight("shared_result")
+_recompute_executor = ThreadPoolExecutor(max_workers=RECOMPUTE_WORKERS, thread_name_prefix="recompute")
+stats = {"hits": 0, "misses": 0, "computes": 0, "waits": 0, "evictions": 0, "errors": 0,
+         "stale_served": 0, "deadline_exceeded": 0, "invalidations": 0}
+register_cache("result", stats)
+
+# Bump when the layout changes; older cache files are simply rebuilt
+SCHEMA_VERSION = 2
+_SCHEMA = """
+DROP TABLE IF EXISTS entries;
+DROP TABLE IF EXISTS leases;
+CREATE TABLE entries (
+    key TEXT PRIMARY KEY,
+    view TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX entries_accessed ON entries (accessed_at);
+CREATE INDEX entries_view ON entries (view, created_at);
+CREATE TABLE leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class JsonCodec:
+    """JSON-serializable results such as the summary dicts"""
+
+    @staticmethod
+    def encode(value) -> bytes:
+        return json.dumps(value).encode()
+
+    @staticmethod
+    def decode(data: bytes):
+        return json.loads(data)
+
+
+class MatrixCodec:
+    """(display columns, Arrow matrix) pairs, stored as an Arrow IPC stream"""
+
+    @staticmethod
+    def encode(value) -> bytes:
+        columns, table = value
+        table = table.replace_schema_metadata({"columns": json.dumps(columns)})
+        sink = pa.BufferOutputStream()
+        with pa_ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    @staticmethod
+    def decode(data: bytes):
+        table = pa_ipc.open_stream(io.BytesIO(data)).read_all()
+        columns = json.loads(table.schema.metadata[b"columns"])
+        return columns, table.replace_schema_metadata(None)
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == RESULT_CACHE_PATH:
+        return conn
+    os.makedirs(os.path.dirname(RESULT_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(RESULT_CACHE_PATH, timeout=5, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+    _local.conn, _local.path = conn, RESULT_CACHE_PATH
+    return conn
+
+
+def make_key(name: str, params: dict, sources) -> str:
+    payload = json.dumps({"name": name, "params": params, "sources": sources}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def view_key(name: str, date_str: str) -> str:
+    """Key shared by every entry of a per-date view, whatever sources they were computed from"""
+    return make_key(name, {"date": date_str}, None)
+
+
+def invalidate_views(views) -> list:
+    """
+    Drop every entry of the given view keys, including results that would otherwise be served
+    stale. Returns the view keys that had entries.
+    """
+    views = list(views)
+    if not views or not RESULT_CACHE_ENABLED:
+        return []
+    try:
+        conn = _connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            found = []
+            for view in views:
+                if conn.execute("DELETE FROM entries WHERE view = ?", (view,)).rowcount:
+                    found.append(view)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        print(f"Could not invalidate cached views: {e}")
+        stats["errors"] += 1
+        return []
+    stats["invalidations"] += len(found)
+    return found
+
+
+def _read(key: str):
+    """(value, created_at) of a live entry, or None"""
+    now = time.time()
+    conn = _connection()
+    row = conn.execute("SELECT value, created_at FROM entries WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+    if row is None:
+        return None
+    conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+    return row
+
+
+def _read_latest(view: str, max_age: float = None):
+    """(value, created_at) of the newest entry for a view, whatever sources it was computed from"""
+    now = time.time()
+    row = _connection().execute(
+        "SELECT value, created_at FROM entries WHERE view = ? ORDER BY created_at DESC LIMIT 1", (view,)).fetchone()
+    if row is None or (max_age is not None and now - row[1] > max_age):
+        return None
+    return row
+
+
+def _write(key: str, view: str, data: bytes):
+    now = time.time()
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (key, view, data, len(data), now, now + RESULT_CACHE_TTL_SECONDS, now))
+        _evict(conn, now)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _evict(conn, now):
+    """Drop expired entries, then least recently used ones until the cache fits RESULT_CACHE_MAX_BYTES"""
+    stats["evictions"] += conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total <= RESULT_CACHE_MAX_BYTES:
+        return
+    for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+        if total <= RESULT_CACHE_MAX_BYTES:
+            break
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        total -= size
+        stats["evictions"] += 1
+
+
+def _acquire_lease(key: str, owner: str) -> bool:
+    now = time.time()
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # A lease left behind by a crashed or stuck worker expires after RESULT_CACHE_LOCK_SECONDS
+        conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+        acquired = conn.execute("INSERT OR IGNORE INTO leases VALUES (?, ?, ?)",
+                                (key, owner, now + RESULT_CACHE_LOCK_SECONDS)).rowcount == 1
+        conn.execute("COMMIT")
+        return acquired
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _release_lease(key: str, owner: str):
+    try:
+        _connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+    except sqlite3.Error as e:
+        # The lease times out on its own; waiters just wait a little longer
+        print(f"Could not release result cache lease {key}: {e}")
+
+
+def get_or_compute(key: str, compute, codec=JsonCodec, view: str = None):
+    """
+    Cached result for key, or compute() it. Only one caller across all processes computes a
+    missing key; the rest poll for its entry until the lease holder stores it or the lease expires.
+    Cache failures never fail the request: the result is then computed locally.
+    """
+    try:
+        row = _read(key)
+        if row is not None:
+            stats["hits"] += 1
+            return codec.decode(row[0])
+        stats["misses"] += 1
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        delay = 0.01
+        while not _acquire_lease(key, owner):
+            stats["waits"] += 1
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+            row = _read(key)
+            if row is not None:
+                return codec.decode(row[0])
+        try:
+            # Another worker may have stored it between our miss and taking the lease
+            row = _read(key)
+            if row is not None:
+                return codec.decode(row[0])
+            value = compute()
+            stats["computes"] += 1
+            try:
+                _write(key, view or key, codec.encode(value))
+            except sqlite3.Error as e:
+                print(f"Could not store result {key}: {e}")
+                stats["errors"] += 1
+            return value
+        finally:
+            _release_lease(key, owner)
+    except sqlite3.Error as e:
+        print(f"Result cache unavailable for {key}: {e}")
+        stats["errors"] += 1
+        return compute()
+
+
+class Served(NamedTuple):
+    value: Any
+    stale: bool
+    age_seconds: float
+
+
+class ComputeTimeout(Exception):
+    """No result could be produced within the request deadline; the computation keeps running."""
+
+
+def serve(key: str, view: str, compute, codec=JsonCodec, max_stale: float = 0, deadline: float = None) -> Served:
+    """
+    Stale-while-revalidate lookup for one view.
+
+    A live entry for key is returned as fresh. Otherwise the computation starts in the background
+    (coalesced with any identical one already running) and, if the view's previous result is at
+    most max_stale seconds old, that result is returned at once marked stale. Failing that the
+    caller waits up to `deadline` seconds for the new result, then falls back to the previous
+    result of any age; with nothing to fall back on ComputeTimeout is raised.
+    """
+    if RESULT_CACHE_ENABLED:
+        try:
+            row = _read(key)
+        except sqlite3.Error as e:
+            print(f"Result cache unavailable for {key}: {e}")
+            stats["errors"] += 1
+            row = None
+        if row is not None:
+            stats["hits"] += 1
+            return Served(codec.decode(row[0]), False, time.time() - row[1])
+        refresh = lambda: get_or_compute(key, compute, codec, view)
+    else:
+        refresh = compute
+    # Run in the request's context so its timing spans (and an active profile) follow the work
+    future = _recompute_executor.submit(contextvars.copy_context().run, profile_call, _flights.do, key, refresh)
+
+    def previous(max_age=None):
+        if not RESULT_CACHE_ENABLED:
+            return None
+        try:
+            row = _read_latest(view, max_age)
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        stats["stale_served"] += 1
+        return Served(codec.decode(row[0]), True, time.time() - row[1])
+
+    if max_stale:
+        served = previous(max_stale)
+        if served is not None:
+            return served
+    try:
+        return Served(future.result(timeout=deadline), False, 0.0)
+    except FutureTimeout:
+        stats["deadline_exceeded"] += 1
+        served = previous()
+        if served is not None:
+            return served
+        raise ComputeTimeout(f"Result not ready within {deadline:g}s")
+
+
+def shared_result(name: str, dates_for, signature, codec=JsonCodec):
+    """
+    Cache a per-date view function, `func(date_str, scan=None)`, in the shared result cache.
+
+    Args:
+        name (str): View name, part of the cache key
+        dates_for: Maps date_str to the sorted dates whose raw files the view reads. Dates mapped
+            to the same list share one entry, so func must return the same result for them
+        signature: Maps a date list to a JSON-serializable description of the current source versions
+        codec: JsonCodec or MatrixCodec, depending on what func returns
+
+    Concurrent calls in this process with the same key share one lookup/computation.
+    Calls with an explicit scan are computed from that scan and bypass the cache.
+    The decorated function also gets a `serve(date_str, max_stale, deadline)` method
+    returning a Served result with stale-while-revalidate semantics (see serve()).
+    """
+    def decorator(func):
+        def keys(date_str):
+            # Keyed on the first date the view covers, so every date of a week or month shares one entry
+            dates = dates_for(date_str)
+            view = view_key(name, dates[0])
+            return make_key(name, {"date": dates[0]}, signature(dates)), view
+
+        @wraps(func)
+        def wrapper(date_str, scan=None):
+            if scan is not None:
+                return func(date_str, scan)
+            key, view = keys(date_str)
+            if not RESULT_CACHE_ENABLED:
+                return _flights.do(key, lambda: func(date_str))
+            return _flights.do(key, lambda: get_or_compute(key, lambda: func(date_str), codec, view))
+
+        def serve_view(date_str, max_stale: float = 0, deadline: float = None) -> Served:
+            key, view = keys(date_str)
+            return serve(key, view, lambda: func(date_str), codec, max_stale, deadline)
+
+        wrapper.serve = serve_view
+        return wrapper
+    return decorator
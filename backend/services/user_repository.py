@@ -0,0 +1,301 @@
+import os
+import asyncio
+from typing import Dict, Iterable, List, Optional
+from config.database import MYSQL_CONFIG, USER_DB_BACKEND, USER_DB_SQLITE_PATH, DB_POOL_MIN_SIZE, DB_POOL_SIZE
+from utils.lazy import lazy_import
+from utils.metrics import span, register_collector
+
+aiomysql = lazy_import("aiomysql")
+aiosqlite = lazy_import("aiosqlite")
+
+# Async access to the users and user_settings tables for the auth, settings and admin endpoints.
+# Queries are written once in MySQL syntax; each backend only supplies how to run them, so the
+# endpoints never block a worker thread on database I/O and their throughput is bounded by the
+# connection pool rather than by the threadpool.
+
+USER_COLUMNS = "id, username, nickname, full_name"
+
+
+class UserRepository:
+    """Users and their settings. Subclasses implement _fetchone/_fetchall/_execute/_executemany."""
+
+    upsert_setting_sql = """
+        INSERT INTO user_settings (user_id, setting_key, setting_value)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE setting_value = VALUES(setting_value)
+    """
+
+    async def _fetchone(self, sql: str, params=()) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def _fetchall(self, sql: str, params=()) -> List[dict]:
+        raise NotImplementedError
+
+    async def _execute(self, sql: str, params=()):
+        """Run one statement in its own transaction; returns (rowcount, lastrowid)"""
+        raise NotImplementedError
+
+    async def _executemany(self, sql: str, rows: List[tuple]):
+        """Run one statement for every row in a single transaction"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    async def get_user(self, username: str) -> Optional[dict]:
+        """Public user fields, without the password hash"""
+        return await self._fetchone(f"SELECT {USER_COLUMNS} FROM users WHERE username = %s", (username,))
+
+    async def get_credentials(self, username: str) -> Optional[dict]:
+        """User fields including password_hash, for verifying passwords"""
+        return await self._fetchone(f"SELECT {USER_COLUMNS}, password_hash FROM users WHERE username = %s", (username,))
+
+    async def create_user(self, username: str, password_hash: str, nickname: str = None, full_name: str = None) -> int:
+        _, user_id = await self._execute(
+            "INSERT INTO users (username, nickname, full_name, password_hash) VALUES (%s, %s, %s, %s)",
+            (username, nickname, full_name, password_hash))
+        return user_id
+
+    async def update_profile(self, username: str, fields: Dict[str, Optional[str]]) -> Optional[dict]:
+        """Set the given profile columns (nickname, full_name) and return the updated user"""
+        assignments = ", ".join(f"{column} = %s" for column in fields)
+        await self._execute(f"UPDATE users SET {assignments} WHERE username = %s", (*fields.values(), username))
+        return await self.get_user(username)
+
+    async def set_password_hash(self, username: str, password_hash: str):
+        await self._execute("UPDATE users SET password_hash = %s WHERE username = %s", (password_hash, username))
+
+    async def list_users(self) -> List[dict]:
+        return await self._fetchall(f"SELECT {USER_COLUMNS}, password_hash FROM users")
+
+    async def update_user(self, user_id: int, username: str, nickname: str, full_name: str, password_hash: str = None):
+        if password_hash:
+            await self._execute(
+                "UPDATE users SET username = %s, nickname = %s, full_name = %s, password_hash = %s WHERE id = %s",
+                (username, nickname, full_name, password_hash, user_id))
+        else:
+            await self._execute("UPDATE users SET username = %s, nickname = %s, full_name = %s WHERE id = %s",
+                                (username, nickname, full_name, user_id))
+
+    async def delete_user(self, user_id: int):
+        await self._execute("DELETE FROM users WHERE id = %s", (user_id,))
+
+    async def get_settings(self, user_id: int, keys: Iterable[str] = None) -> Dict[str, str]:
+        """A user's settings as {key: value}, optionally only the given keys"""
+        sql = "SELECT setting_key, setting_value FROM user_settings WHERE user_id = %s"
+        params = [user_id]
+        if keys is not None:
+            keys = list(keys)
+            sql += f" AND setting_key IN ({', '.join(['%s'] * len(keys))})"
+            params.extend(keys)
+        rows = await self._fetchall(sql, params)
+        return {row['setting_key']: row['setting_value'] for row in rows}
+
+    async def save_settings(self, user_id: int, settings: Dict[str, str]):
+        """Insert or update each setting"""
+        if settings:
+            await self._executemany(self.upsert_setting_sql,
+                                    [(user_id, key, str(value)) for key, value in settings.items()])
+
+    async def count_settings(self) -> int:
+        row = await self._fetchone("SELECT COUNT(*) AS count FROM user_settings")
+        return row['count']
+
+    def pool_stats(self):
+        """(open connections, idle connections), or None when not pooled"""
+        return None
+
+
+class MySQLUserRepository(UserRepository):
+    """aiomysql connection pool of DB_POOL_MIN_SIZE..DB_POOL_SIZE connections"""
+
+    def __init__(self, config: dict = MYSQL_CONFIG, minsize: int = DB_POOL_MIN_SIZE, maxsize: int = DB_POOL_SIZE):
+        self.config = config
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self._pool = None
+        self._pool_loop = None
+
+    async def _get_pool(self):
+        loop = asyncio.get_running_loop()
+        if self._pool_loop is not loop:
+            # A pool belongs to the event loop that created it; concurrent first callers share one task
+            self._pool_loop = loop
+            self._pool = loop.create_task(aiomysql.create_pool(
+                host=self.config['host'], user=self.config['user'], password=self.config['password'],
+                db=self.config['database'], minsize=self.minsize, maxsize=self.maxsize, autocommit=True))
+        try:
+            return await asyncio.shield(self._pool)
+        except Exception:
+            # Let the next call retry instead of caching a failed connect
+            if self._pool_loop is loop:
+                self._pool_loop = None
+            raise
+
+    async def _run(self, sql, params, fetch):
+        pool = await self._get_pool()
+        with span("db_connect"):
+            conn = await pool.acquire()
+        try:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, params)
+                if fetch == "one":
+                    return await cursor.fetchone()
+                if fetch == "all":
+                    return list(await cursor.fetchall())
+                return cursor.rowcount, cursor.lastrowid
+        finally:
+            pool.release(conn)
+
+    async def _fetchone(self, sql, params=()):
+        return await self._run(sql, params, "one")
+
+    async def _fetchall(self, sql, params=()):
+        return await self._run(sql, params, "all")
+
+    async def _execute(self, sql, params=()):
+        return await self._run(sql, params, None)
+
+    async def _executemany(self, sql, rows):
+        pool = await self._get_pool()
+        with span("db_connect"):
+            conn = await pool.acquire()
+        try:
+            await conn.begin()
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.executemany(sql, rows)
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+        finally:
+            pool.release(conn)
+
+    async def close(self):
+        if self._pool is not None and self._pool.done() and not self._pool.cancelled() \
+                and self._pool.exception() is None:
+            pool = self._pool.result()
+            pool.close()
+            await pool.wait_closed()
+        self._pool = self._pool_loop = None
+
+    def pool_stats(self):
+        if self._pool is None or not self._pool.done() or self._pool.cancelled() or self._pool.exception():
+            return None
+        pool = self._pool.result()
+        return pool.size, pool.freesize
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    nickname TEXT,
+    full_name TEXT,
+    password_hash TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS user_settings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    setting_key TEXT NOT NULL,
+    setting_value TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (user_id, setting_key)
+);
+"""
+
+
+class SQLiteUserRepository(UserRepository):
+    """Local SQLite file with the same tables, for tests and benchmarks without a MySQL server"""
+
+    upsert_setting_sql = """
+        INSERT INTO user_settings (user_id, setting_key, setting_value)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (user_id, setting_key) DO UPDATE SET
+            setting_value = excluded.setting_value, updated_at = CURRENT_TIMESTAMP
+    """
+
+    def __init__(self, path: str = USER_DB_SQLITE_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def _connection(self):
+        # aiosqlite runs one thread per connection and creates its futures on the calling loop,
+        # so a single connection serves every event loop
+        if self._conn is None:
+            async with self._lock:
+                if self._conn is None:
+                    if os.path.dirname(self.path):
+                        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    conn = await aiosqlite.connect(self.path)
+                    conn.row_factory = aiosqlite.Row
+                    await conn.execute("PRAGMA journal_mode=WAL")
+                    await conn.execute("PRAGMA foreign_keys=ON")
+                    await conn.executescript(SQLITE_SCHEMA)
+                    self._conn = conn
+        return self._conn
+
+    async def _fetchone(self, sql, params=()):
+        conn = await self._connection()
+        async with conn.execute(sql.replace("%s", "?"), tuple(params)) as cursor:
+            row = await cursor.fetchone()
+        return dict(row) if row is not None else None
+
+    async def _fetchall(self, sql, params=()):
+        conn = await self._connection()
+        async with conn.execute(sql.replace("%s", "?"), tuple(params)) as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
+
+    async def _execute(self, sql, params=()):
+        conn = await self._connection()
+        cursor = await conn.execute(sql.replace("%s", "?"), tuple(params))
+        await conn.commit()
+        return cursor.rowcount, cursor.lastrowid
+
+    async def _executemany(self, sql, rows):
+        conn = await self._connection()
+        await conn.executemany(sql.replace("%s", "?"), rows)
+        await conn.commit()
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+_repository = None
+
+
+def get_repository() -> UserRepository:
+    """The process-wide repository for USER_DB_BACKEND"""
+    global _repository
+    if _repository is None:
+        _repository = SQLiteUserRepository() if USER_DB_BACKEND == "sqlite" else MySQLUserRepository()
+    return _repository
+
+
+def set_repository(repository: Optional[UserRepository]):
+    """Swap the repository (tests and benchmarks); None goes back to USER_DB_BACKEND"""
+    global _repository
+    _repository = repository
+
+
+async def close_repository():
+    if _repository is not None:
+        await _repository.close()
+
+
+def _collect_db_stats():
+    stats = _repository.pool_stats() if _repository is not None else None
+    size, idle = stats if stats is not None else (0, 0)
+    return [
+        ("etl_db_pool_size", "gauge", "Configured maximum MySQL pool size", [({}, DB_POOL_SIZE)]),
+        ("etl_db_pool_open", "gauge", "Open pooled MySQL connections", [({}, size)]),
+        ("etl_db_pool_idle", "gauge", "Idle pooled MySQL connections", [({}, idle)]),
+    ]
+
+register_collector(_collect_db_stats)
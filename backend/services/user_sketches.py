@@ -0,0 +1,263 @@
+import os
+import json
+import math
+import hashlib
+import threading
+from utils.lazy import lazy_import
+from utils.metrics import timed
+from utils.files import tmp_path as _tmp_path
+
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+pq = lazy_import("pyarrow.parquet")
+
+# Per-day HyperLogLog sketches of the user IDs in each source (the raw files and every Delta
+# table), with the exact record count of the day. Distinct users over any range are estimated by
+# merging the daily sketches (register-wise max) instead of building exact sets of user IDs, so a
+# year costs 365 small array maxima. Estimates have a relative standard error of 1.04/sqrt(2^p).
+#
+# The sketches are written next to the Delta tables and record the table versions and the digest
+# of each day's raw files they were built from, so only what changed has to be re-sketched. Tables
+# are sketched from their per-(date, user) row counts, which the aggregate store keeps up to date
+# from the Delta log; a digest of each day's counts tells which days a new commit touched.
+
+SKETCH_DIRNAME = "_sketches"
+SKETCH_FILENAME = "users.parquet"
+
+# 2^14 one-byte registers per sketch: 16 KiB, ~0.8% standard error
+PRECISION = 14
+
+RAW = "raw"
+
+_cache_lock = threading.Lock()
+_cache = {}
+
+
+def _strings(values):
+    """Arrow string array or chunked array from an Arrow column or a Python sequence"""
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return pc.cast(values, pa.string())
+    return pa.array(values, pa.string())
+
+
+def _hash_strings(strings):
+    digests = b"".join(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest() for value in strings)
+    return np.frombuffer(digests, dtype="<u8")
+
+
+def hash_values(values):
+    """64-bit hashes of the distinct non-null string values"""
+    return _hash_strings(pc.unique(_strings(values).drop_null()).to_pylist())
+
+
+def _bucket_ranks(hashes, precision):
+    """Register index (top p bits) and rank (leading zeros + 1 of the remaining bits) of each hash"""
+    shift = np.uint64(64 - precision)
+    buckets = (hashes >> shift).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # Exact bit length, avoiding float log2 rounding near powers of two
+    powers = np.left_shift(np.uint64(1), np.arange(64 - precision, dtype=np.uint64))
+    bit_length = np.searchsorted(powers, rest, side="right")
+    ranks = (64 - precision) - bit_length + 1
+    return buckets, ranks.astype(np.uint8)
+
+
+class HyperLogLog:
+    def __init__(self, registers=None, precision: int = PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of estimate()"""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add_hashes(self, hashes):
+        buckets, ranks = _bucket_ranks(hashes, self.precision)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def add(self, values):
+        self.add_hashes(hash_values(values))
+
+    def update(self, other: "HyperLogLog"):
+        """Merge another sketch of the same precision into this one"""
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @classmethod
+    def union(cls, sketches, precision: int = PRECISION) -> "HyperLogLog":
+        merged = cls(precision=precision)
+        for sketch in sketches:
+            merged.update(sketch)
+        return merged
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw_estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw_estimate <= 2.5 * m and zeros:
+            # Linear counting is far more accurate while most registers are still empty
+            return m * math.log(m / zeros)
+        return raw_estimate
+
+
+def _encode_dates(table):
+    """Distinct dates and the index of each row's date, for a table without null dates"""
+    encoded_dates = pc.dictionary_encode(table["ingestion_date"]).combine_chunks()
+    return encoded_dates.dictionary.to_pylist(), encoded_dates.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+
+
+def _dated_table(dates, users, counts):
+    table = pa.table({"ingestion_date": _strings(dates), "user_id": _strings(users),
+                      "count": pa.array(np.ones(len(dates), dtype=np.int64)) if counts is None
+                      else pc.cast(counts, pa.int64())})
+    return table.filter(pc.is_valid(table["ingestion_date"]))
+
+
+@timed("sketch_build")
+def daily_sketches(dates, users, precision: int = PRECISION, counts=None):
+    """
+    {date: (sketch, rows)} from parallel ingestion_date and user ID arrays in one vectorized pass.
+    counts gives the rows each entry stands for (one each by default), e.g. for per-(date, user)
+    row counts. Rows with a null user still count towards rows; rows with a null date are skipped.
+    """
+    table = _dated_table(dates, users, counts)
+    if table.num_rows == 0:
+        return {}
+    date_values, date_ids = _encode_dates(table)
+    rows = np.bincount(date_ids, weights=table["count"].to_numpy(), minlength=len(date_values))
+
+    encoded_users = pc.dictionary_encode(table["user_id"]).combine_chunks()
+    user_ids = encoded_users.indices.to_numpy(zero_copy_only=False)
+    has_user = encoded_users.indices.is_valid().to_numpy(zero_copy_only=False)
+    # Every distinct user is hashed once, however many days and rows it appears on
+    hashes = hash_values(encoded_users.dictionary)
+    buckets, ranks = _bucket_ranks(hashes, precision)
+
+    m = 1 << precision
+    registers = np.zeros(len(date_values) * m, dtype=np.uint8)
+    user_ids = user_ids[has_user].astype(np.int64)
+    np.maximum.at(registers, date_ids[has_user] * m + buckets[user_ids], ranks[user_ids])
+    registers = registers.reshape(len(date_values), m)
+    return {
+        date_str: (HyperLogLog(registers[i].copy(), precision), int(rows[i]))
+        for i, date_str in enumerate(date_values)
+    }
+
+
+def daily_digests(dates, users, counts):
+    """
+    {date: digest of its (user, count) entries} from parallel arrays of per-(date, user) row
+    counts, so the days whose counts changed can be told apart without keeping the counts
+    """
+    table = _dated_table(dates, users, counts)
+    if table.num_rows == 0:
+        return {}
+    date_values, date_ids = _encode_dates(table)
+    encoded_users = pc.dictionary_encode(table["user_id"]).combine_chunks()
+    user_hashes = np.append(_hash_strings(encoded_users.dictionary.to_pylist()), np.uint64(0))
+    # Null users take the extra hash at the end
+    user_ids = pc.fill_null(encoded_users.indices, len(encoded_users.dictionary)).to_numpy(zero_copy_only=False)
+    # An order-independent sum (mod 2^64) of one mixed value per entry
+    entries = (user_hashes[user_ids] ^ (table["count"].to_numpy().astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)))
+    entries = entries * np.uint64(0xBF58476D1CE4E5B9)
+    sums = np.zeros(len(date_values), dtype=np.uint64)
+    np.add.at(sums, date_ids, entries)
+    sizes = np.bincount(date_ids, minlength=len(date_values))
+    return {date_str: f"{int(sizes[i])}:{int(sums[i]):016x}" for i, date_str in enumerate(date_values)}
+
+
+class UserSketches:
+    def __init__(self, sketches, records, versions, raw_digests, precision: int = PRECISION, table_digests=None):
+        # {(source, date): HyperLogLog} and {(source, date): record count}
+        self.sketches = sketches
+        self.records = records
+        self.versions = versions
+        # {date: digest of that day's raw files}
+        self.raw_digests = raw_digests
+        self.precision = precision
+        # {table: {date: daily_digests of that day's row counts}}
+        self.table_digests = table_digests if table_digests is not None else {}
+
+    def union(self, sources, date_list) -> HyperLogLog:
+        """Sketch of the users in any of the sources on any of the dates"""
+        return HyperLogLog.union((self.sketches[(source, date_str)] for source in sources for date_str in date_list
+                                  if (source, date_str) in self.sketches), self.precision)
+
+    def record_count(self, sources, date_list) -> int:
+        return sum(self.records.get((source, date_str), 0) for source in sources for date_str in date_list)
+
+    def replace(self, source: str, by_date):
+        """Swap every day of one source for {date: (sketch, rows)}"""
+        for key in [key for key in self.sketches if key[0] == source]:
+            del self.sketches[key]
+            self.records.pop(key, None)
+        self.update(source, by_date)
+
+    def update(self, source: str, by_date):
+        for date_str, (sketch, rows) in by_date.items():
+            self.sketches[(source, date_str)] = sketch
+            self.records[(source, date_str)] = rows
+
+    def drop(self, source: str, date_str: str):
+        self.sketches.pop((source, date_str), None)
+        self.records.pop((source, date_str), None)
+
+
+def sketch_path(table_paths) -> str:
+    """Sketch file in the directory holding the Delta tables"""
+    return os.path.join(os.path.dirname(table_paths["bronze"]), SKETCH_DIRNAME, SKETCH_FILENAME)
+
+
+def write(sketches: UserSketches, path: str):
+    keys = sorted(sketches.sketches)
+    table = pa.table({
+        "source": pa.array([key[0] for key in keys], pa.string()),
+        "ingestion_date": pa.array([key[1] for key in keys], pa.string()),
+        "records": pa.array([sketches.records.get(key, 0) for key in keys], pa.int64()),
+        "registers": pa.array([sketches.sketches[key].registers.tobytes() for key in keys], pa.binary()),
+    }).replace_schema_metadata({
+        "precision": str(sketches.precision),
+        "versions": json.dumps(sketches.versions),
+        "raw_digests": json.dumps(sketches.raw_digests),
+        "table_digests": json.dumps(sketches.table_digests),
+    })
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _tmp_path(path)
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read(path: str) -> UserSketches:
+    table = pq.read_table(path)
+    metadata = table.schema.metadata
+    precision = int(metadata[b"precision"])
+    sketches = {}
+    records = {}
+    for source, date_str, count, data in zip(table["source"].to_pylist(), table["ingestion_date"].to_pylist(),
+                                             table["records"].to_pylist(), table["registers"].to_pylist()):
+        sketches[(source, date_str)] = HyperLogLog(np.frombuffer(data, dtype=np.uint8).copy(), precision)
+        records[(source, date_str)] = count
+    return UserSketches(sketches, records, json.loads(metadata[b"versions"]), json.loads(metadata[b"raw_digests"]),
+                        precision, json.loads(metadata.get(b"table_digests", b"{}")))
+
+
+def load(path: str):
+    """
+    The persisted sketches, or None when there are none (or they cannot be read).
+    Loaded sketches are kept in memory until the file changes; callers must not modify them.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is None or cached[0] != mtime:
+            try:
+                cached = _cache[path] = (mtime, read(path))
+            except Exception as e:
+                print(f"Could not read user sketches {path}: {e}")
+                return None
+    return cached[1]
@@ -0,0 +1,177 @@
+import os
+import gzip
+import json
+from urllib.parse import unquote
+from utils.lazy import lazy_import
+from utils.metrics import timed, register_collector
+from services import delta_reader, ingest_status
+
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+pq = lazy_import("pyarrow.parquet")
+
+# Drill-down for one user: per-day record counts in every table, by vital type, next to the
+# user's raw files. Instead of loading whole tables, each table's add actions are pruned with the
+# partition values or min/max statistics Delta keeps per data file, so only files whose user_id
+# and ingestion_date ranges can hold the user's rows in the range are opened. Those are read with
+# the same predicate pushed down to Parquet row groups. The loader writes rows sorted by
+# ingestion date and then user, so files cover narrow date ranges and row groups narrow user ranges.
+
+stats = {"requests": 0, "files_read": 0, "files_skipped": 0}
+
+
+def _may_contain(actions, column, low, high):
+    """Mask of the files whose values of column can fall within [low, high]"""
+    partition = f"partition.{column}"
+    if partition in actions.column_names:
+        values = actions[partition]
+        return pc.fill_null(pc.and_(pc.greater_equal(values, low), pc.less_equal(values, high)), False)
+    if f"min.{column}" in actions.column_names:
+        # Files without statistics have null bounds and must be read
+        above = pc.fill_null(pc.greater_equal(actions[f"max.{column}"], low), True)
+        below = pc.fill_null(pc.less_equal(actions[f"min.{column}"], high), True)
+        return pc.and_(above, below)
+    return pa.array([True] * actions.num_rows)
+
+
+def candidate_files(dt, user_id, start, end):
+    """[(path, partition values)] of the data files that may hold user_id's rows from start to end, and the file count"""
+    actions = pa.table(dt.get_add_actions(flatten=True))
+    mask = pc.and_(_may_contain(actions, "user_id", user_id, user_id),
+                   _may_contain(actions, "ingestion_date", start, end))
+    partition_columns = [name for name in actions.column_names if name.startswith("partition.")]
+    files = [
+        (action["path"], {name[len("partition."):]: action[name] for name in partition_columns})
+        for action in actions.filter(mask).select(["path"] + partition_columns).to_pylist()
+    ]
+    return files, actions.num_rows
+
+
+def _read_file(table_path, path, partition_values, user_id, start, end):
+    file_path = os.path.join(table_path, unquote(path))
+    available = set(pq.read_schema(file_path).names)
+    columns = [c for c in ("ingestion_date", "user_id", "type") if c in available]
+    filters = [("user_id", "=", user_id)] if "user_id" in available else []
+    if "ingestion_date" in available:
+        filters += [("ingestion_date", ">=", start), ("ingestion_date", "<=", end)]
+    rows = pq.read_table(file_path, columns=columns, filters=filters or None)
+    for column in ("ingestion_date", "user_id"):
+        if column not in available:
+            value = partition_values.get(column)
+            rows = rows.append_column(column, pa.array([value] * rows.num_rows, pa.string()))
+    rows = rows.filter(pc.and_(pc.equal(rows["user_id"], user_id),
+                               pc.and_(pc.greater_equal(rows["ingestion_date"], start),
+                                       pc.less_equal(rows["ingestion_date"], end))))
+    if "type" not in rows.column_names:
+        rows = rows.append_column("type", pa.nulls(rows.num_rows, pa.string()))
+    return rows.select(["ingestion_date", "type"]).cast(pa.schema([("ingestion_date", pa.string()),
+                                                                   ("type", pa.string())]))
+
+
+def _table_rows(table_path, user_id, start, end):
+    """(ingestion_date, type) of the user's rows in one table, and {files, files_read}"""
+    dt = delta_reader.open_table(table_path)
+    if "deletionVectors" in (dt.protocol().reader_features or []):
+        # Data files alone would still count deleted rows
+        table = dt.to_pyarrow_table(columns=["ingestion_date", "user_id", "type"])
+        rows = table.filter(pc.and_(pc.equal(table["user_id"], user_id),
+                                    pc.and_(pc.greater_equal(table["ingestion_date"], start),
+                                            pc.less_equal(table["ingestion_date"], end))))
+        return rows.select(["ingestion_date", "type"]), {"files": None, "files_read": None}
+    files, total = candidate_files(dt, user_id, start, end)
+    stats["files_read"] += len(files)
+    stats["files_skipped"] += total - len(files)
+    tables = [_read_file(table_path, path, partition_values, user_id, start, end)
+              for path, partition_values in files]
+    rows = pa.concat_tables(tables) if tables else pa.schema(
+        [("ingestion_date", pa.string()), ("type", pa.string())]).empty_table()
+    return rows, {"files": total, "files_read": len(files)}
+
+
+def _raw_files(user_id, date_set):
+    """The user's raw files on the dates, with their record counts and whether they are ingested"""
+    ingested = ingest_status.read_ingested(delta_reader.TABLE_PATHS)
+    files = []
+    prefix = f"{user_id}_"
+    try:
+        names = sorted(name for name in os.listdir(delta_reader.DATA_DIR)
+                       if name.startswith(prefix) and name.endswith('.gz'))
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        date_str = delta_reader.raw_file_date(name)
+        if date_str not in date_set:
+            continue
+        path = os.path.join(delta_reader.DATA_DIR, name)
+        stat = os.stat(path)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                records = json.load(f)
+            count = len(records) if isinstance(records, list) else 1
+        except (OSError, ValueError) as e:
+            print(f"Could not read raw file {name}: {e}")
+            count = None
+        files.append({
+            "name": name,
+            "date": date_str,
+            "size_bytes": stat.st_size,
+            "modified_at": stat.st_mtime,
+            "records": count,
+            "ingested": None if ingested is None else ingested.get(name) == [stat.st_size, stat.st_mtime_ns],
+        })
+    return files
+
+
+@timed("user_timeline")
+def get_user_timeline(user_id: str, start: str, end: str):
+    """
+    Per-day record counts of one user in the raw files and every table (with vital types), and
+    the user's raw files, from start to end inclusive.
+
+    Raises:
+        ValueError: bad dates, end before start or a range over MAX_RANGE_DAYS
+    """
+    date_list = delta_reader.get_range_dates(start, end)
+    if len(date_list) > delta_reader.MAX_RANGE_DAYS:
+        raise ValueError(f"Date range must not exceed {delta_reader.MAX_RANGE_DAYS} days")
+    stats["requests"] += 1
+    days = {date_str: {"date": date_str, "raw": 0, "tables": {}} for date_str in date_list}
+    scans = {}
+    for name, table_path in delta_reader.TABLE_PATHS.items():
+        try:
+            rows, scans[name] = _table_rows(table_path, user_id, start, end)
+        except Exception as e:
+            print(f"Error reading {name} for user {user_id}: {e}")
+            rows, scans[name] = None, {"files": None, "files_read": None, "error": str(e)}
+        for day in days.values():
+            day["tables"][name] = {"records": 0, "vitals": {}}
+        if rows is None or rows.num_rows == 0:
+            continue
+        grouped = rows.group_by(["ingestion_date", "type"]).aggregate([([], "count_all")])
+        for row in grouped.to_pylist():
+            entry = days[row["ingestion_date"]]["tables"][name]
+            entry["records"] += row["count_all"]
+            if row["type"] is not None:
+                entry["vitals"][row["type"]] = row["count_all"]
+
+    raw_files = _raw_files(user_id, set(date_list))
+    for raw_file in raw_files:
+        days[raw_file["date"]]["raw"] += raw_file["records"] or 0
+    return {
+        "user_id": user_id,
+        "start": start,
+        "end": end,
+        "days": list(days.values()),
+        "raw_files": raw_files,
+        "scan": scans,
+    }
+
+
+def _collect_timeline_stats():
+    return [
+        ("etl_timeline_requests_total", "counter", "User timeline requests", [({}, stats["requests"])]),
+        ("etl_timeline_files_total", "counter", "Delta data files read or skipped by user timelines",
+         [({"outcome": "read"}, stats["files_read"]), ({"outcome": "skipped"}, stats["files_skipped"])]),
+    ]
+
+register_collector(_collect_timeline_stats)
@@ -0,0 +1,75 @@
+import time
+import threading
+from datetime import datetime
+from utils.lazy import load_times, preload
+from services import delta_reader, columnar_export, excel_export, auth_service
+
+# Startup report and background prewarm. The app is ready once warmup has finished (or was
+# skipped); a failed warmup is reported but still counts as ready, since requests only lose
+# the head start.
+
+report = {
+    "state": "pending",
+    "import_seconds": None,
+    "stages": {},
+    "error": None,
+}
+_lock = threading.Lock()
+
+
+def record_import_time(seconds: float):
+    report["import_seconds"] = round(seconds, 3)
+
+
+def is_ready() -> bool:
+    return report["state"] in ("done", "failed", "skipped")
+
+
+def readiness() -> dict:
+    """Readiness flag plus the cold-start report: app import time, lazy imports and warmup stages"""
+    return {
+        "ready": is_ready(),
+        **report,
+        "lazy_imports": {name: round(seconds, 3) for name, seconds in load_times.items()},
+    }
+
+
+def _stage(name, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    report["stages"][name] = round(time.perf_counter() - start, 3)
+
+
+def run(date_str: str = None):
+    """Run every warmup stage in order on the calling thread"""
+    date_str = date_str or datetime.today().strftime('%Y-%m-%d')
+    report["state"] = "running"
+    try:
+        _stage("imports", preload, delta_reader.deltalake, delta_reader.np, delta_reader.pa, delta_reader.pc,
+               columnar_export.pq, excel_export.openpyxl, excel_export.styles, auth_service.bcrypt,
+               auth_service.jwt)
+        _stage("table_snapshots", delta_reader.get_table_versions)
+        _stage("raw_manifest", delta_reader.get_raw_manifest_digest)
+        _stage("daily_summary", delta_reader.get_summary, date_str)
+        _stage("weekly_summary", delta_reader.get_weekly_summary, date_str)
+        _stage("monthly_summary", delta_reader.get_monthly_summary, date_str)
+        _stage("presence_index", delta_reader.refresh_presence_index)
+        _stage("user_sketches", delta_reader.current_user_sketches)
+        report["state"] = "done"
+    except Exception as e:
+        print(f"Error during warmup: {e}")
+        report["error"] = str(e)
+        report["state"] = "failed"
+
+
+def start():
+    """Start warmup on a background thread (once)"""
+    with _lock:
+        if report["state"] != "pending":
+            return
+        report["state"] = "running"
+    threading.Thread(target=run, name="warmup", daemon=True).start()
+
+
+def skip():
+    report["state"] = "skipped"
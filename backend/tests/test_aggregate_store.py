@@ -0,0 +1,79 @@
+import sys
+import os
+import shutil
+import pandas as pd
+import pytest
+from deltalake import DeltaTable, write_deltalake
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import delta_reader, aggregate_store
+
+DATES = ['2025-07-28', '2025-07-29']
+
+def _summaries():
+    return (delta_reader.get_aggregated_summary(DATES, "week"),
+            delta_reader.get_range_summary(DATES[0], DATES[1], "day"),
+            delta_reader.get_user_record_counts(DATES).to_pylist())
+
+def _store_counts(name):
+    path = delta_reader.TABLE_PATHS[name]
+    counts = aggregate_store.date_user_counts(path, delta_reader.open_table(path))
+    return sorted(counts.to_pylist(), key=lambda row: (row["ingestion_date"], row["user_id"]))
+
+def _scanned_counts(name):
+    path = delta_reader.TABLE_PATHS[name]
+    counts = aggregate_store.build(DeltaTable(path), path).totals
+    return sorted(counts.to_pylist(), key=lambda row: (row["ingestion_date"], row["user_id"]))
+
+def test_store_matches_table_scans(sample_lake, monkeypatch):
+    with_store = _summaries()
+    monkeypatch.setattr(delta_reader, 'AGGREGATE_STORE_ENABLED', False)
+    assert _summaries() == with_store
+    assert with_store[0]["total_silver"] == 18
+
+def test_new_commits_are_applied_incrementally(sample_lake, monkeypatch):
+    _store_counts('bronze')
+    monkeypatch.setattr(aggregate_store, 'stats', dict.fromkeys(aggregate_store.stats, 0))
+    row = pd.DataFrame([{'type': 'STEPS', 'value': 1, 'timestamp': 0, 'user_id': 'userD', 'ingestion_date': DATES[0]}])
+    write_deltalake(sample_lake['table_paths']['bronze'], row, mode='append')
+    DeltaTable(sample_lake['table_paths']['bronze']).delete("user_id = 'userB'")
+
+    counts = _store_counts('bronze')
+    assert aggregate_store.stats["incremental"] == 1 and aggregate_store.stats["rebuilds"] == 0
+    assert aggregate_store.stats["files_removed"] >= 1
+    assert counts == _scanned_counts('bronze')
+    assert delta_reader.get_summary(DATES[0])["total_bronze"] == 3
+
+def test_restart_resumes_from_persisted_store(sample_lake, monkeypatch):
+    _store_counts('bronze')
+    monkeypatch.setattr(aggregate_store, '_states', {})
+    monkeypatch.setattr(aggregate_store, 'stats', dict.fromkeys(aggregate_store.stats, 0))
+    counts = _store_counts('bronze')
+    assert aggregate_store.stats == dict.fromkeys(aggregate_store.stats, 0)
+    assert counts == _scanned_counts('bronze')
+
+def test_recreated_table_is_rebuilt(sample_lake, monkeypatch):
+    _store_counts('silver_vitalsswt')
+    path = sample_lake['table_paths']['silver_vitalsswt']
+    shutil.rmtree(path)
+    write_deltalake(path, sample_lake['records'], mode='overwrite')
+    monkeypatch.setattr(delta_reader, '_open_tables', {})
+    monkeypatch.setattr(aggregate_store, 'stats', dict.fromkeys(aggregate_store.stats, 0))
+    counts = _store_counts('silver_vitalsswt')
+    assert aggregate_store.stats["incremental"] == 0 and aggregate_store.stats["rebuilds"] == 1
+    assert counts == _scanned_counts('silver_vitalsswt')
+    assert delta_reader.get_summary(DATES[1])["bronze_to_silver_status"] == "Success"
+
+def test_vacuumed_file_forces_rebuild(sample_lake, monkeypatch):
+    _store_counts('bronze')
+    path = sample_lake['table_paths']['bronze']
+    row = pd.DataFrame([{'type': 'STEPS', 'value': 1, 'timestamp': 0, 'user_id': 'userD', 'ingestion_date': DATES[0]}])
+    write_deltalake(path, row, mode='append')
+    # The appended file is removed again and vacuumed before the store catches up
+    write_deltalake(path, sample_lake['records'], mode='overwrite')
+    DeltaTable(path).vacuum(retention_hours=0, enforce_retention_duration=False, dry_run=False)
+    monkeypatch.setattr(aggregate_store, 'stats', dict.fromkeys(aggregate_store.stats, 0))
+    counts = _store_counts('bronze')
+    assert aggregate_store.stats["incremental"] == 0 and aggregate_store.stats["rebuilds"] == 1
+    assert counts == _scanned_counts('bronze')
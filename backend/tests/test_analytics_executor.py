@@ -0,0 +1,52 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from services import analytics_executor
+from services.analytics_executor import run_analytics
+
+client = TestClient(app)
+
+def _occupy_pool(release: threading.Event):
+    thread = threading.Thread(target=lambda: asyncio.run(run_analytics(release.wait)))
+    thread.start()
+    deadline = time.perf_counter() + 5
+    while analytics_executor.load() == (0, 0) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return thread
+
+def test_saturated_pool_rejects_with_retry_after(sample_lake, monkeypatch):
+    monkeypatch.setattr(analytics_executor, 'ANALYTICS_WORKERS', 1)
+    monkeypatch.setattr(analytics_executor, 'ANALYTICS_MAX_QUEUE', 0)
+    release = threading.Event()
+    worker = _occupy_pool(release)
+    try:
+        response = client.get("/api/sync-status", params={"date": "2025-07-28"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+        # Cheap endpoints do not go through the analytics pool
+        assert client.get("/metrics").status_code == 200
+    finally:
+        release.set()
+        worker.join()
+    assert analytics_executor.load() == (0, 0)
+    assert client.get("/api/sync-status", params={"date": "2025-07-28"}).status_code == 200
+
+def test_admission_is_released_when_work_fails():
+    def fail():
+        raise ValueError("bad input")
+
+    async def scenario():
+        try:
+            await run_analytics(fail)
+        except ValueError as e:
+            return str(e)
+
+    assert asyncio.run(scenario()) == "bad input"
+    assert analytics_executor.load() == (0, 0)
@@ -0,0 +1,86 @@
+import sys
+import os
+import pytest
+import pyarrow as pa
+from datetime import date, timedelta
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from api.routes import get_current_user
+from services import baselines, quality_stats
+
+client = TestClient(app)
+
+TEST_USER = {"id": 1, "username": "test@gmail.com", "nickname": None, "full_name": None}
+
+DAYS = [(date(2025, 7, 1) + timedelta(days=i)).isoformat() for i in range(15)]
+
+@pytest.fixture
+def authenticated(user_store):
+    app.dependency_overrides[get_current_user] = lambda: TEST_USER
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    baselines._cache.clear()
+    yield
+    baselines._cache.clear()
+
+def _quality_rows(days, counts):
+    """Quality table rows: one raw file per (day, user) with the given HEART_RATE record count"""
+    rows = [(day, user_id, count) for day in days for user_id, count in counts(day).items()]
+    return pa.table({
+        "ingestion_date": [day for day, _, _ in rows],
+        "user_id": [user_id for _, user_id, _ in rows],
+        "type": ["HEART_RATE"] * len(rows),
+        "source_file": [f"{user_id}_{day}.gz" for day, user_id, _ in rows],
+        "records": pa.array([count for _, _, count in rows], pa.int64()),
+    })
+
+def _steady(day):
+    # userA drops to a tenth of its usual volume on the last day; userB stays steady
+    return {"userA": 10 if day == DAYS[-1] else 100 + int(day[-2:]) % 5, "userB": 50}
+
+def test_sudden_drop_is_flagged(sample_lake):
+    quality_stats.write(sample_lake['table_paths'], _quality_rows(DAYS, _steady), overwrite=True)
+    result = baselines.get_anomalies(DAYS[-1])
+    assert result["available"] and result["checked"] == 2
+    assert [(a["user_id"], a["direction"]) for a in result["anomalies"]] == [("userA", "low")]
+    assert result["anomalies"][0]["ratio"] < 0.2
+    assert baselines.get_anomalies(DAYS[-2])["anomalies"] == []
+
+def test_new_day_is_folded_in_without_replaying_history(sample_lake):
+    paths = sample_lake['table_paths']
+    quality_stats.write(paths, _quality_rows(DAYS[:-1], _steady), overwrite=True)
+    before = baselines.current()
+    processed = baselines.stats["days_processed"]
+    quality_stats.write(paths, _quality_rows(DAYS[-1:], _steady))
+    after = baselines.current()
+    assert baselines.stats["days_processed"] == processed + 1
+    assert after.rows[DAYS[0]] is before.rows[DAYS[0]]
+
+    # A reloaded store continues from the same state
+    baselines._cache.clear()
+    loaded = baselines.read(baselines.baseline_path(paths))
+    assert loaded.keys == after.keys and (loaded.mean == after.mean).all()
+
+def test_late_file_replays_from_its_day(sample_lake):
+    paths = sample_lake['table_paths']
+    quality_stats.write(paths, _quality_rows(DAYS, _steady), overwrite=True)
+    baselines.current()
+    processed = baselines.stats["days_processed"]
+    late = pa.table({"ingestion_date": [DAYS[-3]], "user_id": ["userB"], "type": ["HEART_RATE"],
+                     "source_file": ["userB_late.gz"], "records": pa.array([500], pa.int64())})
+    quality_stats.write(paths, late)
+    result = baselines.get_anomalies(DAYS[-3])
+    assert baselines.stats["days_processed"] == processed + 3
+    assert [(a["user_id"], a["direction"], a["count"]) for a in result["anomalies"]] == [("userB", "high", 550)]
+
+def test_anomalies_endpoint(sample_lake, authenticated):
+    assert client.get("/api/anomalies", params={"date": DAYS[-1]}).json()["available"] is False
+    quality_stats.write(sample_lake['table_paths'], _quality_rows(DAYS, _steady), overwrite=True)
+    body = client.get("/api/anomalies", params={"date": DAYS[-1], "threshold": 2}).json()
+    assert body["threshold"] == 2 and [a["user_id"] for a in body["anomalies"]] == ["userA"]
@@ -0,0 +1,57 @@
+import sys
+import os
+import time
+import threading
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import delta_reader, result_cache
+from utils.singleflight import SingleFlight
+
+def _run_concurrently(target, count=4):
+    results = []
+    errors = []
+    def call():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+def test_concurrent_callers_share_one_execution_and_its_error():
+    flights = SingleFlight("test")
+    started = []
+    def slow_failure():
+        started.append(1)
+        time.sleep(0.2)
+        raise RuntimeError("boom")
+
+    results, errors = _run_concurrently(lambda: flights.do("key", slow_failure))
+    assert len(started) == 1
+    assert results == [] and len(errors) == 4 and all(str(e) == "boom" for e in errors)
+    assert flights.stats == {"executed": 1, "coalesced": 3}
+    assert flights.in_flight() == 0
+    # The failed key is not remembered
+    assert flights.do("key", lambda: "ok") == "ok"
+
+def test_identical_summary_requests_scan_once(sample_lake, monkeypatch):
+    monkeypatch.setattr(result_cache, 'RESULT_CACHE_ENABLED', False)
+    scans = []
+    original_scan = delta_reader.scan_sources
+    def slow_scan(*args, **kwargs):
+        scans.append(args)
+        time.sleep(0.2)
+        return original_scan(*args, **kwargs)
+    monkeypatch.setattr(delta_reader, 'scan_sources', slow_scan)
+
+    results, errors = _run_concurrently(lambda: delta_reader.get_monthly_summary('2025-07-28'))
+    assert errors == []
+    assert len(scans) == 1
+    assert all(result == results[0] for result in results)
+    assert results[0]['total_raw'] == 7
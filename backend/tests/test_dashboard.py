@@ -0,0 +1,92 @@
+import sys
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from api import routes
+from api.routes import get_current_user
+from services import delta_reader
+
+client = TestClient(app)
+
+TEST_USER = {"id": 1, "username": "test@gmail.com", "nickname": None, "full_name": None}
+
+@pytest.fixture
+def authenticated(user_store):
+    app.dependency_overrides[get_current_user] = lambda: TEST_USER
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+def test_daily_summary_counts(sample_lake):
+    summary = delta_reader.get_summary('2025-07-29')
+    assert summary['total_raw'] == 4
+    assert summary['total_bronze'] == 4
+    assert summary['total_silver'] == 9
+    assert summary['users'] == ['userA', 'userC']
+    assert summary['successful_ingestions'] == 1
+    assert summary['failed_ingestions'] == 1
+    assert summary['bronze_to_silver_status'] == 'Failed'
+
+def test_weekly_summary_aggregates_dates(sample_lake):
+    summary = delta_reader.get_weekly_summary('2025-07-30')
+    assert summary['date_range'] == '2025-07-28 to 2025-08-03'
+    assert summary['total_raw'] == 7
+    assert summary['users'] == ['userA', 'userB', 'userC']
+    assert summary['successful_ingestions'] == 2
+
+def test_dashboard_matches_individual_endpoints_with_one_scan(sample_lake, authenticated, monkeypatch):
+    scans = []
+    original_scan = delta_reader.scan_sources
+    monkeypatch.setattr(delta_reader, 'scan_sources', lambda *a, **kw: scans.append(a) or original_scan(*a, **kw))
+
+    params = {"date": "2025-07-28", "page_size": 2}
+    dashboard = client.get("/api/dashboard", params=params).json()
+    assert len(scans) == 1
+
+    assert dashboard["summary"] == client.get("/api/summary", params=params).json()
+    assert dashboard["sync_status"] == client.get("/api/sync-status", params=params).json()
+    assert dashboard["user_vitals"] == client.get("/api/user-vitals", params=params).json()
+
+def test_dashboard_only_computes_requested_sections(sample_lake, authenticated):
+    response = client.get("/api/dashboard", params={"date": "2025-07-28", "sections": "sync_status"})
+    assert response.status_code == 200
+    assert set(response.json()) == {"date", "view_type", "sync_status"}
+
+    response = client.get("/api/dashboard", params={"sections": "summary,charts"})
+    assert response.status_code == 400
+
+def test_sync_status_filters_before_pagination(sample_lake):
+    response = client.get("/api/sync-status", params={
+        "date": "2025-07-29", "status": ["bronze:Available", "silver_vitalsswt:Missing"], "page_size": 1})
+    data = response.json()
+    assert data["total_users"] == 1
+    assert data["total_pages"] == 1
+    assert [row["user_id"] for row in data["data"]] == ["userC"]
+
+def test_user_vitals_search_and_sort(sample_lake):
+    response = client.get("/api/user-vitals", params={"date": "2025-07-28", "search": "user", "sort": "-HEART_RATE"})
+    data = response.json()
+    assert data["total_users"] == 3
+    assert [row["user_id"] for row in data["data"]] == ["userC", "userA", "userB"]
+
+    response = client.get("/api/user-vitals", params={"date": "2025-07-28", "search": "userB"})
+    assert [row["user_id"] for row in response.json()["data"]] == ["userB"]
+
+def test_matrix_query_rejects_unknown_columns(sample_lake):
+    assert client.get("/api/sync-status", params={"status": "gold:Missing"}).status_code == 400
+    assert client.get("/api/sync-status", params={"status": "bronze:Maybe"}).status_code == 400
+    assert client.get("/api/user-vitals", params={"sort": "colour"}).status_code == 400
+
+def test_dashboard_filters_and_sorts_like_the_matrix_endpoints(sample_lake, authenticated):
+    params = {"date": "2025-07-28", "page_size": 1, "search": "user", "sort": "-user_id", "status": "bronze:Available"}
+    dashboard = client.get("/api/dashboard", params=params).json()
+    assert dashboard["sync_status"] == client.get("/api/sync-status", params=params).json()
+    vitals = client.get("/api/user-vitals", params={key: value for key, value in params.items() if key != "status"})
+    assert dashboard["user_vitals"] == vitals.json()
+    assert dashboard["sync_status"]["page_size"] == 1 and len(dashboard["sync_status"]["data"]) == 1
+
+    response = client.get("/api/dashboard", params={"date": "2025-07-28", "status": "nope:Missing"})
+    assert response.status_code == 400
@@ -0,0 +1,69 @@
+import sys
+import os
+import gzip
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from services import delta_reader, dirty_dates, result_cache
+
+client = TestClient(app)
+
+@pytest.fixture
+def tracker(sample_lake, tmp_path, monkeypatch):
+    monkeypatch.setattr(dirty_dates, 'DIRTY_STATE_PATH', str(tmp_path / 'raw_listing.json'))
+    # The first check only records the listing
+    assert dirty_dates.check_once() is None
+    return sample_lake
+
+def _add_raw_file(lake, user_id, epoch_ms):
+    with gzip.open(os.path.join(lake['data_dir'], f"{user_id}_{epoch_ms}.gz"), 'wt', encoding='utf-8') as f:
+        json.dump([{'type': 'STEPS', 'value': 1}], f)
+
+def test_late_file_marks_only_its_date_week_and_month(tracker):
+    assert dirty_dates.check_once() is None
+    _add_raw_file(tracker, 'userD', 1753790400000)
+    scope = dirty_dates.check_once()
+    assert scope == {"dates": ['2025-07-29'], "weeks": ['2025-07-28'], "months": ['2025-07']}
+
+def test_dirty_views_are_dropped_and_recomputed(tracker):
+    assert delta_reader.get_summary('2025-07-28')['total_raw'] == 3
+    assert delta_reader.get_summary('2025-07-29')['total_raw'] == 4
+    assert delta_reader.get_weekly_summary('2025-07-30')['total_raw'] == 7
+    _add_raw_file(tracker, 'userD', 1753790400000)
+
+    dirty_dates.check_once()
+    latest = lambda name, date_str: result_cache._read_latest(result_cache.view_key(name, date_str))
+    # Untouched dates keep their entry; dirty ones hold only the recomputed result
+    assert json.loads(latest("summary", '2025-07-28')[0])['total_raw'] == 3
+    assert json.loads(latest("summary", '2025-07-29')[0])['total_raw'] == 5
+    # Weekly summaries are cached once per week, under its Monday
+    assert json.loads(latest("weekly_summary", '2025-07-28')[0])['total_raw'] == 8
+
+    recent = client.get("/api/recomputed-dates").json()["dates"]
+    assert [entry["date"] for entry in recent] == ['2025-07-29']
+    assert recent[0]["files"] == ['userD_1753790400000.gz']
+    assert recent[0]["recomputed_views"] == ['summary:2025-07-29', 'weekly_summary:2025-07-28']
+
+def test_dirty_month_is_recomputed_once(tracker, monkeypatch):
+    delta_reader.get_monthly_summary('2025-07-30')
+    delta_reader.get_monthly_summary('2025-07-28')
+    calls = []
+    monkeypatch.setitem(dirty_dates.RAW_VIEWS, "monthly_summary", lambda date_str: calls.append(date_str))
+    _add_raw_file(tracker, 'userD', 1753704000001)
+    _add_raw_file(tracker, 'userD', 1753790400000)
+    dirty_dates.check_once()
+    assert calls == ['2025-07-01']
+
+def test_check_is_skipped_while_another_worker_holds_the_lock(tracker):
+    from utils.files import try_lock
+    _add_raw_file(tracker, 'userD', 1753790400000)
+    lock = try_lock(f"{dirty_dates.DIRTY_STATE_PATH}.lock")
+    try:
+        assert dirty_dates.check_once() is None
+    finally:
+        lock.close()
+    assert dirty_dates.check_once()["dates"] == ['2025-07-29']
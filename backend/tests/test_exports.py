@@ -0,0 +1,185 @@
+import sys
+import os
+import io
+import pytest
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from api import routes
+from api.routes import get_current_user
+from services import export_cache
+from services.delta_reader import build_sync_matrix, build_vitals_matrix, get_data_sync_status
+
+client = TestClient(app)
+
+TEST_USER = {"id": 1, "username": "test@gmail.com", "nickname": None, "full_name": None}
+
+@pytest.fixture
+def authenticated():
+    app.dependency_overrides[get_current_user] = lambda: TEST_USER
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+@pytest.fixture
+def export_cache_dir(tmp_path, monkeypatch, user_store):
+    cache_dir = tmp_path / 'exports'
+    monkeypatch.setattr(export_cache, 'EXPORT_CACHE_DIR', str(cache_dir))
+    return cache_dir
+
+def test_sync_matrix_covers_every_date_and_user(sample_lake):
+    matrix = build_sync_matrix(['2025-07-28', '2025-07-29'])
+    assert matrix.num_rows == 6
+    rows = {(r['ingestion_date'], r['user_id']): r for r in matrix.to_pylist()}
+    assert rows[('2025-07-28', 'userA')]['bronze'] == 'Available'
+    assert rows[('2025-07-28', 'userC')]['bronze'] == 'Missing'
+    assert rows[('2025-07-29', 'userC')]['silver_rrbucket'] == 'Available'
+    assert rows[('2025-07-29', 'userC')]['silver_vitalsswt'] == 'Missing'
+
+def test_vitals_matrix_flags_each_type(sample_lake):
+    matrix = build_vitals_matrix(['2025-07-28'])
+    assert matrix.column_names == ['ingestion_date', 'user_id', 'BLOOD_OXYGEN', 'HEART_RATE', 'STEPS']
+    rows = {r['user_id']: r for r in matrix.to_pylist()}
+    assert rows['userA']['STEPS'] == 'Available'
+    assert rows['userB']['STEPS'] == 'Missing'
+    assert rows['userC']['HEART_RATE'] == 'Missing'
+
+def test_sync_status_json_shape_unchanged(sample_lake):
+    result = get_data_sync_status('2025-07-28')
+    assert result['columns'] == ["user_id", "Bronze Data", "Silver RRBucket", "Silver VitalsBaseline", "Silver VitalSWT"]
+    assert result['data'][0] == {
+        "user_id": "userA",
+        "bronze": "Available",
+        "silver_rrbucket": "Available",
+        "silver_vitalsbaseline": "Available",
+        "silver_vitalsswt": "Available",
+    }
+
+@pytest.mark.parametrize("fmt,reader", [
+    ("csv", lambda b: pa_csv.read_csv(io.BytesIO(b))),
+    ("parquet", lambda b: pq.read_table(io.BytesIO(b))),
+    ("arrow", lambda b: pa_ipc.open_stream(b).read_all()),
+])
+def test_sync_status_export_formats(sample_lake, authenticated, export_cache_dir, fmt, reader):
+    response = client.get("/api/sync-status/export",
+                          params={"date": "2025-07-28", "end_date": "2025-07-29", "format": fmt})
+    assert response.status_code == 200
+    assert "attachment" in response.headers["content-disposition"]
+    table = reader(response.content)
+    assert table.num_rows == 6
+    assert table.column_names[:2] == ["ingestion_date", "user_id"]
+
+def test_user_vitals_export_rejects_reversed_range(sample_lake, authenticated):
+    response = client.get("/api/user-vitals/export",
+                          params={"date": "2025-07-29", "end_date": "2025-07-28"})
+    assert response.status_code == 400
+
+def test_summary_export_served_from_cache_until_inputs_change(sample_lake, authenticated, export_cache_dir):
+    params = {"date": "2025-07-28", "view_type": "daily"}
+    first = client.get("/api/summary/export", params=params)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    hits = export_cache.stats["hits"]
+
+    second = client.get("/api/summary/export", params=params)
+    assert second.headers["etag"] == etag
+    assert second.content == first.content
+    assert export_cache.stats["hits"] == hits + 1
+
+    not_modified = client.get("/api/summary/export", params=params, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+    from deltalake import write_deltalake
+    write_deltalake(sample_lake["table_paths"]["bronze"], sample_lake["records"].head(1), mode="append")
+    changed = client.get("/api/summary/export", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+def test_export_cache_evicts_least_recently_used(export_cache_dir):
+    export_cache.store("old", "csv", b"x" * 10)
+    export_cache.store("new", "csv", b"y" * 10)
+    os.utime(export_cache_dir / "old.csv", (0, 0))
+    export_cache.evict(max_bytes=15)
+    assert export_cache.lookup("old", "csv") is None
+    assert export_cache.lookup("new", "csv") is not None
+
+def test_export_evicted_after_lookup_is_regenerated(sample_lake, authenticated, export_cache_dir, monkeypatch):
+    params = {"date": "2025-07-28", "format": "csv"}
+    first = client.get("/api/sync-status/export", params=params)
+    monkeypatch.setattr(export_cache, "lookup", lambda key, extension: str(export_cache_dir / "evicted.csv"))
+    second = client.get("/api/sync-status/export", params=params)
+    assert second.status_code == 200
+    assert second.content == first.content
+
+def test_background_report_job_builds_all_sheets(sample_lake, authenticated, export_cache_dir):
+    import time
+    from openpyxl import load_workbook
+
+    response = client.post("/api/exports", json={"date": "2025-07-28", "view_type": "weekly"})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    for _ in range(100):
+        job = client.get(f"/api/exports/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "completed", job
+    assert job["progress"] == 100
+
+    download = client.get(job["download_url"])
+    assert download.status_code == 200
+    wb = load_workbook(io.BytesIO(download.content))
+    assert wb.sheetnames == ["Weekly Summary", "User Counts", "Sync Status", "Vitals Status"]
+    counts = {row[0]: row[1:] for row in wb["User Counts"].iter_rows(min_row=2, values_only=True)}
+    assert counts["userC"] == (3, 3, 6, "Failed")
+    assert counts["userA"] == (3, 3, 9, "Success")
+
+def test_report_job_is_keyed_on_the_analytics_pool(sample_lake, authenticated, export_cache_dir, monkeypatch):
+    import threading
+    from services import export_jobs
+    threads = []
+    original = export_jobs.submit_report
+    monkeypatch.setattr(export_jobs, "submit_report",
+                        lambda *a, **kw: threads.append(threading.current_thread().name) or original(*a, **kw))
+    assert client.post("/api/exports", json={"date": "2025-07-28"}).status_code == 202
+    assert threads and threads[0].startswith("analytics")
+
+def test_background_report_job_rejects_unknown_sheet(sample_lake, authenticated, export_cache_dir):
+    response = client.post("/api/exports", json={"date": "2025-07-28", "sheets": ["pivot"]})
+    assert response.status_code == 400
+
+def test_report_splits_tables_longer_than_a_sheet(sample_lake, monkeypatch):
+    from openpyxl import load_workbook
+    from services import excel_export, export_jobs
+    monkeypatch.setattr(excel_export, "EXCEL_MAX_ROWS", 3)
+    shared = {"date": "2025-07-28", "total_users": 3}
+    monkeypatch.setattr(export_jobs, "get_summary", lambda date, scan: shared)
+    monkeypatch.setattr(export_jobs, "_update", lambda job_id, **fields: None)
+    data = export_jobs._build_report("job", "daily", "2025-07-28", ["2025-07-28"], ["sync_status"], custom_count=7)
+    assert shared["total_users"] == 3
+    wb = load_workbook(io.BytesIO(data))
+    # Three users at two rows per sheet
+    assert wb.sheetnames == ["Daily Summary", "Sync Status", "Sync Status (2)"]
+    assert [len(list(wb[name].iter_rows(min_row=2))) for name in wb.sheetnames[1:]] == [2, 1]
+
+def test_recreated_table_is_reopened_and_changes_exports(sample_lake, authenticated, export_cache_dir):
+    import shutil
+    from deltalake import write_deltalake
+    from services import delta_reader
+    params = {"date": "2025-07-28", "view_type": "daily"}
+    first = client.get("/api/summary/export", params=params)
+    assert delta_reader.get_summary('2025-07-28')['total_bronze'] == 3
+
+    # A full reload deletes the table and writes it again from version 0
+    bronze = sample_lake["table_paths"]["bronze"]
+    shutil.rmtree(bronze)
+    write_deltalake(bronze, sample_lake["records"].head(1), mode="overwrite")
+    assert delta_reader.get_table_versions()["bronze"] == 0
+    assert delta_reader.get_summary('2025-07-28')['total_bronze'] == 1
+    assert client.get("/api/summary/export", params=params).headers["etag"] != first.headers["etag"]
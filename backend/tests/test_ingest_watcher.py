@@ -0,0 +1,157 @@
+import sys
+import os
+import gzip
+import json
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from data_ingestion import watcher
+from services import delta_reader, ingest_status
+
+client = TestClient(app)
+
+class QueueSource:
+    """Reports whatever names the test hands it"""
+    def __init__(self):
+        self.names = []
+
+    def wait(self, timeout):
+        names, self.names = self.names, []
+        return names
+
+    def close(self):
+        pass
+
+def _add_raw_file(lake, user_id, epoch_ms, records=1):
+    name = f"{user_id}_{epoch_ms}.gz"
+    with gzip.open(os.path.join(lake['data_dir'], name), 'wt', encoding='utf-8') as f:
+        json.dump([{'type': 'STEPS', 'value': i} for i in range(records)], f)
+    return name
+
+@pytest.fixture
+def lake_watcher(sample_lake):
+    source = QueueSource()
+    w = watcher.Watcher(sample_lake['data_dir'], sample_lake['table_paths'], source,
+                        max_files=2, max_seconds=3600)
+    w.catch_up()
+    return w, source, sample_lake
+
+def test_existing_lake_is_taken_as_ingested(lake_watcher):
+    w, _, lake = lake_watcher
+    assert w.pending == {}
+    assert sorted(ingest_status.read_ingested(lake['table_paths'])) == sorted(os.listdir(lake['data_dir']))
+
+def test_batch_is_appended_once_full(lake_watcher):
+    w, source, lake = lake_watcher
+    source.names = [_add_raw_file(lake, 'userD', 1753790400000, records=2)]
+    w.run_once(0)
+    # One file of two and the oldest arrived just now: not due yet
+    assert list(w.pending) == ['userD_1753790400000.gz']
+    assert delta_reader.get_summary('2025-07-29')['total_bronze'] == 4
+
+    source.names = [_add_raw_file(lake, 'userE', 1753704000000)]
+    w.run_once(0)
+    assert w.pending == {}
+    assert delta_reader.get_summary('2025-07-29')['total_bronze'] == 6
+    assert delta_reader.get_summary('2025-07-28')['total_bronze'] == 4
+    stats = ingest_status.read_stats(lake['table_paths'])
+    assert stats['batches'] == 1 and stats['files'] == 2 and stats['records'] == 3
+    assert stats['last_lag_seconds'] >= 0
+
+def test_missed_files_are_caught_up_on_start(lake_watcher):
+    _, _, lake = lake_watcher
+    _add_raw_file(lake, 'userD', 1753790400000)
+    restarted = watcher.Watcher(lake['data_dir'], lake['table_paths'], QueueSource(), max_seconds=0)
+    restarted.catch_up()
+    assert list(restarted.pending) == ['userD_1753790400000.gz']
+    restarted.run_once(0)
+    assert delta_reader.get_summary('2025-07-29')['total_bronze'] == 5
+
+def test_batch_closes_after_max_wait(lake_watcher):
+    w, source, lake = lake_watcher
+    source.names = [_add_raw_file(lake, 'userD', 1753790400000)]
+    w.queue(source.wait(0))
+    assert not w.batch_due()
+    assert w.batch_due(now=time.time() + 3600)
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotify is Linux-only")
+def test_inotify_reports_written_files(sample_lake):
+    source = watcher.InotifySource(sample_lake['data_dir'])
+    try:
+        name = _add_raw_file(sample_lake, 'userD', 1753790400000)
+        assert name in source.wait(5)
+    finally:
+        source.close()
+
+def test_ingestion_status_endpoint(lake_watcher):
+    w, source, lake = lake_watcher
+    source.names = [_add_raw_file(lake, 'userD', 1753790400000), _add_raw_file(lake, 'userE', 1753790400000)]
+    w.run_once(0)
+    body = client.get("/api/ingestion/status").json()
+    assert body['batches'] == 1 and body['files'] == 2
+    metrics = client.get("/metrics").text
+    assert "etl_ingest_files_total 2" in metrics
+
+def _bronze_rows(lake):
+    from deltalake import DeltaTable
+    return DeltaTable(lake['table_paths']['bronze']).to_pyarrow_table().num_rows
+
+@pytest.fixture
+def failing_quality_write(monkeypatch):
+    """Makes the write after the tables fail, leaving a batch committed to every table but unfinished"""
+    from services import quality_stats
+    original = quality_stats.write
+    calls = []
+    def write(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return original(*args, **kwargs)
+    monkeypatch.setattr(quality_stats, 'write', write)
+
+def test_failed_batch_is_retried_with_backoff_without_duplicates(lake_watcher, failing_quality_write):
+    w, source, lake = lake_watcher
+    rows = _bronze_rows(lake)
+    source.names = [_add_raw_file(lake, 'userD', 1753790400000, records=2),
+                    _add_raw_file(lake, 'userE', 1753790400000)]
+    w.run_once(0)
+    assert w.pending == {} and len(w.retries) == 1
+    assert _bronze_rows(lake) == rows + 3
+    assert not w.batch_due()
+
+    later = time.time() + 10
+    assert w.batch_due(now=later)
+    assert w.flush(now=later) == 2
+    assert w.retries == [] and ingest_status.read_in_flight(lake['table_paths']) == {}
+    assert _bronze_rows(lake) == rows + 3
+    assert delta_reader.get_summary('2025-07-29')['total_bronze'] == 7
+
+def test_batch_in_flight_at_restart_is_retried_once(lake_watcher, failing_quality_write):
+    w, source, lake = lake_watcher
+    rows = _bronze_rows(lake)
+    source.names = [_add_raw_file(lake, 'userD', 1753790400000), _add_raw_file(lake, 'userE', 1753790400000)]
+    w.run_once(0)
+    assert len(ingest_status.read_in_flight(lake['table_paths'])) == 1
+
+    restarted = watcher.Watcher(lake['data_dir'], lake['table_paths'], QueueSource(), max_seconds=3600)
+    restarted.catch_up()
+    assert restarted.pending == {} and len(restarted.retries) == 1
+    restarted.run_once(0)
+    assert restarted.retries == [] and ingest_status.read_in_flight(lake['table_paths']) == {}
+    assert _bronze_rows(lake) == rows + 2
+
+def test_only_one_process_runs_the_watcher(sample_lake, monkeypatch):
+    from utils.files import try_lock
+    monkeypatch.setattr(watcher, '_thread', None)
+    monkeypatch.setattr(watcher, '_lock_file', None)
+    lock = try_lock(os.path.join(ingest_status.status_dir(sample_lake['table_paths']),
+                                 ingest_status.WATCHER_LOCK_FILENAME))
+    try:
+        watcher.start(sample_lake['data_dir'], sample_lake['table_paths'])
+        assert watcher._thread is None
+    finally:
+        lock.close()
@@ -0,0 +1,84 @@
+import sys
+import os
+import asyncio
+import pandas as pd
+from deltalake import write_deltalake
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.live_updates import LiveHub, diff_dashboard
+
+KEY = ('2025-07-28', 'daily')
+
+def _add_bronze_record(sample_lake, user_id):
+    row = pd.DataFrame([{'type': 'STEPS', 'value': 1, 'timestamp': 0, 'user_id': user_id, 'ingestion_date': KEY[0]}])
+    write_deltalake(sample_lake['table_paths']['bronze'], row, mode='append')
+
+def test_diff_only_reports_changed_aggregates():
+    old = {"summary": {"total_raw": 3, "total_users": 2},
+           "sync_status": {"columns": ["user_id"], "data": [{"user_id": "a", "bronze": "Missing"},
+                                                            {"user_id": "b", "bronze": "Available"}]}}
+    new = {"summary": {"total_raw": 4, "total_users": 2},
+           "sync_status": {"columns": ["user_id"], "data": [{"user_id": "a", "bronze": "Available"},
+                                                            {"user_id": "b", "bronze": "Available"}]}}
+    assert diff_dashboard(old, new) == {
+        "summary": {"total_raw": 4},
+        "sync_status": {"columns": ["user_id"], "rows": [{"user_id": "a", "bronze": "Available"}], "removed": []},
+    }
+
+def test_change_is_computed_once_and_fanned_out(sample_lake):
+    hub = LiveHub(poll_seconds=3600, queue_size=4)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        subscribers = [hub.subscribe(KEY, loop) for _ in range(5)]
+        hub.snapshot(KEY)
+        _add_bronze_record(sample_lake, 'userD')
+        await asyncio.to_thread(hub.poll_once)
+        events = [await asyncio.wait_for(s.queue.get(), timeout=5) for s in subscribers]
+        await asyncio.to_thread(hub.poll_once)
+        return events, [s.queue.qsize() for s in subscribers]
+
+    events, remaining = asyncio.run(scenario())
+    assert hub.stats["recomputes"] == 2
+    assert all(event == events[0] for event in events)
+    assert events[0]["event"] == "update"
+    assert events[0]["data"]["summary"] == {
+        "total_bronze": 4, "raw_to_bronze_status": "Failed", "bronze_to_silver_status": "Failed"}
+    assert [row["user_id"] for row in events[0]["data"]["sync_status"]["rows"]] == ["userD"]
+    assert remaining == [0] * 5
+
+def test_slow_subscriber_gets_latest_snapshot_instead_of_backlog(sample_lake):
+    hub = LiveHub(poll_seconds=3600, queue_size=1)
+
+    async def scenario():
+        subscriber = hub.subscribe(KEY, asyncio.get_running_loop(), page=2, page_size=2)
+        hub.snapshot(KEY)
+        for user_id in ('userD', 'userE'):
+            _add_bronze_record(sample_lake, user_id)
+            await asyncio.to_thread(hub.poll_once)
+        await asyncio.sleep(0)
+        return subscriber.queue.qsize(), await subscriber.queue.get()
+
+    size, event = asyncio.run(scenario())
+    assert size == 1
+    assert event["event"] == "snapshot"
+    assert event["data"]["summary"]["total_bronze"] == 5
+    assert hub.stats["dropped"] == 1
+    sync_status = event["data"]["sync_status"]
+    assert (sync_status["page"], sync_status["page_size"], sync_status["total_users"]) == (2, 2, 5)
+    assert [row["user_id"] for row in sync_status["data"]] == ["userC", "userD"]
+
+def test_state_and_locks_are_dropped_with_the_last_subscriber(sample_lake):
+    hub = LiveHub(poll_seconds=3600, queue_size=1)
+
+    async def scenario():
+        subscriber = hub.subscribe(KEY, asyncio.get_running_loop())
+        hub.snapshot(KEY)
+        hub.unsubscribe(subscriber)
+
+    asyncio.run(scenario())
+    assert hub._state == {} and hub._key_locks == {}
+    # Without subscribers a snapshot is still served, and nothing is kept for the key
+    assert hub.snapshot(KEY)["summary"]["total_bronze"] == 3
+    assert hub._state == {} and hub._key_locks == {}
@@ -0,0 +1,24 @@
+import sys
+import os
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+
+client = TestClient(app)
+
+def test_server_timing_reports_stage_spans(sample_lake):
+    response = client.get("/api/sync-status", params={"date": "2025-07-28"})
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    entries = {part.split(";")[0].strip() for part in timing.split(",")}
+    assert {"delta_read_bronze", "sync_matrix", "serialize", "total"} <= entries
+
+def test_metrics_exposes_route_latency_spans_and_caches(sample_lake):
+    client.get("/api/sync-status", params={"date": "2025-07-28"})
+    body = client.get("/metrics").text
+    assert 'etl_http_request_duration_seconds_count{method="GET",route="/api/sync-status",status="200"}' in body
+    assert 'etl_span_duration_seconds_bucket{span="sync_matrix",le="+Inf"}' in body
+    assert 'etl_cache_hit_ratio{cache="export"}' in body
+    assert body.count("# TYPE etl_cache_hits_total counter") == 1
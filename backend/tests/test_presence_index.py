@@ -0,0 +1,53 @@
+import sys
+import os
+import pandas as pd
+from deltalake import write_deltalake
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from services import delta_reader, presence_index
+
+client = TestClient(app)
+
+DATES = ['2025-07-28', '2025-07-29']
+
+def _matrices():
+    return (delta_reader.build_sync_matrix(DATES).to_pylist(),
+            delta_reader.build_vitals_matrix(DATES).to_pylist(),
+            delta_reader.get_vitals_columns(),
+            delta_reader.get_missing_users(DATES, 'silver_vitalsswt'))
+
+def test_index_answers_match_table_scans(sample_lake):
+    scanned = _matrices()
+    presence_index.rebuild(delta_reader.TABLE_PATHS)
+    assert delta_reader.current_presence_index() is not None
+    assert _matrices() == scanned
+    assert scanned[3] == ['userC']
+
+def test_index_round_trips_through_parquet(sample_lake):
+    built = presence_index.rebuild(delta_reader.TABLE_PATHS)
+    loaded = presence_index.read(presence_index.index_path(delta_reader.TABLE_PATHS))
+    assert loaded.users == built.users == ['userA', 'userB', 'userC']
+    assert loaded.vitals == built.vitals
+    assert loaded.bitmaps == built.bitmaps
+    assert loaded.names(loaded.bitmap(presence_index.VITAL, 'BLOOD_OXYGEN', '2025-07-29')) == ['userC']
+
+def test_stale_index_is_ignored(sample_lake):
+    presence_index.rebuild(delta_reader.TABLE_PATHS)
+    row = pd.DataFrame([{'type': 'STEPS', 'value': 1, 'timestamp': 0, 'user_id': 'userD', 'ingestion_date': DATES[0]}])
+    write_deltalake(sample_lake['table_paths']['bronze'], row, mode='append')
+    assert delta_reader.current_presence_index() is None
+    assert 'userD' in delta_reader.get_all_users()
+    delta_reader.refresh_presence_index()
+    assert delta_reader.current_presence_index().users[-1] == 'userD'
+
+def test_missing_users_endpoint(sample_lake):
+    presence_index.rebuild(delta_reader.TABLE_PATHS)
+    response = client.get("/api/sync-status/missing",
+                          params={"date": DATES[0], "view_type": "weekly", "table": "silver_vitalsswt"})
+    assert response.status_code == 200
+    assert response.json()["users"] == ['userC']
+    response = client.get("/api/sync-status/missing", params={"date": DATES[0], "table": "gold"})
+    assert response.status_code == 400
@@ -0,0 +1,67 @@
+import sys
+import os
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import main
+from main import app
+from api import routes
+from api.routes import get_current_user
+from services import delta_reader
+from services.auth_service import create_access_token
+from utils import profiling
+from utils.profiling import RequestProfile
+
+client = TestClient(app)
+
+ADMIN = {"id": 1, "username": "admin@gmail.com", "nickname": None, "full_name": None}
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    monkeypatch.setattr(main, 'ADMIN_USERNAMES', {ADMIN["username"]})
+    monkeypatch.setattr(routes, 'ADMIN_USERNAMES', {ADMIN["username"]})
+    app.dependency_overrides[get_current_user] = lambda: ADMIN
+    yield tmp_path / 'profiles'
+    app.dependency_overrides.pop(get_current_user, None)
+
+def _auth(username):
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+def test_sampler_ranks_delta_reader_functions(sample_lake):
+    profile = RequestProfile(interval=0.0005)
+    deadline = time.perf_counter() + 0.3
+    while time.perf_counter() < deadline:
+        profiling._run_profiled(profile, delta_reader.get_dashboard, ('2025-07-28', 'weekly'), {})
+    assert profile.samples > 0
+    names = [entry["function"] for entry in profile.top_functions()]
+    assert "get_dashboard" in names
+    # Folded stacks start at the profiled call, not in the test runner
+    assert all(line.startswith("get_dashboard (services/delta_reader.py") for line in profile.folded().splitlines())
+
+def test_profile_flag_requires_admin(sample_lake, profile_dir):
+    response = client.get("/api/sync-status", params={"profile": 1}, headers=_auth("someone@gmail.com"))
+    assert response.status_code == 403
+    response = client.get("/api/sync-status", headers={"X-Profile": "1"})
+    assert response.status_code == 403
+
+def test_profiled_request_is_stored_and_retrievable(sample_lake, profile_dir):
+    response = client.get("/api/sync-status", params={"date": "2025-07-28", "profile": 1},
+                          headers=_auth(ADMIN["username"]))
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    stored = client.get(f"/api/admin/profiles/{profile_id}").json()
+    assert stored["path"] == "/api/sync-status"
+    assert stored["profiled_ms"] > 0
+    assert isinstance(stored["top_functions"], list)
+    folded = client.get(f"/api/admin/profiles/{profile_id}", params={"format": "folded"})
+    assert folded.text == stored["folded"]
+
+def test_unprofiled_requests_store_nothing(sample_lake, profile_dir):
+    response = client.get("/api/sync-status", params={"date": "2025-07-28"})
+    assert "X-Profile-Id" not in response.headers
+    assert not profile_dir.exists()
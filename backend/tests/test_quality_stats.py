@@ -0,0 +1,83 @@
+import sys
+import os
+import gzip
+import json
+import pytest
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from api.routes import get_current_user
+from data_ingestion import watcher
+from data_ingestion.load_bronze import read_profiled_records
+from services import quality_stats
+
+client = TestClient(app)
+
+DAY_MS = 1753704000000  # 2025-07-28T12:00Z
+
+TEST_USER = {"id": 1, "username": "test@gmail.com", "nickname": None, "full_name": None}
+
+@pytest.fixture
+def authenticated(user_store):
+    app.dependency_overrides[get_current_user] = lambda: TEST_USER
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+def _records(**columns):
+    n = len(next(iter(columns.values())))
+    return pd.DataFrame({'ingestion_date': ['2025-07-28'] * n, 'user_id': ['userA'] * n,
+                         quality_stats.SOURCE_COLUMN: ['userA_1753704000000.gz'] * n, **columns})
+
+def test_profile_counts_nulls_ranges_and_skew():
+    df = _records(type=['HEART_RATE', 'HEART_RATE', 'HEART_RATE', 'BLOOD_OXYGEN', 'STEPS'],
+                  value=[60, 250, None, 55, 50000],
+                  timestamp=[DAY_MS, DAY_MS + 60000, DAY_MS - 2 * 86400000, DAY_MS, None])
+    rows = {row['type']: row for row in quality_stats.profile(quality_stats.records_table(df)).to_pylist()}
+    heart = rows['HEART_RATE']
+    assert heart['records'] == 3 and heart['value_nulls'] == 1 and heart['out_of_range'] == 1
+    assert (heart['value_min'], heart['value_max']) == (60, 250)
+    assert heart['clock_skewed'] == 1 and heart['timestamp_max'] == DAY_MS + 60000
+    assert rows['BLOOD_OXYGEN']['out_of_range'] == 1
+    # No range is configured for steps
+    assert rows['STEPS']['out_of_range'] == 0 and rows['STEPS']['timestamp_nulls'] == 1
+
+def test_iso_and_second_timestamps_are_normalized():
+    df = _records(type=['STEPS', 'STEPS'], value=[1, 2],
+                  timestamp=['2025-07-28T12:00:00Z', '2025-07-28T12:00:30Z'])
+    row = quality_stats.profile(quality_stats.records_table(df)).to_pylist()[0]
+    assert row['timestamp_min'] == DAY_MS and row['clock_skewed'] == 0
+    df = _records(type=['STEPS'], value=[1], timestamp=[DAY_MS // 1000])
+    assert quality_stats.profile(quality_stats.records_table(df)).to_pylist()[0]['timestamp_min'] == DAY_MS
+
+def test_redelivered_file_replaces_its_rows(sample_lake):
+    files = [os.path.join(sample_lake['data_dir'], name) for name in sorted(os.listdir(sample_lake['data_dir']))]
+    _, quality = read_profiled_records(files)
+    quality_stats.write(sample_lake['table_paths'], quality, overwrite=True)
+    assert [row['records'] for row in quality_stats.get_quality('2025-07-28', 'userA')['rows']] == [1, 1]
+
+    path = os.path.join(sample_lake['data_dir'], 'userA_1753704000000.gz')
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump([{'type': 'HEART_RATE', 'value': 300, 'timestamp': DAY_MS},
+                   {'type': 'HEART_RATE', 'value': None, 'timestamp': DAY_MS + 5000}], f)
+    _, quality = read_profiled_records([path])
+    quality_stats.write(sample_lake['table_paths'], quality)
+    rows = quality_stats.get_quality('2025-07-28', 'userA')['rows']
+    # STEPS is gone from the re-delivered file
+    assert [row['type'] for row in rows] == ['HEART_RATE']
+    assert rows[0]['records'] == 2 and rows[0]['value_null_rate'] == 0.5 and rows[0]['out_of_range'] == 1
+    assert rows[0]['timestamp_spread_seconds'] == 5
+
+def test_quality_endpoint_after_watcher_batch(sample_lake, authenticated):
+    assert client.get("/api/quality", params={"date": "2025-07-29"}).json()["profiled"] is False
+    w = watcher.Watcher(sample_lake['data_dir'], sample_lake['table_paths'], max_seconds=0)
+    w.catch_up()
+    with gzip.open(os.path.join(sample_lake['data_dir'], 'userD_1753790400000.gz'), 'wt', encoding='utf-8') as f:
+        json.dump([{'type': 'BLOOD_OXYGEN', 'value': 40, 'timestamp': 1753790400000}], f)
+    w.queue(['userD_1753790400000.gz'])
+    w.flush()
+    body = client.get("/api/quality", params={"date": "2025-07-29", "vital": "BLOOD_OXYGEN"}).json()
+    assert body["profiled"] is True
+    assert [(row["user_id"], row["out_of_range"]) for row in body["rows"]] == [("userD", 1)]
@@ -0,0 +1,56 @@
+import sys
+import os
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import delta_reader, query_backends
+
+OTHER_BACKENDS = [name for name in query_backends.BACKENDS if name != "arrow"]
+DATES = ['2025-07-28', '2025-07-29']
+
+@pytest.fixture(autouse=True)
+def without_aggregate_store(monkeypatch):
+    """Every count goes through the backend under test."""
+    monkeypatch.setattr(delta_reader, 'AGGREGATE_STORE_ENABLED', False)
+
+def _views(backend):
+    """Every backend-dependent view over the sample dates, as plain Python values."""
+    scan = delta_reader.scan_sources(DATES, backend=backend)
+    _, sync = delta_reader.get_sync_status_matrix(DATES[0], scan)
+    _, vitals = delta_reader.get_user_vitals_matrix(DATES[1], scan)
+    return {
+        "summary": delta_reader.get_summary(DATES[1], scan),
+        "weekly": delta_reader.get_aggregated_summary(DATES, "week", scan),
+        "range": delta_reader.get_range_summary(DATES[0], DATES[1], "day", scan),
+        "record_counts": delta_reader.get_user_record_counts(DATES, scan).to_pylist(),
+        "users": delta_reader.get_all_users(scan),
+        "vitals_columns": delta_reader.get_vitals_columns(scan),
+        "sync_matrix": delta_reader.build_sync_matrix(DATES, scan=scan).to_pylist(),
+        "vitals_matrix": delta_reader.build_vitals_matrix(DATES, scan=scan).to_pylist(),
+        "sync": sync.to_pylist(),
+        "vitals": vitals.to_pylist(),
+    }
+
+@pytest.mark.parametrize("backend", OTHER_BACKENDS)
+def test_backend_matches_arrow(sample_lake, backend):
+    views = _views(backend)
+    assert views["summary"]["total_silver"] == 9
+    assert views == _views("arrow")
+
+@pytest.mark.parametrize("backend", OTHER_BACKENDS)
+def test_backend_matches_arrow_on_partitioned_tables(sample_lake, backend):
+    from deltalake import write_deltalake
+    for name, path in sample_lake['table_paths'].items():
+        frame = sample_lake['records']
+        if name == 'silver_vitalsswt':
+            frame = frame[frame['user_id'] != 'userC']
+        write_deltalake(path + '_partitioned', frame.reset_index(drop=True), partition_by=['ingestion_date'])
+    delta_reader.TABLE_PATHS.update({name: path + '_partitioned' for name, path in sample_lake['table_paths'].items()})
+    views = _views(backend)
+    assert views["weekly"]["total_bronze"] == 7
+    assert views == _views("arrow")
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        query_backends.get_backend("spark")
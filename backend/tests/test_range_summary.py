@@ -0,0 +1,51 @@
+import sys
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from api.routes import get_current_user
+from services import delta_reader
+
+client = TestClient(app)
+
+TEST_USER = {"id": 1, "username": "test@gmail.com", "nickname": None, "full_name": None}
+SUMMARY_FIELDS = ("total_users", "total_raw", "total_bronze", "total_silver", "raw_to_bronze_status",
+                  "bronze_to_silver_status", "successful_ingestions", "failed_ingestions")
+
+@pytest.fixture
+def authenticated(user_store):
+    app.dependency_overrides[get_current_user] = lambda: TEST_USER
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+def test_daily_buckets_match_daily_summaries(sample_lake):
+    result = delta_reader.get_range_summary('2025-07-27', '2025-07-30', 'day')
+    assert [bucket["bucket"] for bucket in result["buckets"]] == ['2025-07-27', '2025-07-28', '2025-07-29', '2025-07-30']
+    for bucket in result["buckets"]:
+        summary = delta_reader.get_summary(bucket["bucket"])
+        assert {key: bucket[key] for key in SUMMARY_FIELDS} == {key: summary[key] for key in SUMMARY_FIELDS}
+
+def test_buckets_are_clipped_to_the_range(sample_lake):
+    weeks = delta_reader.get_range_summary('2025-07-20', '2025-07-29', 'week')["buckets"]
+    assert [(b["bucket"], b["start"], b["end"]) for b in weeks] == [
+        ('2025-07-14', '2025-07-20', '2025-07-20'), ('2025-07-21', '2025-07-21', '2025-07-27'),
+        ('2025-07-28', '2025-07-28', '2025-07-29')]
+    weekly = delta_reader.get_weekly_summary('2025-07-28')
+    assert {key: weeks[2][key] for key in SUMMARY_FIELDS} == {key: weekly[key] for key in SUMMARY_FIELDS}
+
+    months = delta_reader.get_range_summary('2025-06-15', '2025-07-31', 'month')["buckets"]
+    assert [(b["bucket"], b["start"], b["end"]) for b in months] == [
+        ('2025-06-01', '2025-06-15', '2025-06-30'), ('2025-07-01', '2025-07-01', '2025-07-31')]
+    assert months[1]["total_users"] == 3 and months[1]["failed_ingestions"] == 1
+
+def test_range_endpoint_rejects_bad_ranges(sample_lake, authenticated):
+    response = client.get("/api/summary/range", params={"start": "2025-07-28", "end": "2025-07-29", "granularity": "week"})
+    assert response.status_code == 200
+    assert response.json()["buckets"][0]["total_raw"] == 7
+    assert client.get("/api/summary/range", params={"start": "2025-07-29", "end": "2025-07-28"}).status_code == 400
+    assert client.get("/api/summary/range", params={"start": "2024-01-01", "end": "2025-07-28"}).status_code == 400
+    assert client.get("/api/summary/range", params={"start": "2025-07-28", "end": "2025-07-29",
+                                                    "granularity": "year"}).status_code == 422
@@ -0,0 +1,109 @@
+import sys
+import os
+import time
+import threading
+import pandas as pd
+from deltalake import write_deltalake
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from services import delta_reader, result_cache
+
+client = TestClient(app)
+
+def _stats():
+    return dict(result_cache.stats)
+
+def test_views_are_served_from_the_shared_cache(sample_lake):
+    before = _stats()
+    first = delta_reader.get_summary('2025-07-28')
+    columns, matrix = delta_reader.get_sync_status_matrix('2025-07-28')
+    assert delta_reader.get_summary('2025-07-28') == first
+    cached_columns, cached_matrix = delta_reader.get_sync_status_matrix('2025-07-28')
+    assert (cached_columns, cached_matrix.to_pylist()) == (columns, matrix.to_pylist())
+    assert result_cache.stats["computes"] - before["computes"] == 2
+    assert result_cache.stats["hits"] - before["hits"] == 2
+
+def _add_bronze_user(sample_lake, user_id):
+    row = pd.DataFrame([{'type': 'STEPS', 'value': 1, 'timestamp': 0, 'user_id': user_id, 'ingestion_date': '2025-07-28'}])
+    write_deltalake(sample_lake['table_paths']['bronze'], row, mode='append')
+
+def _slow_scans(monkeypatch, seconds):
+    original_scan = delta_reader.scan_sources
+    def slow_scan(*args, **kwargs):
+        time.sleep(seconds)
+        return original_scan(*args, **kwargs)
+    monkeypatch.setattr(delta_reader, 'scan_sources', slow_scan)
+
+def _user_ids(response):
+    return [row["user_id"] for row in response.json()["data"]]
+
+def test_new_source_version_is_a_new_entry(sample_lake):
+    assert delta_reader.get_summary('2025-07-28')['total_bronze'] == 3
+    _add_bronze_user(sample_lake, 'userD')
+    assert delta_reader.get_summary('2025-07-28')['total_bronze'] == 4
+
+def test_concurrent_misses_compute_once():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"value": 42}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(result_cache.get_or_compute("k", compute)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"value": 42}] * 4
+
+def test_expired_and_oversized_entries_are_evicted(monkeypatch):
+    result_cache.get_or_compute("old", lambda: "x" * 100)
+    monkeypatch.setattr(result_cache, 'RESULT_CACHE_MAX_BYTES', 150)
+    result_cache.get_or_compute("new", lambda: "y" * 100)
+    assert result_cache.get_or_compute("old", lambda: "recomputed") == "recomputed"
+
+    monkeypatch.setattr(result_cache, 'RESULT_CACHE_TTL_SECONDS', -1)
+    result_cache.get_or_compute("stale", lambda: 1)
+    assert result_cache.get_or_compute("stale", lambda: 2) == 2
+
+def test_previous_result_is_served_stale_while_recomputing(sample_lake, monkeypatch):
+    params = {"date": "2025-07-28", "max_stale": 300}
+    response = client.get("/api/sync-status", params=params)
+    assert "X-Result-Stale" not in response.headers
+    assert response.headers["Age"] == "0"
+
+    _add_bronze_user(sample_lake, 'userD')
+    _slow_scans(monkeypatch, 0.5)
+    started = time.perf_counter()
+    response = client.get("/api/sync-status", params=params)
+    assert time.perf_counter() - started < 0.5
+    assert response.headers["X-Result-Stale"] == "true"
+    assert "userD" not in _user_ids(response)
+
+    deadline = time.perf_counter() + 5
+    while "userD" not in _user_ids(response) and time.perf_counter() < deadline:
+        time.sleep(0.1)
+        response = client.get("/api/sync-status", params=params)
+    assert "X-Result-Stale" not in response.headers
+    assert "userD" in _user_ids(response)
+
+def test_deadline_falls_back_to_stale_or_503(sample_lake, monkeypatch):
+    _slow_scans(monkeypatch, 0.5)
+    params = {"date": "2025-07-28", "max_stale": 0, "deadline": 0.1}
+    response = client.get("/api/user-vitals", params=params)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+    # The computation kept running and its result becomes the fallback for the next change
+    time.sleep(0.6)
+    _add_bronze_user(sample_lake, 'userD')
+    response = client.get("/api/user-vitals", params=params)
+    assert response.status_code == 200
+    assert response.headers["X-Result-Stale"] == "true"
@@ -0,0 +1,80 @@
+import sys
+import os
+import gzip
+import json
+import pytest
+import pyarrow as pa
+from deltalake import DeltaTable, WriterProperties, write_deltalake
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from data_ingestion import watcher
+from data_ingestion.load_bronze import read_records, merge_records, cluster_records
+from services import delta_reader
+
+def _raw_path(lake, name):
+    return os.path.join(lake['data_dir'], name)
+
+def _bronze(lake):
+    return DeltaTable(lake['table_paths']['bronze']).to_pandas()
+
+def test_redelivered_file_is_idempotent(sample_lake):
+    df = read_records([_raw_path(sample_lake, 'userA_1753704000000.gz')])
+    metrics = merge_records(sample_lake['table_paths']['bronze'], df)
+    assert metrics['num_target_rows_inserted'] == 0 and metrics['num_target_rows_updated'] == 2
+    assert len(_bronze(sample_lake)) == len(sample_lake['records'])
+    summary = delta_reader.get_summary('2025-07-28')
+    assert summary['total_raw'] == summary['total_bronze'] == 3
+
+def test_merge_updates_matches_and_inserts_new_records(sample_lake):
+    path = _raw_path(sample_lake, 'userA_1753704000000.gz')
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump([{'type': 'HEART_RATE', 'value': 99, 'timestamp': 1753704000000},
+                   {'type': 'SLEEP', 'value': 1, 'timestamp': 1753704005000}], f)
+    metrics = merge_records(sample_lake['table_paths']['bronze'], read_records([path]))
+    assert metrics['num_target_rows_inserted'] == 1 and metrics['num_target_rows_updated'] == 1
+    bronze = _bronze(sample_lake)
+    user_a = bronze[(bronze['user_id'] == 'userA') & (bronze['ingestion_date'] == '2025-07-28')]
+    assert sorted(user_a['type']) == ['HEART_RATE', 'SLEEP', 'STEPS']
+    assert user_a[user_a['type'] == 'HEART_RATE']['value'].tolist() == [99]
+
+def test_duplicates_within_a_batch_collapse(sample_lake):
+    path = _raw_path(sample_lake, 'userA_1753704000000.gz')
+    df = read_records([path, path])
+    merge_records(sample_lake['table_paths']['bronze'], df)
+    assert len(_bronze(sample_lake)) == len(sample_lake['records'])
+
+def test_missing_key_column_is_rejected(sample_lake):
+    df = read_records([_raw_path(sample_lake, 'userA_1753704000000.gz')]).drop(columns=['timestamp'])
+    with pytest.raises(ValueError):
+        merge_records(sample_lake['table_paths']['bronze'], df)
+
+def test_watcher_upsert_does_not_duplicate_rewritten_files(sample_lake):
+    w = watcher.Watcher(sample_lake['data_dir'], sample_lake['table_paths'], max_seconds=0, upsert=True)
+    w.catch_up()
+    path = _raw_path(sample_lake, 'userB_1753704000000.gz')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+    w.queue([os.path.basename(path)])
+    assert w.flush() == 1
+    assert len(_bronze(sample_lake)) == len(sample_lake['records'])
+
+def _files_by_date(path):
+    actions = pa.table(DeltaTable(path).get_add_actions(flatten=True)).to_pylist()
+    return {a['path']: (a['min.ingestion_date'], a['max.ingestion_date']) for a in actions}
+
+def test_merge_leaves_files_of_other_dates_untouched(sample_lake, tmp_path):
+    # Small files stand in for a load large enough to span several data files
+    path = str(tmp_path / 'clustered')
+    table = pa.Table.from_pandas(cluster_records(sample_lake['records']), preserve_index=False)
+    write_deltalake(path, table.to_reader(max_chunksize=3), mode='overwrite', target_file_size=1,
+                    writer_properties=WriterProperties(max_row_group_size=3, write_batch_size=3))
+    before = _files_by_date(path)
+    assert all(low == high for low, high in before.values())
+    other_dates = {p for p, (low, _) in before.items() if low == '2025-07-29'}
+    assert other_dates
+
+    metrics = merge_records(path, read_records([_raw_path(sample_lake, 'userA_1753704000000.gz')]))
+    assert metrics['num_target_rows_updated'] == 2
+    after = _files_by_date(path)
+    assert other_dates <= set(after)
+    assert not any(p in after for p, (low, _) in before.items() if low == '2025-07-28')
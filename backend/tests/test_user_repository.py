@@ -0,0 +1,77 @@
+import sys
+import os
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from api import routes
+from services.auth_service import create_access_token
+
+client = TestClient(app)
+
+PASSWORD = "Str0ng!Passw0rd"
+
+def _register(username):
+    response = client.post("/api/auth/register", json={"username": username, "password": PASSWORD})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_register_login_and_profile(user_store):
+    headers = _register("ana@gmail.com")
+    assert client.post("/api/auth/register", json={"username": "ana@gmail.com", "password": PASSWORD}).status_code == 400
+    assert client.post("/api/auth/login", json={"username": "ana@gmail.com", "password": PASSWORD}).status_code == 200
+    assert client.post("/api/auth/login", json={"username": "ana@gmail.com", "password": "wrong"}).status_code == 401
+    assert client.post("/api/auth/check-user", json={"username": "ana@gmail.com", "password": ""}).json() == {"exists": True}
+
+    updated = client.put("/api/auth/profile", json={"nickname": "Ana"}, headers=headers).json()
+    assert updated["nickname"] == "Ana" and updated["full_name"] is None
+    profile = client.get("/api/auth/profile", headers=headers).json()
+    assert profile["username"] == "ana@gmail.com" and "password_hash" not in profile
+
+def test_password_change_rejects_current_password(user_store):
+    headers = _register("ben@gmail.com")
+    response = client.put("/api/auth/profile/password", json={"password": PASSWORD}, headers=headers)
+    assert response.status_code == 400
+    response = client.put("/api/auth/profile/password", json={"password": "N3w!Passw0rdX"}, headers=headers)
+    assert response.status_code == 200
+    assert client.post("/api/auth/login", json={"username": "ben@gmail.com", "password": "N3w!Passw0rdX"}).status_code == 200
+
+def test_settings_upsert_and_custom_user_count(user_store):
+    headers = _register("cat@gmail.com")
+    assert client.get("/api/user-settings", headers=headers).json() == {}
+    client.post("/api/user-settings", json={"user_count_logic": "custom_input", "custom_user_count": 5}, headers=headers)
+    client.post("/api/user-settings", json={"custom_user_count": 12}, headers=headers)
+    assert client.get("/api/user-settings", headers=headers).json() == {
+        "user_count_logic": "custom_input", "custom_user_count": "12"}
+    user = client.get("/api/auth/profile", headers=headers).json()
+    assert asyncio.run(routes.get_custom_user_count(user)) == 12
+    assert client.get("/api/test-settings").json()["settings_count"] == 2
+
+def test_admin_user_management(user_store):
+    created = client.post("/api/admin/users", json={"username": "dan@gmail.com", "password": PASSWORD}).json()
+    assert created["success"]
+    duplicate = client.post("/api/admin/users", json={"username": "dan@gmail.com", "password": PASSWORD}).json()
+    assert "error" in duplicate
+    client.put(f"/api/admin/users/{created['user_id']}",
+               json={"username": "dan@gmail.com", "nickname": "Dan", "full_name": "Dan D"})
+    users = client.get("/api/admin/users").json()["users"]
+    assert [(u["username"], u["nickname"]) for u in users] == [("dan@gmail.com", "Dan")]
+    assert client.post("/api/auth/login", json={"username": "dan@gmail.com", "password": PASSWORD}).status_code == 200
+    client.delete(f"/api/admin/users/{created['user_id']}")
+    assert client.get("/api/admin/users").json()["users"] == []
+
+def test_concurrent_lookups_share_the_connection(user_store):
+    async def scenario():
+        user_ids = [await user_store.create_user(f"user{i}@gmail.com", "hash") for i in range(20)]
+        users = await asyncio.gather(*(user_store.get_user(f"user{i}@gmail.com") for i in range(20)))
+        return user_ids, users
+
+    user_ids, users = asyncio.run(scenario())
+    assert [user["id"] for user in users] == user_ids
+
+def test_unknown_token_user_is_rejected(user_store):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'ghost@gmail.com'})}"}
+    assert client.get("/api/user-settings", headers=headers).status_code == 401
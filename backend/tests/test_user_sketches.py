@@ -0,0 +1,91 @@
+import sys
+import os
+import gzip
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from api.routes import get_current_user
+from services import delta_reader, user_sketches
+
+client = TestClient(app)
+
+DATES = ['2025-07-28', '2025-07-29']
+
+TEST_USER = {"id": 1, "username": "test@gmail.com", "nickname": None, "full_name": None}
+
+@pytest.fixture
+def authenticated(user_store):
+    app.dependency_overrides[get_current_user] = lambda: TEST_USER
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+def test_estimate_is_within_error_bound():
+    sketch = user_sketches.HyperLogLog()
+    sketch.add([f"user{i}" for i in range(50000)])
+    assert abs(sketch.estimate() - 50000) <= 3 * sketch.relative_error * 50000
+
+def test_merged_daily_sketches_count_each_user_once():
+    dates = [f"2025-01-{day:02d}" for day in range(1, 31) for _ in range(1000)]
+    users = [f"user{i}" for _ in range(30) for i in range(1000)]
+    by_date = user_sketches.daily_sketches(dates, users)
+    assert len(by_date) == 30 and all(rows == 1000 for _, rows in by_date.values())
+    merged = user_sketches.HyperLogLog.union(sketch for sketch, _ in by_date.values())
+    assert abs(merged.estimate() - 1000) <= 3 * merged.relative_error * 1000
+
+def test_approximate_summary_matches_exact_counts(sample_lake):
+    exact = delta_reader.get_aggregated_summary(DATES, "week")
+    approximate = delta_reader.get_approximate_summary(DATES, "week")
+    for key in ("total_users", "total_raw", "total_bronze", "total_silver",
+                "raw_to_bronze_status", "bronze_to_silver_status"):
+        assert approximate[key] == exact[key]
+    assert approximate["distinct_users"] == {"raw": 3, "bronze": 3, "silver": 3}
+    bounds = approximate["total_users_bounds"]
+    assert bounds["lower"] <= 3 <= bounds["upper"]
+
+def test_only_changed_raw_dates_are_resketched(sample_lake, monkeypatch):
+    first = delta_reader.current_user_sketches()
+    with gzip.open(os.path.join(sample_lake['data_dir'], "userD_1753790400000.gz"), 'wt', encoding='utf-8') as f:
+        json.dump([{'type': 'STEPS', 'value': 1}], f)
+    resketched = []
+    original = delta_reader._raw_counts_by_date
+    monkeypatch.setattr(delta_reader, '_raw_counts_by_date', lambda dates: resketched.extend(dates) or original(dates))
+    second = delta_reader.current_user_sketches()
+    assert resketched == ['2025-07-29']
+    unchanged = (user_sketches.RAW, '2025-07-28')
+    assert (second.sketches[unchanged].registers == first.sketches[unchanged].registers).all()
+    assert round(second.union([user_sketches.RAW], DATES).estimate()) == 4
+    loaded = user_sketches.read(user_sketches.sketch_path(delta_reader.TABLE_PATHS))
+    assert loaded.raw_digests == second.raw_digests and loaded.records == second.records
+
+def test_approximate_summary_endpoint(sample_lake, authenticated):
+    response = client.get("/api/summary/weekly", params={"date": DATES[0], "approximate": "true"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["approximate"] is True and body["total_users"] == 3
+    assert body["relative_error"] == pytest.approx(1.04 / 2 ** 7, abs=1e-5)
+    assert "users" not in body and body["successful_ingestions"] is None
+
+def test_only_dates_touched_by_new_commits_are_resketched(sample_lake, monkeypatch):
+    import pandas as pd
+    from deltalake import DeltaTable, write_deltalake
+    first = delta_reader.current_user_sketches()
+    row = pd.DataFrame([{'type': 'STEPS', 'value': 1, 'timestamp': 0, 'user_id': 'userD', 'ingestion_date': DATES[1]}])
+    write_deltalake(sample_lake['table_paths']['bronze'], row, mode='append')
+
+    sketched = []
+    original = user_sketches.daily_sketches
+    monkeypatch.setattr(user_sketches, 'daily_sketches',
+                        lambda dates, *a, **kw: sketched.extend(set(dates.to_pylist())) or original(dates, *a, **kw))
+    # The new commit is applied from the Delta log, never by reading the whole table
+    monkeypatch.setattr(DeltaTable, 'to_pyarrow_table', lambda *a, **kw: pytest.fail("table was scanned"))
+    second = delta_reader.current_user_sketches()
+    assert sketched == [DATES[1]]
+    assert (second.sketches[('bronze', DATES[0])].registers == first.sketches[('bronze', DATES[0])].registers).all()
+    assert second.records[('bronze', DATES[1])] == first.records[('bronze', DATES[1])] + 1
+    assert round(second.union(['bronze'], DATES).estimate()) == 4
+    loaded = user_sketches.read(user_sketches.sketch_path(delta_reader.TABLE_PATHS))
+    assert loaded.table_digests == second.table_digests
@@ -0,0 +1,57 @@
+import sys
+import os
+import pytest
+import pandas as pd
+from deltalake import write_deltalake
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from api.routes import get_current_user
+from services import user_timeline
+
+client = TestClient(app)
+
+TEST_USER = {"id": 1, "username": "test@gmail.com", "nickname": None, "full_name": None}
+
+@pytest.fixture
+def authenticated(user_store):
+    app.dependency_overrides[get_current_user] = lambda: TEST_USER
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+@pytest.fixture
+def lake(sample_lake):
+    # Files holding only other users, or only other dates, must not be read for userA
+    for user_id, date in (('userZ', '2025-07-28'), ('userA', '2025-06-01')):
+        extra = pd.DataFrame([{'type': 'STEPS', 'value': 1, 'timestamp': 0, 'user_id': user_id,
+                               'ingestion_date': date}])
+        write_deltalake(sample_lake['table_paths']['bronze'], extra, mode='append')
+    return sample_lake
+
+def test_timeline_counts_per_day_table_and_vital(lake):
+    timeline = user_timeline.get_user_timeline('userA', '2025-07-28', '2025-07-30')
+    days = {day['date']: day for day in timeline['days']}
+    assert list(days) == ['2025-07-28', '2025-07-29', '2025-07-30']
+    assert days['2025-07-28']['raw'] == 2
+    assert days['2025-07-28']['tables']['bronze'] == {'records': 2, 'vitals': {'HEART_RATE': 1, 'STEPS': 1}}
+    assert days['2025-07-29']['tables']['silver_vitalsswt']['records'] == 1
+    assert days['2025-07-30']['tables']['bronze']['records'] == 0 and days['2025-07-30']['raw'] == 0
+    assert [f['name'] for f in timeline['raw_files']] == ['userA_1753704000000.gz', 'userA_1753790400000.gz']
+    assert timeline['raw_files'][0]['records'] == 2
+
+def test_only_files_that_can_hold_the_user_are_read(lake):
+    timeline = user_timeline.get_user_timeline('userA', '2025-07-28', '2025-07-30')
+    assert timeline['scan']['bronze'] == {'files': 3, 'files_read': 1}
+    assert timeline['scan']['silver_rrbucket'] == {'files': 1, 'files_read': 1}
+    assert user_timeline.get_user_timeline('nobody', '2025-07-28', '2025-07-30')['scan']['bronze']['files_read'] == 0
+
+def test_timeline_endpoint(lake, authenticated):
+    response = client.get("/api/users/userC/timeline", params={"start": "2025-07-29", "end": "2025-07-29"})
+    assert response.status_code == 200
+    day = response.json()['days'][0]
+    assert day['raw'] == 3 and day['tables']['bronze']['records'] == 3
+    assert day['tables']['silver_vitalsswt']['records'] == 0
+    response = client.get("/api/users/userC/timeline", params={"start": "2025-07-29", "end": "2025-07-01"})
+    assert response.status_code == 400
@@ -0,0 +1,48 @@
+import sys
+import os
+import subprocess
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+from main import app
+from services import warmup
+
+client = TestClient(app)
+
+@pytest.fixture
+def fresh_report(monkeypatch):
+    monkeypatch.setattr(warmup, 'report', {"state": "pending", "import_seconds": 0.5, "stages": {}, "error": None})
+    return warmup.report
+
+def test_importing_app_does_not_load_heavy_dependencies():
+    code = ("import sys, main; "
+            "print(','.join(m for m in ('pyarrow', 'deltalake', 'pandas', 'openpyxl', 'aiomysql', 'bcrypt', 'jose') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+def test_not_ready_until_warmup_finishes(sample_lake, fresh_report):
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+    warmup.run('2025-07-28')
+    response = client.get("/ready")
+    assert response.status_code == 200
+    report = response.json()
+    assert report["state"] == "done"
+    assert report["import_seconds"] == 0.5
+    assert set(report["stages"]) == {"imports", "table_snapshots", "raw_manifest",
+                                     "daily_summary", "weekly_summary", "monthly_summary", "presence_index",
+                                     "user_sketches"}
+    assert "pyarrow" in report["lazy_imports"]
+
+def test_failed_warmup_is_reported_but_ready(fresh_report, monkeypatch):
+    monkeypatch.setattr(warmup.delta_reader, 'get_table_versions', lambda: 1 / 0)
+    warmup.run()
+    status = warmup.readiness()
+    assert status["ready"] is True
+    assert status["state"] == "failed"
+    assert "division by zero" in status["error"]
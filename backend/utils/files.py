@@ -0,0 +1,38 @@
+import os
+import secrets
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# Files shared between threads and between worker processes are written to a private temporary
+# name and moved into place with os.replace, so readers never see a partial file. Work that only
+# one process may do at a time takes a non-blocking lock on a file next to its state.
+
+
+def tmp_path(path: str) -> str:
+    """Temporary name next to path, unique across processes and threads"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.{secrets.token_hex(4)}.tmp"
+
+
+def try_lock(path: str):
+    """
+    Open path and lock it exclusively without waiting. Returns the open file, which holds the
+    lock until it is closed, or None when another process (or thread) holds it.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    f = open(path, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
@@ -0,0 +1,45 @@
+import time
+import types
+import importlib
+import threading
+
+# Heavy dependencies (pyarrow, deltalake, numpy, aiomysql, ...) are bound to module
+# proxies at import time and only imported on first attribute access, so starting the app
+# (and importing it in tests) does not pay for libraries a request may never touch.
+
+# Module name -> seconds its first import took
+load_times = {}
+_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_name"] = name
+
+    def _load(self):
+        name = self.__dict__["_lazy_name"]
+        with _lock:
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            load_times.setdefault(name, time.perf_counter() - start)
+        # Copy the real namespace in so later lookups never reach __getattr__ again
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Module proxy for `name` that performs the real import on first use."""
+    return LazyModule(name)
+
+
+def preload(*modules: LazyModule):
+    """Import the given lazy modules now, e.g. while warming up in the background."""
+    for module in modules:
+        module._load()
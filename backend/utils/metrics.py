@@ -0,0 +1,153 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+# In-process metrics rendered in the Prometheus text format on /metrics.
+# Timing spans feed both a histogram and, while a request is being served, that request's
+# Server-Timing header.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Spans recorded during the current request: name -> [total seconds, count]
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key)]
+                for bound, count in zip(self.buckets, series["counts"]):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(labels + [le])} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(labels + [le])} {series['count']}")
+                lines.append(f"{self.name}_sum{_labels(labels)} {series['sum']}")
+                lines.append(f"{self.name}_count{_labels(labels)} {series['count']}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(parts):
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+REQUEST_DURATION = Histogram(
+    "etl_http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+SPAN_DURATION = Histogram(
+    "etl_span_duration_seconds", "Duration of named processing stages", ("span",))
+
+_collectors = []
+
+
+def register_collector(collect):
+    """Register a callable returning (name, type, help, [(labels dict, value), ...]) tuples for /metrics."""
+    _collectors.append(collect)
+
+
+def register_cache(cache_name, stats):
+    """Expose hits, misses and hit ratio of a cache whose stats dict has "hits" and "misses" counters."""
+    def collect():
+        hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        labels = {"cache": cache_name}
+        return [
+            ("etl_cache_hits_total", "counter", "Cache hits", [(labels, hits)]),
+            ("etl_cache_misses_total", "counter", "Cache misses", [(labels, misses)]),
+            ("etl_cache_hit_ratio", "gauge", "Cache hit ratio since start", [(labels, ratio)]),
+        ]
+    register_collector(collect)
+
+
+def start_request():
+    """Begin collecting spans for the current request context."""
+    _request_spans.set({})
+
+
+def request_spans():
+    return _request_spans.get() or {}
+
+
+def record_span(name, seconds):
+    SPAN_DURATION.observe(seconds, span=name)
+    spans = _request_spans.get()
+    if spans is not None:
+        total = spans.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+
+
+@contextmanager
+def span(name):
+    """Time a block under a stage name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing_header(total_seconds):
+    """Server-Timing value listing the request total and each recorded span, in milliseconds."""
+    parts = [f"total;dur={total_seconds * 1000:.1f}"]
+    for name, (seconds, count) in request_spans().items():
+        parts.append(f'{name};dur={seconds * 1000:.1f};desc="{count}x"')
+    return ", ".join(parts)
+
+
+def render_prometheus():
+    lines = REQUEST_DURATION.render() + SPAN_DURATION.render()
+    # Collectors may contribute samples to the same family (e.g. one per cache)
+    families = {}
+    for collect in _collectors:
+        try:
+            collected = collect()
+        except Exception as e:
+            print(f"Error collecting metrics: {e}")
+            continue
+        for name, metric_type, help_text, samples in collected:
+            families.setdefault(name, (metric_type, help_text, []))[2].extend(samples)
+    for name, (metric_type, help_text, samples) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            label_parts = [f'{key}="{_escape(val)}"' for key, val in labels.items()]
+            lines.append(f"{name}{_labels(label_parts)} {value}")
+    return "\n".join(lines) + "\n"
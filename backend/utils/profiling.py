@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import uuid
+import inspect
+import threading
+import contextvars
+from collections import Counter
+from functools import wraps
+from fastapi.routing import APIRoute
+from config.settings import BASE_DIR, PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_KEEP
+from utils.files import tmp_path as _tmp_path
+
+# Opt-in sampling profiler for single API requests. The middleware activates a RequestProfile
+# for the request's context; ProfiledRoute endpoints then sample their worker thread's stack
+# while they run. With no active profile an endpoint call costs one context variable lookup.
+
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+
+FOCUS_FILE = os.path.join(BASE_DIR, "services", "delta_reader.py")
+
+
+def _frame_label(frame_key):
+    filename, name, line = frame_key
+    if filename.startswith(BASE_DIR + os.sep):
+        filename = os.path.relpath(filename, BASE_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{name} ({filename}:{line})"
+
+
+class RequestProfile:
+    def __init__(self, interval: float = None):
+        self.interval = interval if interval is not None else PROFILE_SAMPLE_INTERVAL
+        self.stacks = Counter()
+        self.samples = 0
+        self.profiled_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start sampling the calling thread's stack every `interval` seconds."""
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(threading.get_ident(), stop),
+                                   name="request-profiler", daemon=True)
+        sampler.start()
+        return stop, sampler, time.perf_counter()
+
+    def stop(self, handle):
+        stop, sampler, start = handle
+        stop.set()
+        sampler.join()
+        with self._lock:
+            self.profiled_seconds += time.perf_counter() - start
+
+    def _sample(self, thread_id, stop):
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            # Walk up to the profiled endpoint call; frames above it are server plumbing
+            while frame is not None and frame.f_code is not _run_profiled.__code__:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            # Samples landing in start()/stop() themselves are profiler overhead
+            if stack and stack[-1][0] != __file__:
+                # Several threads of one request may be sampled at once
+                with self._lock:
+                    self.stacks[tuple(reversed(stack))] += 1
+                    self.samples += 1
+
+    def folded(self) -> str:
+        """Samples in the folded-stack format read by flamegraph.pl and speedscope."""
+        lines = []
+        for stack, count in self.stacks.most_common():
+            lines.append(";".join(_frame_label(frame) for frame in stack) + f" {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def top_functions(self, filename: str = FOCUS_FILE, limit: int = 20):
+        """Functions of one source file ranked by inclusive samples, with their self samples."""
+        inclusive = Counter()
+        own = Counter()
+        for stack, count in self.stacks.items():
+            for frame in set(stack):
+                if frame[0] == filename:
+                    inclusive[frame] += count
+            if stack[-1][0] == filename:
+                own[stack[-1]] += count
+        return [
+            {
+                "function": frame[1],
+                "line": frame[2],
+                "inclusive_samples": count,
+                "self_samples": own[frame],
+                "inclusive_pct": round(100 * count / self.samples, 1) if self.samples else 0.0
+            }
+            for frame, count in inclusive.most_common(limit)
+        ]
+
+
+def activate(profile: RequestProfile):
+    """Make `profile` the active profile for the current context. Returns a token for deactivate()."""
+    return _active_profile.set(profile)
+
+
+def deactivate(token):
+    _active_profile.reset(token)
+
+
+def _run_profiled(profile, endpoint, args, kwargs):
+    handle = profile.start()
+    try:
+        return endpoint(*args, **kwargs)
+    finally:
+        profile.stop(handle)
+
+
+def profile_call(fn, *args):
+    """Call fn, sampling this thread into the active request profile if there is one.
+    For work a profiled request hands off to another thread."""
+    profile = _active_profile.get()
+    if profile is None:
+        return fn(*args)
+    return _run_profiled(profile, fn, args, {})
+
+
+def profiled(endpoint):
+    """Wrap a sync endpoint so it runs under the active request profile, if any."""
+    if inspect.iscoroutinefunction(endpoint):
+        # Async endpoints interleave with other requests on the event loop; sampling that
+        # thread would attribute other requests' work to this one.
+        return endpoint
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _active_profile.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        return _run_profiled(profile, endpoint, args, kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint can be profiled on demand."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+def store_profile(profile: RequestProfile, method: str, path: str, query: str, wall_seconds: float) -> str:
+    """Persist a finished profile under PROFILE_DIR, keeping the newest PROFILE_KEEP. Returns its ID."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    record = {
+        "id": profile_id,
+        "method": method,
+        "path": path,
+        "query": query,
+        "created_at": time.time(),
+        "wall_ms": round(wall_seconds * 1000, 1),
+        "profiled_ms": round(profile.profiled_seconds * 1000, 1),
+        "interval_ms": profile.interval * 1000,
+        "samples": profile.samples,
+        "top_functions": profile.top_functions(),
+        "folded": profile.folded()
+    }
+    path_on_disk = os.path.join(PROFILE_DIR, f"{profile_id}.json")
+    tmp_path = _tmp_path(path_on_disk)
+    with open(tmp_path, "w") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, path_on_disk)
+    _prune()
+    return profile_id
+
+
+def load_profile(profile_id: str):
+    """A stored profile record, or None for unknown (or malformed) IDs."""
+    if not profile_id.isalnum():
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _prune():
+    try:
+        with os.scandir(PROFILE_DIR) as it:
+            entries = sorted((entry.stat().st_mtime_ns, entry.path) for entry in it if entry.name.endswith(".json"))
+    except FileNotFoundError:
+        return
+    for _, path in entries[:max(len(entries) - PROFILE_KEEP, 0)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
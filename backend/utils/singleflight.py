@@ -0,0 +1,67 @@
+import threading
+from utils.metrics import register_collector
+
+# In-process request coalescing: while a computation for a key is running, later callers with
+# the same key wait for it and receive its result (or exception) instead of starting their own.
+# Results are shared between callers, so they must be treated as read-only.
+
+_groups = []
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"executed": 0, "coalesced": 0}
+        _groups.append(self)
+
+    def do(self, key, fn):
+        """Run fn() for key, or wait for the run already in flight and share its outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["executed"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def _collect_singleflight_stats():
+    return [
+        ("etl_singleflight_executed_total", "counter", "Computations started by a coalescing group",
+         [({"group": group.name}, group.stats["executed"]) for group in _groups]),
+        ("etl_singleflight_coalesced_total", "counter", "Calls that waited on an identical in-flight computation",
+         [({"group": group.name}, group.stats["coalesced"]) for group in _groups]),
+        ("etl_singleflight_in_flight", "gauge", "Computations currently in flight",
+         [({"group": group.name}, group.in_flight()) for group in _groups]),
+    ]
+
+register_collector(_collect_singleflight_stats)